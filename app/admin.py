@@ -6,4 +6,5 @@ admin.site.register(Jogo)
 admin.site.register(Categoria)
 admin.site.register(Compra)
 admin.site.register(ItemCompra)
-admin.site.register(ImagemExtra)
\ No newline at end of file
+admin.site.register(ImagemExtra)
+admin.site.register(BibliotecaJogo)
\ No newline at end of file
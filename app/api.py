@@ -0,0 +1,267 @@
+import base64
+import binascii
+import json
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .busca import PESOS_BM25, TABELA_FTS, fts_disponivel, montar_consulta_fts
+from .imagens import caminho_derivado
+from .models import Categoria, ImagemExtra, Jogo
+
+# ------- API DO CATÁLOGO (JSON, só leitura) -------
+# Listas paginadas por cursor (keyset): em vez de OFFSET, o cliente devolve o cursor da
+# página anterior, que guarda a chave de ordenação e o id do último jogo. A próxima página
+# é um "WHERE (chave, id) > cursor ... LIMIT n" que desce direto no índice
+# (ver Jogo.Meta.indexes), então a página 1000 custa o mesmo que a primeira.
+# As linhas saem de values(): nada de instanciar um Jogo por linha.
+#
+#   GET api/jogos/?categoria=<id>&ordem=lancamento|preco|-preco&limite=24&cursor=...
+#   GET api/busca/?q=<texto>&limite=24&cursor=...
+#   GET api/jogos/<id>/
+#   GET api/jogos/<id>/imagens/
+LIMITE_PADRAO = 24
+LIMITE_MAXIMO = 100
+
+# ordem -> (campo da chave, descendente?). Cada uma tem o seu índice parcial (deletado=False)
+ORDENACOES_API = {
+    'lancamento': ('lancamento', True),
+    'preco': ('preco_final_centavos', False),
+    '-preco': ('preco_final_centavos', True),
+}
+ORDEM_PADRAO_API = 'lancamento'
+
+CAMPOS_LISTA = ['id', 'nome', 'preco', 'desconto', 'preco_final_centavos', 'lancamento', 'icone']
+CAMPOS_DETALHE = CAMPOS_LISTA + ['descricao', 'autoria', 'plataforma', 'pre_lancamento']
+
+JogoCategoria = Jogo.categoria.through
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+# --- cursor ---
+def codificar_cursor(chave, id_):
+    # Opaco para o cliente: base64 de [chave, id]
+    bruto = json.dumps([chave, id_], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, tipo_chave):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        chave, id_ = json.loads(bruto)
+        if not isinstance(id_, int) or isinstance(id_, bool):
+            raise TypeError
+        return tipo_chave(chave), id_
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ParametroInvalido('Cursor inválido.')
+
+
+def _numero(valor):
+    if not isinstance(valor, (int, float)) or isinstance(valor, bool):
+        raise TypeError
+    return valor
+
+
+def _inteiro(valor):
+    if not isinstance(valor, int) or isinstance(valor, bool):
+        raise TypeError
+    return valor
+
+
+def ler_limite(parametros):
+    try:
+        limite = int(parametros.get('limite', LIMITE_PADRAO))
+    except (TypeError, ValueError):
+        raise ParametroInvalido('O limite precisa ser um número inteiro.')
+    return min(max(limite, 1), LIMITE_MAXIMO)
+
+
+def depois_do_cursor(jogos, campo, descendente, chave, id_):
+    # (campo, id) depois do cursor, na direção da ordenação. O "campo <= chave" sozinho
+    # é o que dá ao SQLite a faixa no índice; com só o OR ele percorre o índice desde o começo
+    op, op_igual = ('lt', 'lte') if descendente else ('gt', 'gte')
+    return jogos.filter(**{f'{campo}__{op_igual}': chave}).filter(
+        Q(**{f'{campo}__{op}': chave}) | Q(**{f'id__{op}': id_})
+    )
+
+
+# --- serialização ---
+def _reais(valor):
+    return f'{Decimal(valor):.2f}'
+
+
+def _url(nome):
+    return default_storage.url(nome) if nome else ''
+
+
+def serializar_jogo(linha):
+    # Uma linha de values(CAMPOS_LISTA / CAMPOS_DETALHE) -> dict do JSON
+    icone = linha.pop('icone')
+    preco_final = linha.pop('preco_final_centavos')
+    linha.update({
+        'preco': _reais(linha['preco']),
+        'desconto': linha['desconto'] or 0,
+        'preco_final': _reais(Decimal(preco_final) / 100),
+        'lancamento': linha['lancamento'].isoformat(),
+        'icone': _url(icone),
+        # A miniatura é gerada em segundo plano logo após o upload (ver imagens.py):
+        # o caminho é calculado sem consultar o storage, linha a linha
+        'miniatura': _url(caminho_derivado(icone, 'card')) if icone else '',
+    })
+    return linha
+
+
+def _pagina(linhas, limite, chave_do_cursor):
+    # linhas: até limite + 1 itens; o que sobra só diz se existe próxima página
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor(*chave_do_cursor(linhas[-1]))
+    return linhas, proximo
+
+
+def _erro(mensagem, status=400):
+    return JsonResponse({'erro': mensagem}, status=status)
+
+
+# --- listas ---
+# As views são async: no ASGI as leituras rodam pelos métodos async do ORM e só o FTS
+# (cursor cru, sem versão async) vai para uma thread com sync_to_async (ver benchmark_asgi)
+def _consulta_de_jogos(categoria_id, ordem, cursor, limite):
+    # Retorna (queryset da página com limite + 1 linhas, chave do cursor de uma linha)
+    campo, descendente = ORDENACOES_API[ordem]
+    jogos = Jogo.objects.filter(deletado=False)
+    if categoria_id is not None:
+        # EXISTS em vez do JOIN: o SQLite percorre o índice da ordenação e só confere a
+        # categoria de cada jogo (o JOIN partia da categoria e ordenava tudo a cada página)
+        jogos = jogos.filter(Exists(JogoCategoria.objects.filter(jogo_id=OuterRef('id'), categoria_id=categoria_id)))
+    if cursor:
+        tipo = date.fromisoformat if campo == 'lancamento' else _inteiro
+        chave, id_ = decodificar_cursor(cursor, tipo)
+        jogos = depois_do_cursor(jogos, campo, descendente, chave, id_)
+
+    sinal = '-' if descendente else ''
+
+    def chave_do_cursor(linha):
+        chave = linha[campo]
+        return (chave.isoformat() if campo == 'lancamento' else chave), linha['id']
+
+    return jogos.order_by(f'{sinal}{campo}', f'{sinal}id').values(*CAMPOS_LISTA)[:limite + 1], chave_do_cursor
+
+
+def _serializar_pagina(linhas, limite, chave_do_cursor):
+    linhas, proximo = _pagina(linhas, limite, chave_do_cursor)
+    return [serializar_jogo(linha) for linha in linhas], proximo
+
+
+def pagina_de_jogos(categoria_id=None, ordem=ORDEM_PADRAO_API, cursor=None, limite=LIMITE_PADRAO):
+    # Retorna (jogos serializados, cursor da próxima página ou None)
+    jogos, chave_do_cursor = _consulta_de_jogos(categoria_id, ordem, cursor, limite)
+    return _serializar_pagina(list(jogos), limite, chave_do_cursor)
+
+
+async def apagina_de_jogos(categoria_id=None, ordem=ORDEM_PADRAO_API, cursor=None, limite=LIMITE_PADRAO):
+    # Versão async de pagina_de_jogos (mesma query)
+    jogos, chave_do_cursor = _consulta_de_jogos(categoria_id, ordem, cursor, limite)
+    return _serializar_pagina([linha async for linha in jogos], limite, chave_do_cursor)
+
+
+def _ranking_da_busca(texto, cursor, limite):
+    # Keyset sobre (bm25, rowid): o ranking não tem índice (depende da consulta),
+    # mas o cursor evita ordenar e descartar as páginas anteriores no Python/OFFSET.
+    # Retorna ([(rowid, pontos)], cursor da próxima página ou None)
+    consulta = montar_consulta_fts(texto)
+    if not consulta or not fts_disponivel():
+        return [], None
+
+    pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+    sql = (
+        f'SELECT rowid, pontos FROM ('
+        f'  SELECT rowid, bm25({TABELA_FTS}, {pesos}) AS pontos FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s'
+        f') AS ranking'
+    )
+    parametros = [consulta]
+    if cursor:
+        pontos, id_ = decodificar_cursor(cursor, _numero)
+        sql += ' WHERE pontos > %s OR (pontos = %s AND rowid > %s)'
+        parametros += [pontos, pontos, id_]
+    sql += ' ORDER BY pontos, rowid LIMIT %s'
+    with connection.cursor() as cursor_db:
+        cursor_db.execute(sql, parametros + [limite + 1])
+        return _pagina(cursor_db.fetchall(), limite, lambda linha: (linha[1], linha[0]))
+
+
+async def apagina_da_busca(texto, cursor=None, limite=LIMITE_PADRAO):
+    ranking, proximo = await sync_to_async(_ranking_da_busca)(texto, cursor, limite)
+    if not ranking:
+        return [], proximo
+
+    # Uma query para os jogos da página, na ordem do ranking
+    ids = [id_ for id_, _ in ranking]
+    linhas = {linha['id']: linha async for linha in Jogo.objects.filter(id__in=ids, deletado=False).values(*CAMPOS_LISTA)}
+    return [serializar_jogo(linhas[id_]) for id_ in ids if id_ in linhas], proximo
+
+
+@require_GET
+async def api_jogos(request):
+    ordem = request.GET.get('ordem') or ORDEM_PADRAO_API
+    if ordem not in ORDENACOES_API:
+        return _erro(f'Ordem inválida. Use: {", ".join(ORDENACOES_API)}.')
+
+    categoria_id = request.GET.get('categoria')
+    if categoria_id:
+        if not categoria_id.isdigit() or not await Categoria.objects.filter(id=categoria_id).aexists():
+            return _erro('Categoria não encontrada.', status=404)
+        categoria_id = int(categoria_id)
+
+    try:
+        jogos, proximo = await apagina_de_jogos(
+            categoria_id or None, ordem, request.GET.get('cursor'), ler_limite(request.GET)
+        )
+    except ParametroInvalido as erro:
+        return _erro(str(erro))
+    return JsonResponse({'resultados': jogos, 'proximo': proximo})
+
+
+@require_GET
+async def api_busca(request):
+    try:
+        jogos, proximo = await apagina_da_busca(request.GET.get('q'), request.GET.get('cursor'), ler_limite(request.GET))
+    except ParametroInvalido as erro:
+        return _erro(str(erro))
+    return JsonResponse({'resultados': jogos, 'proximo': proximo})
+
+
+# --- detalhe ---
+@require_GET
+async def api_jogo_detalhe(request, jogo_id):
+    jogo = await Jogo.objects.filter(id=jogo_id, deletado=False).values(*CAMPOS_DETALHE).afirst()
+    if jogo is None:
+        return _erro('Jogo não encontrado.', status=404)
+    jogo = serializar_jogo(jogo)
+    jogo['categorias'] = [
+        categoria async for categoria in Categoria.objects.filter(jogos=jogo_id).order_by('nome').values('id', 'nome')
+    ]
+    return JsonResponse(jogo)
+
+
+@require_GET
+async def api_jogo_imagens(request, jogo_id):
+    if not await Jogo.objects.filter(id=jogo_id, deletado=False).aexists():
+        return _erro('Jogo não encontrado.', status=404)
+    imagens = ImagemExtra.objects.filter(jogo_id=jogo_id).order_by('ordem', 'id').values_list('imagem', flat=True)
+    return JsonResponse({
+        'resultados': [
+            {'imagem': _url(nome), 'miniatura': _url(caminho_derivado(nome, 'thumb'))}
+            async for nome in imagens
+        ],
+    })
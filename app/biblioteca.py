@@ -0,0 +1,71 @@
+from django.utils import timezone
+
+from .models import BibliotecaJogo, ItemCompra
+
+# ------- BIBLIOTECA DO USUÁRIO -------
+# Tabela com os jogos que cada usuário possui, escrita de uma vez ao finalizar a compra.
+# O perfil lê só ela (uma query por página) em vez de percorrer todo o histórico de compras.
+# Compras antigas entram com: python manage.py preencher_biblioteca
+TAMANHO_LOTE = 2000
+
+
+def _nome_do_item(nome_snapshot, nome_jogo):
+    # Mesma prioridade do ItemCompra.nome_para_exibicao() no histórico
+    return nome_snapshot or nome_jogo or 'Jogo Removido'
+
+
+def adicionar_a_biblioteca(compra, adquirido_em=None):
+    # Uma query para ler os itens e um INSERT em lote; jogos que o usuário já tem são ignorados
+    adquirido_em = adquirido_em or timezone.now()
+    itens = compra.itens.values_list('jogo_id', 'nome_snapshot', 'jogo__nome')
+    BibliotecaJogo.objects.bulk_create(
+        [
+            BibliotecaJogo(
+                usuario_id=compra.usuario_id,
+                jogo_id=jogo_id,
+                compra=compra,
+                nome_snapshot=_nome_do_item(nome_snapshot, nome_jogo),
+                adquirido_em=adquirido_em,
+            )
+            for jogo_id, nome_snapshot, nome_jogo in itens
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def biblioteca_do_usuario(usuario_id):
+    return (
+        BibliotecaJogo.objects.filter(usuario_id=usuario_id)
+        .select_related('jogo')
+        .order_by('-adquirido_em', '-id')
+    )
+
+
+def preencher_biblioteca(tamanho_lote=TAMANHO_LOTE):
+    # Backfill das compras finalizadas que ainda não têm nenhuma entrada na biblioteca.
+    # Vai da compra mais antiga para a mais nova, então a data de aquisição é a da primeira compra.
+    # Pode rodar de novo sem duplicar: jogos repetidos caem no unique (usuario, jogo)
+    ja_preenchidas = BibliotecaJogo.objects.filter(compra__isnull=False).values('compra_id')
+    itens = (
+        ItemCompra.objects.filter(compra__status='finalizada')
+        .exclude(compra_id__in=ja_preenchidas)
+        .order_by('compra__data_compra', 'compra_id', 'id')
+        .values_list('compra__usuario_id', 'jogo_id', 'compra_id', 'nome_snapshot', 'jogo__nome', 'compra__data_compra')
+    )
+
+    lidos = 0
+    lote = []
+    for usuario_id, jogo_id, compra_id, nome_snapshot, nome_jogo, data_compra in itens.iterator(chunk_size=tamanho_lote):
+        lote.append(BibliotecaJogo(
+            usuario_id=usuario_id,
+            jogo_id=jogo_id,
+            compra_id=compra_id,
+            nome_snapshot=_nome_do_item(nome_snapshot, nome_jogo),
+            adquirido_em=data_compra,
+        ))
+        if len(lote) == tamanho_lote:
+            BibliotecaJogo.objects.bulk_create(lote, ignore_conflicts=True)
+            lidos += len(lote)
+            lote = []
+    BibliotecaJogo.objects.bulk_create(lote, ignore_conflicts=True)
+    return lidos + len(lote)
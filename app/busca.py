@@ -0,0 +1,383 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .catalogo import filtrar_jogos, ler_filtros, tem_filtros
+from .models import Jogo
+from .versoes import versao_atual
+
+# ------- BUSCA FULL-TEXT (SQLite FTS5) -------
+# Índice com nome, autoria e descrição dos jogos vivos (deletado=False).
+# O rowid do índice é o id do Jogo. É mantido pelos signals de Jogo (ver signals.py)
+# e pode ser reconstruído com: python manage.py reindexar_busca
+TABELA_FTS = 'app_jogo_fts'
+
+# Pesos do BM25 por coluna (nome, autoria, descricao): achar no nome vale muito mais
+PESOS_BM25 = (10.0, 3.0, 1.0)
+
+
+def fts_disponivel():
+    # FTS5 só existe no SQLite; em outro banco a busca volta a usar icontains
+    return connection.vendor == 'sqlite'
+
+
+def montar_consulta_fts(texto):
+    # Cada palavra vira um termo entre aspas com prefixo ("zeld"* acha "Zelda").
+    # As aspas impedem que o usuário use a sintaxe do FTS (AND, NEAR, colunas...)
+    palavras = re.findall(r'\w+', texto or '')
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def indexar_jogos(jogos):
+    # (Re)indexa os jogos informados; jogos deletados saem do índice
+    if not fts_disponivel():
+        return
+    jogos = list(jogos)
+    if not jogos:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABELA_FTS} WHERE rowid = %s',
+            [(jogo.id,) for jogo in jogos],
+        )
+        cursor.executemany(
+            f'INSERT INTO {TABELA_FTS} (rowid, nome, autoria, descricao) VALUES (%s, %s, %s, %s)',
+            [(jogo.id, jogo.nome, jogo.autoria, jogo.descricao) for jogo in jogos if not jogo.deletado],
+        )
+
+
+def remover_do_indice(ids):
+    if not fts_disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABELA_FTS} WHERE rowid = %s', [(id_,) for id_ in ids])
+
+
+def reconstruir_indice():
+    # Apaga tudo e reindexa todos os jogos vivos direto no banco (INSERT ... SELECT)
+    if not fts_disponivel():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA_FTS}')
+        cursor.execute(
+            f'INSERT INTO {TABELA_FTS} (rowid, nome, autoria, descricao) '
+            f'SELECT id, nome, autoria, descricao FROM {Jogo._meta.db_table} WHERE NOT deletado'
+        )
+        cursor.execute(f"INSERT INTO {TABELA_FTS} ({TABELA_FTS}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABELA_FTS}')
+        return cursor.fetchone()[0]
+
+
+class ResultadoBusca:
+    # Resultado "preguiçoso" no formato que o Paginator espera (count() e slice).
+    # Só busca no banco a página pedida, já ordenada pelo BM25.
+    def __init__(self, consulta_fts):
+        self.consulta_fts = consulta_fts
+        self._total = None
+
+    def count(self):
+        if self._total is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT count(*) FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s',
+                    [self.consulta_fts],
+                )
+                self._total = cursor.fetchone()[0]
+        return self._total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, fatia):
+        if not isinstance(fatia, slice):
+            return self[fatia:fatia + 1][0]
+
+        inicio = fatia.start or 0
+        limite = -1 if fatia.stop is None else max(fatia.stop - inicio, 0)
+        pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s '
+                f'ORDER BY bm25({TABELA_FTS}, {pesos}) LIMIT %s OFFSET %s',
+                [self.consulta_fts, limite, inicio],
+            )
+            ids = [linha[0] for linha in cursor.fetchall()]
+
+        # Uma query para os jogos da página, mantendo a ordem do ranking
+        jogos = Jogo.objects.filter(deletado=False).in_bulk(ids)
+        return [jogos[id_] for id_ in ids if id_ in jogos]
+
+
+def buscar_jogos(texto, filtros=None):
+    # Retorna algo paginável com os jogos que batem com o texto, do mais relevante ao menos.
+    # Com filtros (ordem / faixa de preço, ver catalogo.ler_filtros) vira um queryset comum:
+    # o FTS só diz quais jogos batem e a ordem/faixa são aplicadas no banco
+    consulta = montar_consulta_fts(texto)
+    if not consulta:
+        return Jogo.objects.none()
+
+    if fts_disponivel():
+        if not (filtros and tem_filtros(filtros)):
+            return ResultadoBusca(consulta)
+        jogos = Jogo.objects.filter(
+            deletado=False,
+            id__in=RawSQL(f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s', [consulta]),
+        )
+    else:
+        # Sem FTS: a busca antiga com icontains (sem ranking)
+        jogos = Jogo.objects.filter(
+            Q(nome__icontains=texto) | Q(autoria__icontains=texto) | Q(descricao__icontains=texto),
+            deletado=False,
+        )
+    return filtrar_jogos(jogos, filtros or ler_filtros({}), ordem_padrao=('nome', 'id'))
+
+
+# ------- AUTOCOMPLETE (índice em memória) -------
+# Cada worker guarda na memória os nomes dos jogos vivos, já normalizados
+# (sem acento e sem maiúsculas), com o label, id e url do ícone pré-calculados.
+# A busca por prefixo é feita com bisect numa lista ordenada de (palavra, id),
+# sem tocar no banco.
+#
+# - é carregado quando o worker sobe (config/wsgi.py e asgi.py) ou no primeiro uso;
+# - o processo que alterou um Jogo atualiza o próprio índice de forma incremental (signals.py)
+#   e, só se mudou o que o autocomplete mostra (nome, ícone, soft delete), troca o token
+#   de mudanças no cache compartilhado;
+# - os outros workers veem o token novo e leem do banco só os jogos alterados desde a
+#   última leitura (Jogo.atualizado_em, que tem índice), sem recarregar tudo;
+# - trocar a versão força a recarga completa em todos: importações, gerar_dados e o
+#   hard delete (que não deixa rastro no atualizado_em).
+CHAVE_VERSAO_AUTOCOMPLETE = 'busca:autocomplete:versao'
+CHAVE_MUDANCAS_AUTOCOMPLETE = 'busca:autocomplete:mudancas'
+LIMITE_AUTOCOMPLETE = 10
+# O atualizado_em é tirado no save(), antes do commit: uma transação pode aparecer no banco
+# com data um pouco anterior à última leitura, então cada leitura volta um pouco atrás
+FOLGA_MUDANCAS = timedelta(minutes=5)
+
+
+_CHAVES_AUTOCOMPLETE = [CHAVE_VERSAO_AUTOCOMPLETE, CHAVE_MUDANCAS_AUTOCOMPLETE]
+
+
+def normalizar(texto):
+    # "Ação" -> "acao"
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def palavras_normalizadas(texto):
+    return re.findall(r'\w+', normalizar(texto))
+
+
+def _entrada_autocomplete(id_, nome, icone):
+    return {
+        'label': nome,
+        'value': nome,
+        'id': id_,
+        'icon_url': default_storage.url(icone) if icone else '',
+    }
+
+
+class IndiceAutocomplete:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = {}  # id -> dict pronto para o JSON
+        self._nomes = {}     # id -> nome normalizado
+        self._ordenados = [] # lista ordenada de (nome normalizado, id): busca pelo começo do nome
+        self._palavras = []  # lista ordenada de (palavra, id): busca pelo começo de qualquer palavra
+        self.versao = None
+        self.mudancas = None  # token de mudanças já aplicado
+        self.marca = None     # início da última leitura do banco
+        self.carregado = False
+
+    # --- escrita ---
+    def carregar(self):
+        versao = versao_atual(CHAVE_VERSAO_AUTOCOMPLETE)
+        mudancas = versao_atual(CHAVE_MUDANCAS_AUTOCOMPLETE)
+        marca = timezone.now()
+        jogos = Jogo.objects.filter(deletado=False).values_list('id', 'nome', 'icone')
+
+        entradas, nomes, palavras = {}, {}, []
+        for id_, nome, icone in jogos.iterator(chunk_size=2000):
+            entradas[id_] = _entrada_autocomplete(id_, nome, icone)
+            nomes[id_] = normalizar(nome)
+            palavras.extend((palavra, id_) for palavra in set(palavras_normalizadas(nome)))
+        palavras.sort()
+        ordenados = sorted((nome, id_) for id_, nome in nomes.items())
+
+        with self._lock:
+            self._entradas, self._nomes = entradas, nomes
+            self._ordenados, self._palavras = ordenados, palavras
+            self.versao, self.mudancas, self.marca = versao, mudancas, marca
+            self.carregado = True
+
+    def carregar_mudancas(self):
+        # Só os jogos alterados (por outro processo) desde a última leitura
+        mudancas = versao_atual(CHAVE_MUDANCAS_AUTOCOMPLETE)
+        marca = timezone.now()
+        alterados = list(
+            Jogo.objects.filter(atualizado_em__gte=self.marca - FOLGA_MUDANCAS)
+            .values_list('id', 'nome', 'icone', 'deletado')
+        )
+        with self._lock:
+            for linha in alterados:
+                self._aplicar(*linha)
+            self.mudancas, self.marca = mudancas, marca
+
+    @staticmethod
+    def _tirar_da_lista(lista, item):
+        posicao = bisect.bisect_left(lista, item)
+        if posicao < len(lista) and lista[posicao] == item:
+            del lista[posicao]
+
+    def _remover(self, id_):
+        nome = self._nomes.pop(id_, None)
+        self._entradas.pop(id_, None)
+        if nome is None:
+            return
+        self._tirar_da_lista(self._ordenados, (nome, id_))
+        for palavra in set(re.findall(r'\w+', nome)):
+            self._tirar_da_lista(self._palavras, (palavra, id_))
+
+    def _aplicar(self, id_, nome, icone, deletado):
+        # Retorna se o que o autocomplete mostra do jogo mudou
+        entrada = None if deletado else _entrada_autocomplete(id_, nome, icone)
+        if self._entradas.get(id_) == entrada:
+            return False
+        self._remover(id_)
+        if entrada is not None:
+            self._entradas[id_] = entrada
+            self._nomes[id_] = normalizar(nome)
+            bisect.insort(self._ordenados, (self._nomes[id_], id_))
+            for palavra in set(palavras_normalizadas(nome)):
+                bisect.insort(self._palavras, (palavra, id_))
+        return True
+
+    def atualizar(self, jogo):
+        # Aplica a mudança de um jogo (novo, editado, soft delete) no índice deste processo.
+        # Retorna se mudou alguma coisa (editar só o preço, por exemplo, não muda)
+        with self._lock:
+            return self._aplicar(jogo.id, jogo.nome, jogo.icone.name, jogo.deletado)
+
+    def remover(self, id_):
+        with self._lock:
+            self._remover(id_)
+
+    # --- leitura ---
+    def _pendente(self, versoes):
+        # O que falta para ficar em dia com as versões lidas do cache (None: já está)
+        if not self.carregado or versoes.get(CHAVE_VERSAO_AUTOCOMPLETE) != self.versao:
+            return self.carregar
+        if versoes.get(CHAVE_MUDANCAS_AUTOCOMPLETE) != self.mudancas:
+            return self.carregar_mudancas
+        return None
+
+    def _sincronizar(self):
+        pendente = self._pendente(cache.get_many(_CHAVES_AUTOCOMPLETE))
+        if pendente is not None:
+            pendente()
+
+    @staticmethod
+    def _com_prefixo(lista, prefixo):
+        # Percorre só o trecho da lista ordenada que começa com o prefixo
+        for posicao in range(bisect.bisect_left(lista, (prefixo,)), len(lista)):
+            texto, id_ = lista[posicao]
+            if not texto.startswith(prefixo):
+                break
+            yield id_
+
+    @staticmethod
+    def _quantos_com_prefixo(lista, prefixo):
+        # Tamanho do trecho com o prefixo, com duas buscas binárias (sem percorrer)
+        return bisect.bisect_left(lista, (prefixo + '\U0010ffff',)) - bisect.bisect_left(lista, (prefixo,))
+
+    @staticmethod
+    def _tem_todas(nome, prefixos):
+        palavras = re.findall(r'\w+', nome)
+        return all(any(palavra.startswith(prefixo) for palavra in palavras) for prefixo in prefixos)
+
+    def buscar(self, termo, limite=LIMITE_AUTOCOMPLETE):
+        termos = palavras_normalizadas(termo)
+        if not termos:
+            return []
+        self._sincronizar()
+        return self._procurar(termos, limite)
+
+    async def abuscar(self, termo, limite=LIMITE_AUTOCOMPLETE):
+        # Para as views async (ASGI): a busca é só memória e roda no próprio event loop.
+        # Só a conferência das versões no cache e uma eventual leitura do banco vão para thread
+        termos = palavras_normalizadas(termo)
+        if not termos:
+            return []
+        pendente = self._pendente(await cache.aget_many(_CHAVES_AUTOCOMPLETE))
+        if pendente is not None:
+            await sync_to_async(pendente)()
+        return self._procurar(termos, limite)
+
+    def _procurar(self, termos, limite):
+        termo_normalizado = ' '.join(termos)
+
+        with self._lock:
+            # 1. Nomes que começam com o que foi digitado, já em ordem alfabética.
+            #    Com poucas letras digitadas isso quase sempre já enche a lista
+            melhores = list(itertools.islice(self._com_prefixo(self._ordenados, termo_normalizado), limite))
+
+            if len(melhores) < limite:
+                # 2. Completa com nomes em que todas as palavras digitadas são prefixo
+                #    de alguma palavra do nome (ex: "wild" acha "Zelda Breath of the Wild").
+                #    Começa pela palavra que menos nomes têm (a mais seletiva): a mais longa
+                #    nem sempre é ("jogo" x "tact" em "Jogo 8 Tact")
+                termos.sort(key=lambda termo: self._quantos_com_prefixo(self._palavras, termo))
+                ids = set(self._com_prefixo(self._palavras, termos[0]))
+                ids.difference_update(melhores)
+                if len(termos) > 1:
+                    # As outras palavras são conferidas só nos poucos candidatos que sobraram
+                    ids = {id_ for id_ in ids if self._tem_todas(self._nomes[id_], termos[1:])}
+                melhores += heapq.nsmallest(limite - len(melhores), ids, key=lambda id_: (self._nomes[id_], id_))
+
+            return [self._entradas[id_] for id_ in melhores]
+
+
+indice_autocomplete = IndiceAutocomplete()
+
+
+def carregar_indice_autocomplete():
+    # Chamado na subida do worker; se o banco ainda não existe (antes do migrate) carrega no primeiro uso
+    try:
+        indice_autocomplete.carregar()
+    except DatabaseError:
+        pass
+
+
+def jogo_alterado_autocomplete(jogo=None, id_removido=None):
+    # Depois do commit: atualiza o índice deste processo e avisa os outros workers
+    def aplicar():
+        em_dia = indice_autocomplete._pendente(cache.get_many(_CHAVES_AUTOCOMPLETE)) is None
+        if id_removido is not None:
+            # Hard delete: some do banco sem deixar rastro, os outros recarregam tudo
+            indice_autocomplete.remover(id_removido)
+            chave, atributo = CHAVE_VERSAO_AUTOCOMPLETE, 'versao'
+        elif indice_autocomplete.atualizar(jogo) or not em_dia:
+            # Sem o índice em dia não dá para saber se mudou: avisa do mesmo jeito
+            chave, atributo = CHAVE_MUDANCAS_AUTOCOMPLETE, 'mudancas'
+        else:
+            return
+
+        novo = uuid.uuid4().hex
+        cache.set(chave, novo, None)
+        if em_dia:
+            # Este processo já tem a mudança aplicada, não precisa ler de novo
+            setattr(indice_autocomplete, atributo, novo)
+
+    transaction.on_commit(aplicar)
@@ -0,0 +1,157 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Categoria, Jogo
+from .versoes import trocar_versao, versao_atual
+
+# ------- CACHE DE PÁGINAS INTEIRAS (visitantes) -------
+# A maior parte do tráfego da vitrine (home, categoria, detalhe do jogo) é de quem não
+# está logado, e para essas pessoas a página é igual para todo mundo. O HTML pronto fica
+# no cache compartilhado (CACHES['paginas']), com a chave feita da URL completa
+# (caminho + query string) e da versão do catálogo. Um acerto não roda a view nem os
+# context processors.
+#
+# Qualquer escrita no catálogo troca a versão (invalidar_paginas): signals de Jogo,
+# Categoria e ImagemExtra (painel, /admin e shell), catalogo.marcar_jogos_alterados,
+# as ações em massa do painel e a importação.
+#
+# Fica de fora do cache (a view roda normalmente):
+# - usuário logado ou requisição que não é GET;
+# - visitante com mensagens pendentes (django.contrib.messages), para ninguém perdê-las;
+# e a resposta só é guardada se for um 200 sem cookies, sem token CSRF e sem mexer na
+# sessão: uma página com o token de um visitante não pode ser servida para outro.
+CACHE_PAGINAS = 'paginas'
+CHAVE_VERSAO_PAGINAS = 'paginas:versao'
+# A versão já invalida o que muda pelo catálogo; o prazo só limita o resto
+# (ex: o sorteio dos jogos relacionados fica o mesmo por até TEMPO_PAGINAS)
+TEMPO_PAGINAS = 60 * 10
+
+
+def invalidar_paginas():
+    trocar_versao(CHAVE_VERSAO_PAGINAS)
+
+
+def _pode_usar_cache(request):
+    # len() das mensagens não as marca como lidas
+    return request.method == 'GET' and not request.user.is_authenticated and not len(get_messages(request))
+
+
+def _pode_guardar(request, response):
+    sessao = getattr(request, 'session', None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not (sessao is not None and sessao.modified)
+    )
+
+
+def _chave(request):
+    # A versão é lida antes de a view rodar: se o catálogo mudar no meio,
+    # a página vai para uma versão que já morreu
+    caminho = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'paginas:{versao_atual(CHAVE_VERSAO_PAGINAS)}:{caminho}'
+
+
+def cache_para_visitantes(view):
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if not _pode_usar_cache(request):
+            return view(request, *args, **kwargs)
+
+        paginas = caches[CACHE_PAGINAS]
+        chave = _chave(request)
+        guardada = paginas.get(chave)
+        if guardada is not None:
+            conteudo, tipo = guardada
+            return HttpResponse(conteudo, content_type=tipo)
+
+        response = view(request, *args, **kwargs)
+        if _pode_guardar(request, response):
+            paginas.set(chave, (response.content, response['Content-Type']), TEMPO_PAGINAS)
+        return response
+    return _view
+
+
+# ------- GET CONDICIONAL (ETag / Last-Modified) -------
+# Navegador e CDN revalidam a página com If-None-Match / If-Modified-Since e, se o
+# catálogo não mudou, recebem um 304 sem corpo: o condition() do Django responde antes
+# de a view (e o cache de páginas) rodar.
+# - Last-Modified: a mudança mais recente em Jogo/Categoria (atualizado_em), dois MAX()
+#   que o SQLite responde pelo fim do índice. O resultado fica no cache sob a versão das
+#   páginas (toda escrita no catálogo troca as duas coisas), então a revalidação
+#   normalmente não toca no banco (o autocomplete continua sem query nenhuma);
+# - ETag: essa data mais a versão das páginas, que também muda quando algo é apagado
+#   (apagar não deixa data nova para trás).
+# Nas páginas da vitrine vale só para visitantes: a navbar de quem está logado
+# (nome, contagem do carrinho) muda sem o catálogo mudar.
+TEMPO_ULTIMA_ALTERACAO = 60 * 60 * 24
+
+
+def ultima_alteracao_catalogo():
+    datas = [
+        Jogo.objects.aggregate(maior=Max('atualizado_em'))['maior'],
+        Categoria.objects.aggregate(maior=Max('atualizado_em'))['maior'],
+    ]
+    return max((data for data in datas if data is not None), default=None)
+
+
+def _versao_catalogo(request):
+    # O condition() pede o ETag e o Last-Modified separadamente: calcula uma vez por requisição
+    if not hasattr(request, '_versao_catalogo'):
+        versao = versao_atual(CHAVE_VERSAO_PAGINAS)
+        chave = f'paginas:ultima_alteracao:{versao}'
+        ultima = cache.get(chave)
+        if ultima is None:
+            ultima = ultima_alteracao_catalogo()
+            cache.set(chave, ultima, TEMPO_ULTIMA_ALTERACAO)
+        marca = f'{ultima.isoformat() if ultima else ""}:{versao}'
+        request._versao_catalogo = (hashlib.md5(marca.encode()).hexdigest(), ultima)
+    return request._versao_catalogo
+
+
+def etag_catalogo(request, *args, **kwargs):
+    return _versao_catalogo(request)[0]
+
+
+def ultima_alteracao(request, *args, **kwargs):
+    return _versao_catalogo(request)[1]
+
+
+def catalogo_condicional(view):
+    condicional = condition(etag_func=etag_catalogo, last_modified_func=ultima_alteracao)(view)
+    if not iscoroutinefunction(view):
+        return condicional
+
+    @wraps(view)
+    async def _view(request, *args, **kwargs):
+        # O condition() chama as funções acima sem await: numa view async a versão é
+        # calculada antes, numa thread só (cache e, se faltar, os MAX() no banco), e ele
+        # só lê o que ficou guardado na requisição
+        await sync_to_async(_versao_catalogo)(request)
+        return await condicional(request, *args, **kwargs)
+    return _view
+
+
+def condicional_para_visitantes(view):
+    condicional = catalogo_condicional(view)
+
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        response = condicional(request, *args, **kwargs)
+        # Sem isso o navegador pode reaproveitar a página por conta própria (cache
+        # heurístico pelo Last-Modified) em vez de perguntar se mudou
+        patch_cache_control(response, no_cache=True)
+        return response
+    return _view
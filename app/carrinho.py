@@ -0,0 +1,309 @@
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .biblioteca import adicionar_a_biblioteca
+from .models import Compra, ItemCompra, Jogo
+from .precos import (
+    centavos, dezmilesimos_em_reais, em_reais, preco_final_dezmilesimos, preco_lista_dezmilesimos,
+)
+from .versoes import trocar_versao, versao_atual
+
+# ------- CONTADOR DO CARRINHO (badge da navbar) -------
+# O contador fica em cache por usuário junto com a versão ("geração") do carrinho.
+# Toda escrita no carrinho troca a geração, então um valor calculado antes da
+# escrita nunca mais é aceito, mesmo que outro processo grave ele no cache atrasado.
+# A geração tem duas partes: a do usuário e uma global, trocada quando uma escrita
+# em massa mexe no carrinho de vários usuários (ex: jogo deletado sai de todos).
+TEMPO_CONTAGEM = 60 * 60 * 24
+CHAVE_GERACAO_CARRINHOS = 'carrinho:geracao'
+
+
+def _chave_geracao(usuario_id):
+    return f'carrinho:geracao:{usuario_id}'
+
+
+def _chave_contagem(usuario_id):
+    return f'carrinho:itens:{usuario_id}'
+
+
+def contar_itens_carrinho(usuario_id):
+    # Soma das quantidades do carrinho (pendente) do usuário, vinda do cache quando possível
+    chaves_geracao = [CHAVE_GERACAO_CARRINHOS, _chave_geracao(usuario_id)]
+    chave_contagem = _chave_contagem(usuario_id)
+
+    valores = cache.get_many([*chaves_geracao, chave_contagem])
+    geracao = tuple(valores.get(chave) for chave in chaves_geracao)
+    contagem = valores.get(chave_contagem)
+
+    if None not in geracao and contagem is not None and contagem[0] == geracao:
+        return contagem[1]
+
+    geracao = tuple(
+        versao if versao is not None else versao_atual(chave)
+        for chave, versao in zip(chaves_geracao, geracao)
+    )
+
+    total = ItemCompra.objects.filter(
+        compra__usuario_id=usuario_id,
+        compra__status='pendente',
+    ).aggregate(total=Sum('quantidade'))['total'] or 0
+
+    cache.set(chave_contagem, (geracao, total), TEMPO_CONTAGEM)
+    return total
+
+
+def invalidar_contagem_carrinho(usuario_id):
+    if usuario_id is not None:
+        trocar_versao(_chave_geracao(usuario_id))
+
+
+def usuario_do_item(item):
+    # Evita query quando a compra já veio junto com o item
+    if ItemCompra._meta.get_field('compra').is_cached(item):
+        return item.compra.usuario_id
+    return Compra.objects.filter(pk=item.compra_id).values_list('usuario_id', flat=True).first()
+
+
+# ------- OPERAÇÕES DO CARRINHO -------
+# Cada operação roda numa transação só, com um número fixo de queries,
+# não importa quantos itens o carrinho tenha:
+# - a quantidade muda com F() (o banco soma, sem ler-modificar-gravar no Python);
+# - o valor_total é recalculado com um único UPDATE ... = (SELECT SUM(...)).
+# As expressões de preço (centavos, desconto, arredondamento) estão em precos.py.
+def preco_item_dezmilesimos():
+    # Mesma regra do ItemCompra.subtotal(), só que calculada no banco:
+    # jogo deletado no carrinho vale 0, jogo apagado usa o preço salvo, senão preço com desconto
+    return Case(
+        When(jogo__isnull=True, then=centavos('preco_unitario') * 100),
+        When(jogo__deletado=True, then=Value(0)),
+        default=preco_final_dezmilesimos(),
+        output_field=IntegerField(),
+    )
+
+
+def _total_calculado(sem_itens=None):
+    # valor_total da compra externa (OuterRef), calculado no banco.
+    # sem_itens: queryset de itens que não entram na soma (vão ser apagados em seguida)
+    itens = ItemCompra.objects.filter(compra=OuterRef('pk'))
+    if sem_itens is not None:
+        itens = itens.exclude(id__in=sem_itens.values('id'))
+    soma_itens = (
+        itens
+        .values('compra')
+        .annotate(total=Sum(preco_item_dezmilesimos() * F('quantidade')))
+        .values('total')
+    )
+    return dezmilesimos_em_reais(Coalesce(Subquery(soma_itens), Value(0)))
+
+
+def recalcular_totais(compras, sem_itens=None):
+    # Um único UPDATE recalcula o valor_total de todas as compras do queryset
+    # (ex: todos os carrinhos com um jogo que mudou de preço), não importa quantas sejam
+    return compras.update(valor_total=_total_calculado(sem_itens))
+
+
+def carrinhos_com_total_errado():
+    # Carrinhos cujo valor_total salvo não bate com os itens (usado por verificar_carrinhos)
+    return (
+        Compra.objects.filter(status='pendente')
+        .annotate(total_calculado=_total_calculado())
+        .exclude(valor_total=F('total_calculado'))
+    )
+
+
+def recalcular_total(compra_id):
+    recalcular_totais(Compra.objects.filter(pk=compra_id))
+
+
+def recalcular_carrinhos_com_jogos(jogos):
+    # Carrinhos (pendentes) que têm algum dos jogos; jogos pode ser uma lista de ids ou um queryset
+    return recalcular_totais(
+        Compra.objects.filter(
+            status='pendente',
+            id__in=ItemCompra.objects.filter(jogo__in=jogos).values('compra_id'),
+        )
+    )
+
+
+# ------- JOGOS DELETADOS NOS CARRINHOS -------
+# Deletar um jogo (soft ou hard delete) tira ele de todos os carrinhos pendentes na hora,
+# com um UPDATE dos totais e um DELETE dos itens, não importa quantos carrinhos sejam.
+# Assim nenhuma página precisa limpar o carrinho na leitura.
+# Conferência/correção: python manage.py verificar_carrinhos [--corrigir]
+def _apagar_itens(itens):
+    # DELETE direto: o queryset.delete() buscaria os itens e mandaria um post_delete por item
+    subconsulta, parametros = itens.values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {ItemCompra._meta.db_table} WHERE id IN ({subconsulta})', parametros)
+        return cursor.rowcount
+
+
+@transaction.atomic
+def remover_dos_carrinhos(itens):
+    # Tira os itens (queryset de ItemCompra) dos carrinhos pendentes. Retorna quantos saíram
+    itens = itens.filter(compra__status='pendente')
+    recalcular_totais(
+        Compra.objects.filter(status='pendente', id__in=itens.values('compra_id')),
+        sem_itens=itens,
+    )
+    removidos = _apagar_itens(itens)
+    if removidos:
+        # Os badges de todos os usuários de uma vez (sem saber quem tinha o jogo)
+        trocar_versao(CHAVE_GERACAO_CARRINHOS)
+    return removidos
+
+
+def tirar_jogos_dos_carrinhos(jogo_ids):
+    jogo_ids = list(jogo_ids)
+    if not jogo_ids:
+        return 0
+    return remover_dos_carrinhos(ItemCompra.objects.filter(jogo_id__in=jogo_ids))
+
+
+def itens_invalidos_nos_carrinhos():
+    # Itens de carrinhos pendentes com jogo deletado (soft) ou apagado (NULL)
+    return ItemCompra.objects.filter(compra__status='pendente').filter(
+        Q(jogo__isnull=True) | Q(jogo__deletado=True)
+    )
+
+
+def obter_carrinho(usuario):
+    # Carrinho = a compra pendente do usuário (cria se não existir)
+    carrinho = Compra.objects.filter(usuario=usuario, status='pendente').order_by('id').first()
+    if carrinho is None:
+        try:
+            with transaction.atomic():
+                carrinho = Compra.objects.create(usuario=usuario, status='pendente', valor_total=0)
+        except IntegrityError:
+            # Outra aba criou o carrinho ao mesmo tempo
+            carrinho = Compra.objects.filter(usuario=usuario, status='pendente').order_by('id').first()
+    return carrinho
+
+
+@transaction.atomic
+def adicionar_item(usuario, jogo_id):
+    carrinho = obter_carrinho(usuario)
+    itens = ItemCompra.objects.filter(compra=carrinho, jogo_id=jogo_id)
+
+    if not itens.update(quantidade=F('quantidade') + 1):
+        # Ainda não está no carrinho: cria com o preço atual do jogo
+        preco = Jogo.objects.filter(pk=jogo_id, deletado=False).values_list('preco', flat=True).first()
+        if preco is None:
+            raise Jogo.DoesNotExist(f'Jogo {jogo_id} não existe ou foi deletado')
+        try:
+            with transaction.atomic():
+                ItemCompra.objects.create(compra=carrinho, jogo_id=jogo_id, preco_unitario=preco, quantidade=1)
+        except IntegrityError:
+            # Outra aba adicionou o mesmo jogo entre o UPDATE e o INSERT (unique compra+jogo)
+            itens.update(quantidade=F('quantidade') + 1)
+
+    recalcular_total(carrinho.pk)
+    # update() não dispara signals
+    invalidar_contagem_carrinho(usuario.id)
+    return carrinho
+
+
+@transaction.atomic
+def remover_item(usuario, item_id):
+    # Tira uma unidade do item (ou o item inteiro se só tinha uma).
+    # Só mexe em itens do carrinho do próprio usuário
+    compra_id = ItemCompra.objects.filter(
+        pk=item_id, compra__usuario=usuario, compra__status='pendente',
+    ).values_list('compra_id', flat=True).first()
+    if compra_id is None:
+        raise ItemCompra.DoesNotExist(f'Item {item_id} não está no carrinho')
+
+    if not ItemCompra.objects.filter(pk=item_id, quantidade__gt=1).update(quantidade=F('quantidade') - 1):
+        ItemCompra.objects.filter(pk=item_id).delete()
+
+    recalcular_total(compra_id)
+    invalidar_contagem_carrinho(usuario.id)
+
+
+# ------- FINALIZAÇÃO -------
+# Uma transação com um número fixo de queries, não importa o tamanho do carrinho:
+# 1. token já usado (formulário enviado duas vezes): devolve a compra que ele finalizou;
+# 2. UPDATE condicional (... WHERE status = 'pendente') troca o status e grava o total:
+#    de dois envios ao mesmo tempo, só um ainda encontra o carrinho pendente;
+# 3. os itens de jogos deletados (soft), que já valiam 0 no total, saem da compra:
+#    não são cobrados, não ficam no histórico e não vão para a biblioteca;
+# 4. um UPDATE congela preço com desconto, desconto e nome de todos os itens;
+# 5. os jogos entram na biblioteca (ver biblioteca.py).
+def _do_jogo(expressao):
+    # Valor calculado a partir do Jogo do item; update() não aceita joins (jogo__...) direto
+    return Subquery(Jogo.objects.filter(pk=OuterRef('jogo_id')).annotate(valor=expressao).values('valor'))
+
+
+@transaction.atomic
+def finalizar_carrinho(usuario_id, token=None):
+    # Retorna (compra, finalizou_agora); (None, False) se não havia carrinho
+    if token:
+        anterior = Compra.objects.filter(usuario_id=usuario_id, token_finalizacao=token).first()
+        if anterior is not None:
+            return anterior, False
+
+    carrinho = Compra.objects.filter(usuario_id=usuario_id, status='pendente').order_by('-data_compra').first()
+    if carrinho is None:
+        return None, False
+
+    # O total é calculado com os mesmos preços que o passo 4 congela
+    finalizadas = Compra.objects.filter(pk=carrinho.pk, status='pendente').update(
+        status='finalizada',
+        finalizada_em=timezone.now(),
+        token_finalizacao=token or None,
+        valor_total=_total_calculado(),
+    )
+    if not finalizadas:
+        return None, False
+
+    _apagar_itens(ItemCompra.objects.filter(compra_id=carrinho.pk, jogo__deletado=True))
+    ItemCompra.objects.filter(compra_id=carrinho.pk, jogo__isnull=False).update(
+        preco_unitario=dezmilesimos_em_reais(_do_jogo(preco_final_dezmilesimos(prefixo=''))),
+        desconto_unitario=dezmilesimos_em_reais(
+            _do_jogo(preco_lista_dezmilesimos(prefixo='') - preco_final_dezmilesimos(prefixo=''))
+        ),
+        nome_snapshot=_do_jogo(F('nome')),
+    )
+    adicionar_a_biblioteca(carrinho)
+    # update() não dispara signals
+    invalidar_contagem_carrinho(usuario_id)
+    return carrinho, True
+
+
+# ------- PÁGINA DO CARRINHO -------
+# Leitura pura: nada é criado, limpo ou salvo num GET. Itens de jogos deletados
+# ficam de fora da página (e do total mostrado) e são tratados na finalização.
+def itens_do_carrinho(usuario_id):
+    # Itens vivos do carrinho com os valores de cada linha já calculados no banco:
+    # preco_lista e preco_final (por unidade), subtotal_linha e desconto_linha (x quantidade)
+    return (
+        ItemCompra.objects.filter(
+            compra__usuario_id=usuario_id,
+            compra__status='pendente',
+            jogo__deletado=False,
+        )
+        .select_related('jogo')
+        .annotate(
+            preco_lista=dezmilesimos_em_reais(preco_lista_dezmilesimos()),
+            preco_final=dezmilesimos_em_reais(preco_final_dezmilesimos()),
+            subtotal_linha=dezmilesimos_em_reais(preco_final_dezmilesimos() * F('quantidade')),
+        )
+        .annotate(desconto_linha=em_reais(F('preco_lista') * F('quantidade') - F('subtotal_linha')))
+        .order_by('id')
+    )
+
+
+def totais_do_carrinho(itens):
+    # Uma query de agregação sobre os mesmos itens. O desconto é a diferença entre os dois,
+    # então subtotal - descontos = total sempre fecha na tela
+    totais = itens.aggregate(
+        subtotal_sem_desconto=dezmilesimos_em_reais(
+            Coalesce(Sum(preco_lista_dezmilesimos() * F('quantidade')), Value(0))
+        ),
+        total=dezmilesimos_em_reais(Coalesce(Sum(preco_final_dezmilesimos() * F('quantidade')), Value(0))),
+    )
+    totais['valor_descontado'] = totais['subtotal_sem_desconto'] - totais['total']
+    return totais
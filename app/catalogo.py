@@ -0,0 +1,137 @@
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .cache_paginas import invalidar_paginas
+from .models import Categoria, Jogo
+from .versoes import trocar_versao, versao_atual
+
+# Quantos jogos cada categoria em destaque mostra na home
+JOGOS_POR_CATEGORIA = 4
+
+# ------- MENU DE CATEGORIAS -------
+# Lista imutável usada pela navbar (base.html) e pelos formulários do painel.
+# Fica no cache compartilhado sob a versão do catálogo de categorias;
+# qualquer save/delete de Categoria troca a versão (ver signals.py).
+CategoriaMenu = namedtuple('CategoriaMenu', ['id', 'nome', 'destaque'])
+
+CHAVE_VERSAO_CATEGORIAS = 'catalogo:categorias:versao'
+TEMPO_CATEGORIAS = 60 * 60 * 24
+
+
+def listar_categorias_menu():
+    chave = f'catalogo:categorias:{versao_atual(CHAVE_VERSAO_CATEGORIAS)}'
+    categorias = cache.get(chave)
+    if categorias is None:
+        categorias = tuple(
+            CategoriaMenu(*linha)
+            for linha in Categoria.objects.order_by('id').values_list('id', 'nome', 'destaque')
+        )
+        cache.set(chave, categorias, TEMPO_CATEGORIAS)
+    return categorias
+
+
+def invalidar_categorias_menu():
+    trocar_versao(CHAVE_VERSAO_CATEGORIAS)
+
+
+# ------- CARDS DOS JOGOS -------
+# card_jogo.html (home, categoria, busca e relacionados) guarda no cache a parte do card
+# que não depende do usuário, uma entrada por jogo. A chave leva o Jogo.atualizado_em,
+# que já vem na linha do jogo: o card muda sozinho quando o jogo muda, sem apagar nada
+# e sem consulta extra. O save() atualiza o campo (auto_now); quem muda o jogo sem
+# save() (update() em massa, categorias, imagens) chama marcar_jogos_alterados.
+# O cache de fragmentos é por processo (CACHES['fragmentos']): como a versão está
+# no banco, um worker nunca serve um card velho, e os sem uso saem pelo MAX_ENTRIES.
+CACHE_FRAGMENTOS = 'fragmentos'
+
+
+def marcar_jogos_alterados(jogo_ids):
+    jogo_ids = list(jogo_ids)
+    if not jogo_ids:
+        return 0
+    invalidar_paginas()
+    return Jogo.objects.filter(id__in=jogo_ids).update(atualizado_em=timezone.now())
+
+
+# ------- HOME -------
+def montar_vitrine():
+    # Monta tudo que a home precisa em um número fixo de queries,
+    # não importa quantas categorias existam:
+    # 1 query para o banner, 1 para o pré-lançamento,
+    # 1 para as categorias em destaque e 1 para os jogos de todas elas.
+    banner_games = list(Jogo.objects.filter(banner=True, deletado=False))
+
+    # Apenas um jogo pode ser pré-lançamento (ver Jogo.save), o .last() é só por segurança
+    pre_venda = Jogo.objects.filter(pre_lancamento=True, deletado=False).last()
+
+    # "Top N por grupo": o Prefetch com slice vira um ROW_NUMBER() OVER (PARTITION BY categoria)
+    # no banco, então cada categoria traz no máximo N+1 jogos em uma única query.
+    # Pegamos um a mais só para saber se precisa do botão "VER MAIS".
+    jogos_vivos = Jogo.objects.filter(deletado=False).order_by('id')[:JOGOS_POR_CATEGORIA + 1]
+    categorias = list(
+        Categoria.objects.filter(destaque=True)
+        .order_by('id')
+        .prefetch_related(Prefetch('jogos', queryset=jogos_vivos, to_attr='jogos_prefetch'))
+    )
+
+    for categoria in categorias:
+        categoria.tem_mais_jogos = len(categoria.jogos_prefetch) > JOGOS_POR_CATEGORIA
+        categoria.jogos_vitrine = categoria.jogos_prefetch[:JOGOS_POR_CATEGORIA]
+
+    return {
+        'banner_games': banner_games,
+        # Chave do carrossel em cache: muda se um jogo entra, sai ou é alterado
+        'versao_banner': [(jogo.id, jogo.atualizado_em) for jogo in banner_games],
+        'pre_venda': pre_venda,
+        'categorias_vitrine': categorias,
+    }
+
+
+# ------- ORDENAÇÃO E FAIXA DE PREÇO (categoria e busca) -------
+# Tudo no banco, sobre o preço com desconto do Jogo.objects.with_prices():
+# ?ordem=preco|-preco|nome|recentes&preco_min=10&preco_max=50
+ORDENACOES = {
+    'preco': ('preco_efetivo', 'id'),
+    '-preco': ('-preco_efetivo', '-id'),
+    'nome': ('nome', 'id'),
+    'recentes': ('-lancamento', '-id'),
+}
+
+
+def _preco(valor):
+    try:
+        preco = Decimal((valor or '').replace(',', '.'))
+    except InvalidOperation:
+        return None
+    return preco if preco.is_finite() and preco >= 0 else None
+
+
+def ler_filtros(parametros):
+    # Filtros vindos da query string; valores inválidos são ignorados
+    ordem = parametros.get('ordem')
+    return {
+        'ordem': ordem if ordem in ORDENACOES else None,
+        'preco_min': _preco(parametros.get('preco_min')),
+        'preco_max': _preco(parametros.get('preco_max')),
+    }
+
+
+def filtros_na_url(filtros):
+    # "&ordem=preco&preco_min=10" para os links de paginação manterem os filtros
+    valores = {nome: valor for nome, valor in filtros.items() if valor is not None}
+    return f'&{urlencode(valores)}' if valores else ''
+
+
+def tem_filtros(filtros):
+    return any(valor is not None for valor in filtros.values())
+
+
+def filtrar_jogos(jogos, filtros, ordem_padrao=('id',)):
+    # Aplica faixa de preço e ordenação a um queryset de Jogo (já com os preços anotados)
+    jogos = jogos.faixa_de_preco(filtros['preco_min'], filtros['preco_max'])
+    return jogos.order_by(*ORDENACOES.get(filtros['ordem'], ordem_padrao))
@@ -1,25 +1,14 @@
-from .models import Compra, ItemCompra, Categoria
-from django.db.models import Sum
+from .carrinho import contar_itens_carrinho
+from .catalogo import listar_categorias_menu
 
 def carrinho_context(request): 
     total_itens_carrinho = 0
     
     # 1. Verifica se o usuário está autenticado
     if request.user.is_authenticated:
-        try:
-            # Busca o carrinho ativo (status='pendente') do usuário
-            carrinho = Compra.objects.get(usuario=request.user, status='pendente')
-            
-            # 2. CALCULA O TOTAL DE QUANTIDADES 
-            # Soma todas as colunas 'quantidade' na tabela ItemCompra relacionadas ao carrinho.
-            soma = carrinho.itens.aggregate(total=Sum('quantidade'))
-            
-            # Pega o resultado da soma; se for None (carrinho vazio), usa 0.
-            total_itens_carrinho = soma['total'] or 0
-            
-        except Compra.DoesNotExist:
-            # Se não encontrou carrinho pendente, total é 0.
-            pass
+        # Soma das quantidades do carrinho (pendente), vinda do cache.
+        # Os signals de ItemCompra/Compra invalidam o valor a cada mudança (ver carrinho.py)
+        total_itens_carrinho = contar_itens_carrinho(request.user.id)
             
     # Retorna o dicionário de contexto.
     return {
@@ -28,4 +17,5 @@ def carrinho_context(request):
 
 def lista_categorias_view(request):
     # Isso torna a variável 'categorias' disponível em TODO o site
-    return {'categorias': Categoria.objects.all()}
\ No newline at end of file
+    # (lista em cache, só volta ao banco quando alguma categoria muda)
+    return {'categorias': listar_categorias_menu()}
\ No newline at end of file
@@ -0,0 +1,151 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .catalogo import marcar_jogos_alterados
+
+logger = logging.getLogger(__name__)
+
+# ------- MINIATURAS (derivados WebP) -------
+# Cada imagem enviada (ícone do jogo e imagens extras) ganha cópias menores em WebP,
+# todas em 16:9, para os templates não servirem o arquivo original nas grades.
+# O caminho é calculado a partir do original, então o template não precisa consultar o banco:
+#   icones/zelda.png -> derivados/card/icones/zelda.webp
+TAMANHOS = {
+    'thumb': (320, 180),    # miniaturas (galeria, carrinho, painel)
+    'card': (640, 360),     # cards das grades (home, categoria, busca, perfil)
+    'banner': (1280, 720),  # carrossel e destaque
+}
+PASTA_DERIVADOS = 'derivados'
+QUALIDADE_WEBP = 80
+WORKERS = 2
+# Quais tamanhos já existem de cada original fica no cache compartilhado, gravado por
+# gerar_derivados/remover_derivados: o template monta o srcset sem consultar o storage
+CHAVE_DERIVADOS = 'imagens:derivados:{}'
+TEMPO_DERIVADOS = 60 * 60 * 24
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def caminho_derivado(nome_original, tamanho):
+    base, _ = os.path.splitext(nome_original)
+    return f'{PASTA_DERIVADOS}/{tamanho}/{base}.webp'
+
+
+def _chave_derivados(nome_original):
+    # Hash: o nome do arquivo pode passar do tamanho de chave que o memcached aceita
+    return CHAVE_DERIVADOS.format(hashlib.md5(nome_original.encode(), usedforsecurity=False).hexdigest())
+
+
+def _registrar_derivados(nome_original, prontos):
+    cache.set(_chave_derivados(nome_original), list(prontos), TEMPO_DERIVADOS)
+    return list(prontos)
+
+
+def derivados_prontos(nome_original):
+    # Tamanhos com miniatura pronta (na ordem de TAMANHOS). Vem do cache; se não estiver
+    # lá (expirou, cache limpo), confere o storage uma vez e guarda
+    prontos = cache.get(_chave_derivados(nome_original))
+    if prontos is None:
+        prontos = _registrar_derivados(nome_original, [
+            tamanho for tamanho in TAMANHOS if default_storage.exists(caminho_derivado(nome_original, tamanho))
+        ])
+    return prontos
+
+
+def gerar_derivados(nome_original, forcar=False):
+    # Gera os derivados que faltam (ou todos, com forcar). Retorna quantos foram escritos
+    faltando = [
+        tamanho for tamanho in TAMANHOS
+        if forcar or not default_storage.exists(caminho_derivado(nome_original, tamanho))
+    ]
+    if not faltando:
+        _registrar_derivados(nome_original, TAMANHOS)
+        return 0
+    if not default_storage.exists(nome_original):
+        return 0
+
+    try:
+        with default_storage.open(nome_original, 'rb') as arquivo:
+            original = ImageOps.exif_transpose(Image.open(arquivo))
+            original = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Não foi possível abrir a imagem %s para gerar miniaturas', nome_original)
+        return 0
+
+    for tamanho in faltando:
+        # Recorta e redimensiona como o object-fit: cover dos templates
+        imagem = ImageOps.fit(original, TAMANHOS[tamanho], Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        imagem.save(buffer, 'WEBP', quality=QUALIDADE_WEBP, method=4)
+
+        _gravar(caminho_derivado(nome_original, tamanho), buffer.getvalue())
+    _registrar_derivados(nome_original, TAMANHOS)
+    return len(faltando)
+
+
+def _gravar(caminho, conteudo):
+    # Dois jobs do pool podem gerar o mesmo derivado ao mesmo tempo (o jogo e a imagem são
+    # salvos de novo antes do primeiro terminar). O save() do storage nunca sobrescreve: com
+    # "apaga e salva" o segundo ganhava um nome com sufixo (_aB3xK9q.webp) que ninguém apaga.
+    # Grava num nome temporário e troca de uma vez com os.replace (atômico no mesmo disco)
+    temporario = default_storage.save(f'{caminho}.{uuid.uuid4().hex}.tmp', ContentFile(conteudo))
+    try:
+        os.replace(default_storage.path(temporario), default_storage.path(caminho))
+        return
+    except NotImplementedError:
+        # Storage sem caminho local (ex: S3): melhor esforço, sem a troca atômica
+        default_storage.delete(temporario)
+
+    if default_storage.exists(caminho):
+        default_storage.delete(caminho)
+    salvo = default_storage.save(caminho, ContentFile(conteudo))
+    if salvo != caminho:
+        logger.warning('Miniatura %s gravada em paralelo por outro job; cópia %s descartada', caminho, salvo)
+        default_storage.delete(salvo)
+
+
+def remover_derivados(nome_original):
+    for tamanho in TAMANHOS:
+        caminho = caminho_derivado(nome_original, tamanho)
+        if default_storage.exists(caminho):
+            default_storage.delete(caminho)
+    cache.delete(_chave_derivados(nome_original))
+
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='miniaturas')
+        return _pool
+
+
+def _gerar_em_segundo_plano(nome_original, jogo_id=None):
+    try:
+        if gerar_derivados(nome_original) and jogo_id is not None:
+            # O card em cache foi montado com o arquivo original: marca o jogo para refazer
+            marcar_jogos_alterados([jogo_id])
+    except Exception:
+        logger.exception('Erro ao gerar as miniaturas de %s', nome_original)
+    finally:
+        connection.close()
+
+
+def agendar_derivados(nome_original, jogo_id=None):
+    # Depois do commit, as miniaturas são geradas num pool de threads:
+    # o request do painel (criar/editar jogo) não espera o Pillow
+    if not nome_original:
+        return
+    transaction.on_commit(lambda: _obter_pool().submit(_gerar_em_segundo_plano, nome_original, jogo_id))
@@ -0,0 +1,369 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .busca import CHAVE_VERSAO_AUTOCOMPLETE, indexar_jogos
+from .cache_paginas import invalidar_paginas
+from .carrinho import recalcular_carrinhos_com_jogos, tirar_jogos_dos_carrinhos
+from .catalogo import invalidar_categorias_menu
+from .imagens import gerar_derivados, remover_derivados
+from .models import Categoria, ImagemExtra, Jogo
+from .relacionados import atualizar_relacionados, reconstruir_relacionados
+from .versoes import trocar_versao
+
+# ------- IMPORTAÇÃO / EXPORTAÇÃO DO CATÁLOGO -------
+# Arquivos CSV ou JSONL (um jogo por linha), lidos e escritos em streaming:
+# a memória usada depende do tamanho do lote, não do tamanho do arquivo.
+#
+# Colunas: id, nome, preco, descricao, autoria, lancamento, desconto, plataforma,
+# banner, pre_lancamento, deletado, categorias, icone, imagens.
+# - id (opcional): se o jogo já existe, é atualizado; senão é criado (com esse id, se veio)
+# - categorias / imagens: listas (no CSV, separadas por "|"); categorias pelo nome
+# - icone / imagens: caminhos relativos à pasta de imagens (--imagens); sem a pasta,
+#   são nomes que já estão no storage (é o que a exportação escreve)
+COLUNAS = [
+    'id', 'nome', 'preco', 'descricao', 'autoria', 'lancamento', 'desconto', 'plataforma',
+    'banner', 'pre_lancamento', 'deletado', 'categorias', 'icone', 'imagens',
+]
+CAMPOS_JOGO = [
+    'nome', 'preco', 'descricao', 'autoria', 'lancamento', 'desconto', 'plataforma',
+    'banner', 'pre_lancamento', 'deletado',
+]
+SEPARADOR_LISTA = '|'
+TAMANHO_LOTE = 1000
+# Até quantos jogos com categorias (ou soft delete) alterados os relacionados são
+# atualizados só para eles; acima disso a reconstrução completa sai mais barata.
+# Na base de 100k jogos (20 categorias de ~10k) cada jogo custa ~0,35s e a reconstrução ~30s
+LIMITE_RELACIONADOS_INCREMENTAL = 100
+
+JogoCategoria = Jogo.categoria.through
+
+
+def formato_do_arquivo(caminho, formato=None):
+    if formato:
+        return formato
+    return 'jsonl' if caminho.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# --- leitura ---
+def _lista(valor):
+    if isinstance(valor, list):
+        return [str(item).strip() for item in valor if str(item).strip()]
+    return [item.strip() for item in (valor or '').split(SEPARADOR_LISTA) if item.strip()]
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor or '').strip().lower() in ('1', 'true', 'sim', 'on', 's', 'yes')
+
+
+def ler_registros(arquivo, formato):
+    # Gera um dict por jogo, sem carregar o arquivo inteiro
+    if formato == 'jsonl':
+        for linha in arquivo:
+            if linha.strip():
+                yield json.loads(linha)
+    else:
+        yield from csv.DictReader(arquivo)
+
+
+def _jogo_do_registro(registro):
+    desconto = registro.get('desconto')
+    lancamento = registro.get('lancamento')
+    jogo = Jogo(
+        id=int(registro['id']) if registro.get('id') else None,
+        nome=registro['nome'],
+        preco=Decimal(str(registro['preco'])),
+        descricao=registro.get('descricao') or '',
+        autoria=registro.get('autoria') or 'Desconhecido',
+        lancamento=date.fromisoformat(lancamento) if lancamento else timezone.localdate(),
+        desconto=int(desconto) if desconto not in (None, '') else 0,
+        plataforma=registro.get('plataforma') or 'pc',
+        banner=_booleano(registro.get('banner')),
+        pre_lancamento=_booleano(registro.get('pre_lancamento')),
+        deletado=_booleano(registro.get('deletado')),
+    )
+    jogo.full_clean(exclude=['icone', 'categoria', 'id'], validate_unique=False)
+    return jogo
+
+
+# --- escrita ---
+def _atualizar_em_lote(jogos, campos):
+    # Um UPDATE ... WHERE id = %s por jogo, num executemany só. O bulk_update do Django
+    # monta um CASE WHEN por campo com um ramo por jogo, e isso domina o tempo da importação
+    if not jogos:
+        return
+    # Sem save() o auto_now não roda: o atualizado_em (chave dos cards em cache) vai junto
+    agora = timezone.now()
+    for jogo in jogos:
+        jogo.atualizado_em = agora
+    colunas = [Jogo._meta.get_field(campo) for campo in [*campos, 'atualizado_em']]
+    atribuicoes = ', '.join(f'{connection.ops.quote_name(coluna.column)} = %s' for coluna in colunas)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {Jogo._meta.db_table} SET {atribuicoes} WHERE id = %s',
+            [
+                [coluna.get_db_prep_save(getattr(jogo, coluna.attname), connection) for coluna in colunas] + [jogo.id]
+                for jogo in jogos
+            ],
+        )
+
+
+class ImportadorCatalogo:
+    def __init__(self, pasta_imagens=None, tamanho_lote=TAMANHO_LOTE, workers=4, miniaturas=True):
+        self.pasta_imagens = pasta_imagens
+        self.tamanho_lote = tamanho_lote
+        self.workers = workers
+        self.miniaturas = miniaturas
+        self.categorias = dict(Categoria.objects.values_list('nome', 'id'))
+        self.criados = self.atualizados = self.imagens = 0
+        self.categorias_novas = False
+        self.teve_pre_lancamento = False
+        self.relacionados_alterados = set()  # ids com categorias ou soft delete diferentes
+
+    def importar(self, registros):
+        # Cada lote é uma transação: um erro no meio não desfaz os lotes anteriores
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='importacao') as pool:
+            self.pool = pool
+            registros = iter(registros)
+            while lote := list(itertools.islice(registros, self.tamanho_lote)):
+                with transaction.atomic():
+                    self._importar_lote(lote)
+        self._finalizar()
+        return self.criados + self.atualizados
+
+    def _importar_lote(self, lote):
+        jogos = [_jogo_do_registro(registro) for registro in lote]
+        existentes = dict(
+            Jogo.objects.filter(id__in=[jogo.id for jogo in jogos if jogo.id]).values_list('id', 'deletado')
+        )
+        novos = [jogo for jogo in jogos if jogo.id not in existentes]
+        atualizados = [jogo for jogo in jogos if jogo.id in existentes]
+
+        # 1. Jogos: um INSERT e um UPDATE em lote (sem save()/signals por jogo)
+        Jogo.objects.bulk_create(novos)
+        _atualizar_em_lote(atualizados, CAMPOS_JOGO)
+        self.criados += len(novos)
+        self.atualizados += len(atualizados)
+        self.teve_pre_lancamento |= any(jogo.pre_lancamento for jogo in jogos)
+        # Como no painel: preço ou desconto novos acertam os carrinhos pendentes
+        # (um UPDATE), e os jogos que vieram deletados saem deles
+        recalcular_carrinhos_com_jogos([jogo.id for jogo in atualizados if not jogo.deletado])
+        tirar_jogos_dos_carrinhos([jogo.id for jogo in atualizados if jogo.deletado])
+
+        # 2. Categorias (M2M): cria as que faltam e regrava a tabela de ligação direto,
+        #    só para os jogos em que o conjunto de categorias mudou
+        self._garantir_categorias({nome for registro in lote for nome in _lista(registro.get('categorias'))})
+        vindas = {
+            jogo.id: {self.categorias[nome] for nome in _lista(registro.get('categorias'))}
+            for jogo, registro in zip(jogos, lote)
+        }
+        antigas = defaultdict(set)
+        ligacoes = JogoCategoria.objects.filter(jogo_id__in=[jogo.id for jogo in atualizados])
+        for jogo_id, categoria_id in ligacoes.values_list('jogo_id', 'categoria_id'):
+            antigas[jogo_id].add(categoria_id)
+        mudaram = [jogo_id for jogo_id, categorias in vindas.items() if categorias != antigas[jogo_id]]
+        JogoCategoria.objects.filter(jogo_id__in=mudaram).delete()
+        JogoCategoria.objects.bulk_create(
+            [JogoCategoria(jogo_id=jogo_id, categoria_id=categoria_id) for jogo_id in mudaram for categoria_id in vindas[jogo_id]],
+            ignore_conflicts=True,
+        )
+        self.relacionados_alterados.update(mudaram)
+        self.relacionados_alterados.update(jogo.id for jogo in atualizados if jogo.deletado != existentes[jogo.id])
+
+        # 3. Imagens: cópias em paralelo, depois um UPDATE/INSERT em lote
+        self._importar_imagens(jogos, lote)
+
+        # 4. Busca full-text do lote (o autocomplete e os relacionados são acertados no final)
+        indexar_jogos(jogos)
+
+    def _garantir_categorias(self, nomes):
+        faltando = nomes - self.categorias.keys()
+        if not faltando:
+            return
+        Categoria.objects.bulk_create([Categoria(nome=nome) for nome in faltando], ignore_conflicts=True)
+        self.categorias.update(Categoria.objects.filter(nome__in=faltando).values_list('nome', 'id'))
+        self.categorias_novas = True
+
+    def _copiar(self, origem, destino, atual=None):
+        # Roda nas threads do pool: copia para o storage e já gera as miniaturas.
+        # Se o arquivo de destino (ou o que o jogo já usa nessa posição) tem o mesmo
+        # conteúdo, ele é reaproveitado: importar de novo não cria cópias com sufixo
+        if self.pasta_imagens is None:
+            nome = origem  # já está no storage
+        else:
+            caminho = os.path.join(self.pasta_imagens, origem)
+            nome = next((nome for nome in (atual, destino) if nome and _mesmo_conteudo(caminho, nome)), None)
+            if nome is None:
+                with open(caminho, 'rb') as arquivo:
+                    nome = default_storage.save(destino, File(arquivo))
+        if self.miniaturas:
+            gerar_derivados(nome)
+        return nome
+
+    def _importar_imagens(self, jogos, lote):
+        # Os arquivos que os jogos já usam, para _copiar reaproveitar os iguais
+        ids = [jogo.id for jogo, registro in zip(jogos, lote) if registro.get('icone') or registro.get('imagens')]
+        icones_atuais = dict(Jogo.objects.filter(id__in=ids).values_list('id', 'icone'))
+        galerias_atuais = {
+            (jogo_id, ordem): nome
+            for jogo_id, ordem, nome in ImagemExtra.objects.filter(jogo_id__in=ids).values_list('jogo_id', 'ordem', 'imagem')
+        }
+
+        icones, galerias = [], []
+        for jogo, registro in zip(jogos, lote):
+            if registro.get('icone'):
+                origem = registro['icone']
+                icones.append((jogo, self.pool.submit(
+                    self._copiar, origem, f'icones/{os.path.basename(origem)}', icones_atuais.get(jogo.id),
+                )))
+            imagens = _lista(registro.get('imagens'))
+            if imagens:
+                # Mesmo padrão de nome do upload_to_imagem
+                pasta = slugify(jogo.nome)
+                galerias.append((jogo, [
+                    self.pool.submit(
+                        self._copiar, origem,
+                        f'jogos-extras/{pasta}/{pasta}-{ordem}{os.path.splitext(origem)[1].lower()}',
+                        galerias_atuais.get((jogo.id, ordem)),
+                    )
+                    for ordem, origem in enumerate(imagens, start=1)
+                ]))
+
+        for jogo, futuro in icones:
+            jogo.icone = futuro.result()
+        _atualizar_em_lote([jogo for jogo, _ in icones], ['icone'])
+
+        # A galeria vinda do arquivo substitui a que o jogo tinha
+        self._substituir_galerias([
+            (jogo, [(ordem, futuro.result()) for ordem, futuro in enumerate(futuros, start=1)])
+            for jogo, futuros in galerias
+        ])
+        self.imagens += len(icones) + sum(len(futuros) for _, futuros in galerias)
+
+    def _substituir_galerias(self, galerias):
+        # galerias: [(jogo, [(ordem, nome)])]. Compara com o que está no banco: a imagem com a
+        # mesma ordem e o mesmo arquivo fica como está (e as miniaturas dela também); só as
+        # linhas que somem são apagadas e só as que faltam são criadas.
+        # O DELETE é direto (_raw_delete): o post_delete de cada ImagemExtra apagaria as
+        # miniaturas e marcaria o jogo uma vez por imagem. Os arquivos das linhas apagadas
+        # são limpos aqui, depois do commit, se nenhuma outra imagem usa o mesmo arquivo
+        vindas = {jogo.id: set(imagens) for jogo, imagens in galerias}
+        removidas, apagar = set(), []
+        existentes = ImagemExtra.objects.filter(jogo_id__in=vindas).values_list('id', 'jogo_id', 'ordem', 'imagem')
+        for id_, jogo_id, ordem, nome in existentes:
+            if (ordem, nome) in vindas[jogo_id]:
+                vindas[jogo_id].discard((ordem, nome))
+            else:
+                apagar.append(id_)
+                removidas.add(nome)
+        if apagar:
+            ImagemExtra.objects.filter(id__in=apagar)._raw_delete(connection.alias)
+        ImagemExtra.objects.bulk_create([
+            ImagemExtra(jogo_id=jogo_id, imagem=nome, ordem=ordem)
+            for jogo_id, imagens in vindas.items()
+            for ordem, nome in sorted(imagens)
+        ])
+
+        removidas -= set(ImagemExtra.objects.filter(imagem__in=removidas).values_list('imagem', flat=True))
+        if removidas:
+            transaction.on_commit(lambda: _remover_arquivos(removidas))
+
+    def _finalizar(self):
+        # O que os signals fariam jogo a jogo, feito uma vez só para a importação inteira
+        if self.teve_pre_lancamento:
+            # Jogo.save() deixa só um pré-lançamento: fica o de maior id
+            ultimo = Jogo.objects.filter(pre_lancamento=True).order_by('-id').values_list('id', flat=True).first()
+            Jogo.objects.filter(pre_lancamento=True).exclude(id=ultimo).update(
+                pre_lancamento=False, atualizado_em=timezone.now(),
+            )
+        if self.categorias_novas:
+            invalidar_categorias_menu()
+        if len(self.relacionados_alterados) > LIMITE_RELACIONADOS_INCREMENTAL:
+            reconstruir_relacionados()
+        else:
+            atualizar_relacionados(self.relacionados_alterados)
+        # Os workers percebem a versão nova e recarregam o índice do autocomplete
+        trocar_versao(CHAVE_VERSAO_AUTOCOMPLETE)
+        invalidar_paginas()
+
+
+def _hash_do_arquivo(arquivo):
+    resumo = hashlib.sha256()
+    for pedaco in iter(lambda: arquivo.read(1024 * 1024), b''):
+        resumo.update(pedaco)
+    return resumo.digest()
+
+
+def _mesmo_conteudo(caminho, nome):
+    # O arquivo local e o do storage são iguais? O tamanho decide antes de ler os dois
+    if not default_storage.exists(nome) or default_storage.size(nome) != os.path.getsize(caminho):
+        return False
+    with open(caminho, 'rb') as local, default_storage.open(nome, 'rb') as guardado:
+        return _hash_do_arquivo(local) == _hash_do_arquivo(guardado)
+
+
+def _remover_arquivos(nomes):
+    for nome in nomes:
+        default_storage.delete(nome)
+        remover_derivados(nome)
+
+
+# --- exportação ---
+def registros_do_catalogo(tamanho_lote=2000):
+    # Um dict por jogo, com as categorias e a galeria buscadas por lote (prefetch + iterator)
+    jogos = (
+        Jogo.objects.order_by('id')
+        .prefetch_related('categoria', 'imagens_extras')
+        .iterator(chunk_size=tamanho_lote)
+    )
+    for jogo in jogos:
+        yield {
+            'id': jogo.id,
+            'nome': jogo.nome,
+            'preco': str(jogo.preco),
+            'descricao': jogo.descricao,
+            'autoria': jogo.autoria,
+            'lancamento': jogo.lancamento.isoformat() if jogo.lancamento else '',
+            'desconto': jogo.desconto if jogo.desconto is not None else '',
+            'plataforma': jogo.plataforma,
+            'banner': jogo.banner,
+            'pre_lancamento': jogo.pre_lancamento,
+            'deletado': jogo.deletado,
+            'categorias': sorted(categoria.nome for categoria in jogo.categoria.all()),
+            'icone': jogo.icone.name if jogo.icone else '',
+            'imagens': [imagem.imagem.name for imagem in jogo.imagens_extras.all()],
+        }
+
+
+def escrever_registros(arquivo, registros, formato):
+    total = 0
+    if formato == 'jsonl':
+        for registro in registros:
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            total += 1
+        return total
+
+    escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS)
+    escritor.writeheader()
+    for registro in registros:
+        escritor.writerow({
+            **registro,
+            'categorias': SEPARADOR_LISTA.join(registro['categorias']),
+            'imagens': SEPARADOR_LISTA.join(registro['imagens']),
+        })
+        total += 1
+    return total
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.api import CAMPOS_LISTA, ORDENACOES_API, codificar_cursor, pagina_de_jogos, serializar_jogo
+from app.models import Categoria, Jogo
+
+JogoCategoria = Jogo.categoria.through
+
+
+class Desfazer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a paginação com OFFSET e por cursor (api.py) em páginas cada vez mais fundas, '
+        'numa base sintética criada dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jogos', type=int, default=100000)
+        parser.add_argument('--categorias', type=int, default=10)
+        parser.add_argument('--limite', type=int, default=24)
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--paginas', type=int, nargs='+', default=[1, 10, 100, 400, 1000, 4000])
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['seed'])
+        self.limite = options['limite']
+        self.repeticoes = options['repeticoes']
+        try:
+            with transaction.atomic():
+                categorias = self.gerar_jogos(options['jogos'], options['categorias'], aleatorio)
+                for categoria_id in (None, categorias[0]):
+                    for ordem in ORDENACOES_API:
+                        titulo = f'ordem={ordem}' + (f' categoria={categoria_id}' if categoria_id else '')
+                        self.stdout.write(titulo)
+                        for pagina in options['paginas']:
+                            self.comparar(categoria_id, ordem, pagina)
+                raise Desfazer
+        except Desfazer:
+            pass
+
+    def gerar_jogos(self, quantidade, n_categorias, aleatorio):
+        self.stdout.write(f'Gerando {quantidade} jogos...')
+        categorias = Categoria.objects.bulk_create(
+            [Categoria(nome=f'Benchmark API {i}') for i in range(n_categorias)]
+        )
+        inicio = date(2010, 1, 1)
+        lote = []
+        for i in range(quantidade):
+            lote.append(Jogo(
+                nome=f'Jogo {i}',
+                descricao='',
+                preco=aleatorio.randint(500, 30000) / 100,
+                desconto=aleatorio.choice((0, 0, 0, 10, 25, 50)),
+                lancamento=inicio + timedelta(days=aleatorio.randint(0, 5000)),
+            ))
+            if len(lote) == 5000:
+                self.criar_lote(lote, categorias, aleatorio)
+                lote = []
+        self.criar_lote(lote, categorias, aleatorio)
+        return [categoria.id for categoria in categorias]
+
+    def criar_lote(self, jogos, categorias, aleatorio):
+        Jogo.objects.bulk_create(jogos)
+        JogoCategoria.objects.bulk_create([
+            JogoCategoria(jogo_id=jogo.id, categoria_id=aleatorio.choice(categorias).id) for jogo in jogos
+        ])
+
+    def comparar(self, categoria_id, ordem, pagina):
+        campo, descendente = ORDENACOES_API[ordem]
+        sinal = '-' if descendente else ''
+        jogos = Jogo.objects.filter(deletado=False)
+        if categoria_id is not None:
+            jogos = jogos.filter(categoria=categoria_id)
+        jogos = jogos.order_by(f'{sinal}{campo}', f'{sinal}id')
+        inicio = (pagina - 1) * self.limite
+
+        # O cursor que o cliente teria recebido na página anterior (fora da medição)
+        cursor = None
+        if inicio:
+            anterior = jogos.values(campo, 'id')[inicio - 1:inicio].first()
+            if anterior is None:
+                return
+            chave = anterior[campo]
+            cursor = codificar_cursor(chave.isoformat() if campo == 'lancamento' else chave, anterior['id'])
+
+        # Mesma serialização nos dois lados: a diferença é só o OFFSET
+        com_offset = self.medir(
+            lambda: [serializar_jogo(linha) for linha in jogos.values(*CAMPOS_LISTA)[inicio:inicio + self.limite]]
+        )
+        com_cursor = self.medir(lambda: pagina_de_jogos(categoria_id, ordem, cursor, self.limite))
+        self.stdout.write(
+            f'  página {pagina:>6}: OFFSET {statistics.median(com_offset):8.2f} ms | '
+            f'cursor {statistics.median(com_cursor):8.2f} ms (p50)'
+        )
+
+    def medir(self, buscar):
+        buscar()  # aquece o cache de páginas do SQLite
+        tempos = []
+        for _ in range(self.repeticoes):
+            inicio = time.perf_counter()
+            buscar()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return tempos
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import platform
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.busca import carregar_indice_autocomplete
+from app.models import Categoria, Jogo
+
+from .relatorio_perfilador import percentil
+
+# Leituras async: o autocomplete (memória), a busca e a API (banco)
+VIEWS_PADRAO = ['autocomplete_search', 'resultado_pesquisa', 'api_jogo_detalhe', 'api_busca']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão das views de leitura servidas como WSGI (um worker com --threads threads) '
+        'e como ASGI (um event loop só), com --concorrencia usuários fazendo requisições sem parar. '
+        'Roda no próprio processo, pelo test client e pelo AsyncClient (os mesmos handlers que o '
+        'gunicorn e o uvicorn chamam), na base atual e sem gravar nada. Mostra também o pico de '
+        'threads ocupadas atendendo: é ele que limita quantos usuários um worker aguenta ao mesmo tempo. '
+        'Os números servem para comparar os dois modos entre si: tudo divide o mesmo GIL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', default=','.join(VIEWS_PADRAO), help='Nomes das URLs, separados por vírgula')
+        parser.add_argument('--concorrencia', type=int, default=50, help='Usuários ao mesmo tempo')
+        parser.add_argument('--requisicoes', type=int, default=1000, help='Requisições por view em cada modo')
+        parser.add_argument('--threads', type=int, default=8, help='Threads do worker WSGI')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+
+    def handle(self, *args, **options):
+        self.aleatorio = random.Random(options['seed'])
+        self.preparar()
+
+        resultados = {}
+        self.stdout.write(
+            f'{"view":<22} {"modo":<5} {"status":>6} {"req/s":>8} {"p50":>9} {"p95":>9} {"p99":>9} {"threads":>7}'
+        )
+        for nome in options['views'].split(','):
+            nome = nome.strip()
+            if nome not in self.requisicoes:
+                raise CommandError(f'View desconhecida: {nome}. Use: {", ".join(self.requisicoes)}')
+            caminhos = [self.requisicoes[nome]() for _ in range(options['requisicoes'])]
+            resultados[nome] = {
+                'wsgi': self.medir(self.rodar_wsgi, caminhos, options['concorrencia'], options['threads']),
+                'asgi': self.medir(self.rodar_asgi, caminhos, options['concorrencia']),
+            }
+            for modo, linha in resultados[nome].items():
+                self.stdout.write(
+                    f'{nome:<22} {modo:<5} {linha["status"]:>6} {linha["req_s"]:>8.0f} {linha["p50_ms"]:>7.2f}ms '
+                    f'{linha["p95_ms"]:>7.2f}ms {linha["p99_ms"]:>7.2f}ms {linha["threads"]:>7}'
+                )
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    'gerado_em': timezone.now().isoformat(timespec='seconds'),
+                    'ambiente': {'python': platform.python_version(), 'django': django.get_version()},
+                    'concorrencia': options['concorrencia'],
+                    'threads_wsgi': options['threads'],
+                    'views': resultados,
+                }, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+                arquivo.write('\n')
+            self.stdout.write(f'Resultados gravados em {options["saida"]}')
+
+    # --- montagem das requisições ---
+    def preparar(self):
+        # Cada requisição sorteia um jogo real: o autocomplete recebe o começo do nome
+        # (como quem está digitando) e as outras buscas uma das palavras
+        nomes = list(Jogo.objects.filter(deletado=False).order_by('id').values_list('id', 'nome')[:5000])
+        categorias = list(Categoria.objects.values_list('id', flat=True)[:500])
+        if not nomes or not categorias:
+            raise CommandError('A base está vazia. Gere dados com: python manage.py gerar_dados')
+        # Como na subida do worker (config/wsgi.py e asgi.py): fora da medição
+        carregar_indice_autocomplete()
+
+        def digitado():
+            nome = self.aleatorio.choice(nomes)[1]
+            return nome[:self.aleatorio.randint(2, max(2, len(nome)))]
+
+        def palavra():
+            return self.aleatorio.choice(self.aleatorio.choice(nomes)[1].split())
+
+        def com_parametros(nome_url, parametros=None, args=None):
+            url = reverse(nome_url, args=args)
+            if parametros:
+                url += '?' + urlencode(parametros)
+            return url
+
+        self.requisicoes = {
+            'autocomplete_search': lambda: com_parametros('autocomplete_search', {'term': digitado()}),
+            'resultado_pesquisa': lambda: com_parametros('resultado_pesquisa', {'q': palavra()}),
+            'api_busca': lambda: com_parametros('api_busca', {'q': palavra()}),
+            'api_jogos': lambda: com_parametros('api_jogos', {'categoria': self.aleatorio.choice(categorias)}),
+            'api_jogo_detalhe': lambda: com_parametros('api_jogo_detalhe', args=[self.aleatorio.choice(nomes)[0]]),
+            'api_jogo_imagens': lambda: com_parametros('api_jogo_imagens', args=[self.aleatorio.choice(nomes)[0]]),
+        }
+
+    # --- medição ---
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def medir(self, rodar, caminhos, *args):
+        inicio = time.perf_counter()
+        tempos, status, threads = rodar(caminhos, *args)
+        duracao = time.perf_counter() - inicio
+        return {
+            # O status mais frequente: um erro no meio aparece como outro valor
+            'status': statistics.mode(status),
+            'req_s': round(len(tempos) / duracao, 1),
+            'p50_ms': round(statistics.median(tempos), 2),
+            'p95_ms': round(percentil(tempos, 0.95), 2),
+            'p99_ms': round(percentil(tempos, 0.99), 2),
+            'threads': threads,
+        }
+
+    def rodar_wsgi(self, caminhos, concorrencia, threads):
+        # Como num worker gthread: as requisições entram numa fila (FIFO) e `threads` threads
+        # as atendem; o tempo na fila entra na latência. As threads dos usuários fazem o papel
+        # dos clientes HTTP e não contam
+        fila = iter(caminhos)
+        trava = threading.Lock()
+        tempos, status = [], []
+        locais = threading.local()
+
+        def atender(caminho):
+            if not hasattr(locais, 'cliente'):
+                locais.cliente = Client(raise_request_exception=False)
+            return locais.cliente.get(caminho)
+
+        with ThreadPoolExecutor(threads) as worker:
+            def usuario():
+                while True:
+                    with trava:
+                        caminho = next(fila, None)
+                    if caminho is None:
+                        return
+                    inicio = time.perf_counter()
+                    resposta = worker.submit(atender, caminho).result()
+                    with trava:
+                        tempos.append((time.perf_counter() - inicio) * 1000)
+                        status.append(resposta.status_code)
+
+            usuarios = [threading.Thread(target=usuario) for _ in range(concorrencia)]
+            for thread in usuarios:
+                thread.start()
+            for thread in usuarios:
+                thread.join()
+        return tempos, status, min(threads, concorrencia)
+
+    def rodar_asgi(self, caminhos, concorrencia):
+        # Todos os usuários no mesmo event loop. O que a view (ou o middleware) roda com
+        # sync_to_async vai para threads; o pico delas é amostrado enquanto o modo roda
+        fila = iter(caminhos)
+        tempos, status = [], []
+        antes = pico = threading.active_count()
+        parar = threading.Event()
+
+        def amostrar():
+            nonlocal pico
+            while not parar.wait(0.001):
+                pico = max(pico, threading.active_count())
+
+        async def usuario():
+            cliente = AsyncClient(raise_request_exception=False)
+            for caminho in fila:
+                inicio = time.perf_counter()
+                resposta = await cliente.get(caminho)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                status.append(resposta.status_code)
+
+        async def todos():
+            await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+
+        amostrador = threading.Thread(target=amostrar)
+        amostrador.start()
+        try:
+            asyncio.run(todos())
+        finally:
+            parar.set()
+            amostrador.join()
+        # Sem contar o próprio amostrador
+        return tempos, status, pico - antes - 1
@@ -0,0 +1,97 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from app.busca import indice_autocomplete
+from app.models import Jogo
+
+from .benchmark_busca import Desfazer, gerar_vocabulario
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a latência do autocomplete sob uma "tempestade" de teclas: vários usuários '
+        'digitando nomes de jogos letra por letra ao mesmo tempo. Usa jogos sintéticos '
+        'criados numa transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jogos', type=int, default=50000)
+        parser.add_argument('--usuarios', type=int, default=8, help='Threads digitando ao mesmo tempo')
+        parser.add_argument('--buscas', type=int, default=200, help='Nomes digitados por usuário')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['seed'])
+        palavras = gerar_vocabulario(aleatorio)
+
+        try:
+            with transaction.atomic():
+                Jogo.objects.bulk_create(
+                    [
+                        Jogo(nome=' '.join(aleatorio.sample(palavras, 2)).title(), preco=10, descricao='...')
+                        for _ in range(options['jogos'])
+                    ],
+                    batch_size=2000,
+                )
+                inicio = time.perf_counter()
+                indice_autocomplete.carregar()
+                self.stdout.write(
+                    f'Índice carregado com {options["jogos"]} jogos em {time.perf_counter() - inicio:.2f}s'
+                )
+                nomes = list(Jogo.objects.values_list('nome', flat=True)[:5000])
+                self.tempestade(nomes, options, aleatorio)
+                raise Desfazer
+        except Desfazer:
+            pass
+        finally:
+            # Volta a refletir só os jogos reais
+            indice_autocomplete.carregado = False
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def tempestade(self, nomes, options, aleatorio):
+        url = reverse('autocomplete_search')
+        roteiros = [
+            [aleatorio.choice(nomes) for _ in range(options['buscas'])]
+            for _ in range(options['usuarios'])
+        ]
+        tempos = []
+        lock = threading.Lock()
+
+        def digitar(roteiro):
+            client = Client()
+            meus_tempos = []
+            for nome in roteiro:
+                # Uma requisição por tecla, a partir da 2ª letra (minLength do jQuery UI)
+                for fim in range(2, len(nome) + 1):
+                    inicio = time.perf_counter()
+                    client.get(url, {'term': nome[:fim]})
+                    meus_tempos.append((time.perf_counter() - inicio) * 1000)
+            with lock:
+                tempos.extend(meus_tempos)
+
+        threads = [threading.Thread(target=digitar, args=(roteiro,)) for roteiro in roteiros]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        tempos.sort()
+
+        def percentil(p):
+            return tempos[min(len(tempos) - 1, int(len(tempos) * p))]
+
+        self.stdout.write(
+            f'{len(tempos)} requisições em {duracao:.1f}s ({len(tempos) / duracao:.0f} req/s) com '
+            f'{options["usuarios"]} usuários\n'
+            f'p50 {statistics.median(tempos):.2f} ms | p95 {percentil(0.95):.2f} ms | '
+            f'p99 {percentil(0.99):.2f} ms | máx {tempos[-1]:.2f} ms'
+        )
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from app.busca import buscar_jogos, fts_disponivel, reconstruir_indice
+from app.models import Jogo
+
+SILABAS = (
+    'ba be bi bo bu da de di do du ka ke ki ko ku la le li lo lu ma me mi mo mu '
+    'na ne ni no nu ra re ri ro ru sa se si so su ta te ti to tu va ve vi vo vu za ze zi zo zu'
+).split()
+
+
+def gerar_vocabulario(aleatorio, tamanho=5000):
+    # Palavras inventadas (3 sílabas), para as buscas terem seletividade parecida com a real
+    palavras = set()
+    while len(palavras) < tamanho:
+        palavras.add(''.join(aleatorio.choices(SILABAS, k=3)))
+    return sorted(palavras)
+
+
+class Desfazer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a busca antiga (icontains) com o índice FTS5 numa base sintética. '
+        'Os jogos gerados são criados dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jogos', type=int, default=50000)
+        parser.add_argument('--buscas', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not fts_disponivel():
+            raise CommandError('O benchmark da busca precisa do SQLite (FTS5).')
+
+        aleatorio = random.Random(options['seed'])
+        self.palavras = gerar_vocabulario(aleatorio)
+        # Termos completos e prefixos (como quem ainda está digitando)
+        termos = [aleatorio.choice(self.palavras)[:aleatorio.choice((4, 6))] for _ in range(options['buscas'])]
+
+        try:
+            with transaction.atomic():
+                self.gerar_jogos(options['jogos'], aleatorio)
+                inicio = time.perf_counter()
+                reconstruir_indice()
+                self.stdout.write(f'Índice reconstruído em {time.perf_counter() - inicio:.2f}s')
+
+                self.relatorio('icontains (tudo)', self.medir(termos, self.busca_icontains))
+                self.relatorio('icontains (12 primeiros)', self.medir(termos, self.busca_icontains_pagina))
+                self.relatorio('FTS5 + BM25 (página)', self.medir(termos, self.busca_fts))
+                raise Desfazer
+        except Desfazer:
+            # O índice FTS está no mesmo banco, então volta junto com os jogos
+            pass
+
+    def gerar_jogos(self, quantidade, aleatorio):
+        self.stdout.write(f'Gerando {quantidade} jogos...')
+        lote = []
+        for i in range(quantidade):
+            lote.append(Jogo(
+                nome=' '.join(aleatorio.sample(self.palavras, 3)).title() + f' {i}',
+                autoria=aleatorio.choice(self.palavras).title() + ' Studios',
+                descricao=' '.join(aleatorio.choices(self.palavras, k=120)),
+                preco=aleatorio.randint(500, 30000) / 100,
+            ))
+            if len(lote) == 2000:
+                Jogo.objects.bulk_create(lote)
+                lote = []
+        Jogo.objects.bulk_create(lote)
+
+    def busca_icontains(self, termo):
+        # A busca como era antes: a view renderizava todos os resultados
+        return list(Jogo.objects.filter(
+            Q(nome__icontains=termo) | Q(descricao__icontains=termo),
+            deletado=False,
+        ).distinct())
+
+    def busca_icontains_pagina(self, termo):
+        # Mesmo filtro, só com um LIMIT (sem ranking nem contagem)
+        return list(Jogo.objects.filter(
+            Q(nome__icontains=termo) | Q(descricao__icontains=termo),
+            deletado=False,
+        ).distinct()[:12])
+
+    def busca_fts(self, termo):
+        resultado = buscar_jogos(termo)
+        resultado.count()  # o Paginator também conta
+        return resultado[:12]
+
+    def medir(self, termos, busca):
+        tempos = []
+        for termo in termos:
+            inicio = time.perf_counter()
+            busca(termo)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return sorted(tempos)
+
+    def relatorio(self, nome, tempos):
+        p95 = tempos[int(len(tempos) * 0.95) - 1]
+        self.stdout.write(
+            f'{nome:<26} média {statistics.mean(tempos):8.2f} ms | '
+            f'p50 {statistics.median(tempos):8.2f} ms | p95 {p95:8.2f} ms'
+        )
@@ -0,0 +1,201 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from app import urls as urls_loja
+from app.models import Categoria, Compra, ImagemExtra, ItemCompra, Jogo
+from painel_controle import urls as urls_painel
+
+from .relatorio_perfilador import percentil
+
+# Views que mudam dados (ou só aceitam POST) ficam de fora
+IGNORADAS = {
+    'adicionar_carrinho', 'remover_carrinho', 'finalizar_compra', 'logout',
+    'editar_categoria', 'deletar_categoria', 'deletar_usuario', 'alterar_grupo', 'acoes_jogos', 'desconto_categoria',
+}
+GRUPO_ADMIN = 'admin_staff'
+
+
+class Desfazer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede cada URL de app.urls e painel_controle.urls pelo test client (p50/p95/p99 e queries) '
+        'na base atual e grava um JSON. Com --comparar, aponta as regressões contra um JSON anterior. '
+        'Roda dentro de uma transação desfeita no final (os usuários de teste não ficam no banco).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=30)
+        parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+        parser.add_argument('--comparar', help='JSON de uma execução anterior (baseline)')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Quanto o p95 pode piorar (0.2 = 20%%)')
+        parser.add_argument('--folga-ms', type=float, default=1.0, help='Diferença de p95 abaixo disto não conta')
+        parser.add_argument('--filtro', help='Só as views cujo nome contém este texto')
+        parser.add_argument('--host', default='localhost', help='Precisa estar no ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        self.repeticoes = options['repeticoes']
+        self.host = options['host']
+        try:
+            with transaction.atomic():
+                resultado = {
+                    'gerado_em': timezone.now().isoformat(timespec='seconds'),
+                    'ambiente': {'python': platform.python_version(), 'django': django.get_version()},
+                    'repeticoes': self.repeticoes,
+                    'dados': self.tamanho_da_base(),
+                    'views': self.medir_views(options['filtro']),
+                }
+                raise Desfazer
+        except Desfazer:
+            pass
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+                arquivo.write('\n')
+            self.stdout.write(f'Resultados gravados em {options["saida"]}')
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as arquivo:
+                baseline = json.load(arquivo)
+            regressoes = self.comparar(baseline, resultado, options['tolerancia'], options['folga_ms'])
+            if regressoes:
+                raise CommandError(f'{regressoes} views pioraram em relação a {options["comparar"]}.')
+            self.stdout.write(self.style.SUCCESS('Nenhuma regressão.'))
+
+    def tamanho_da_base(self):
+        return {
+            'jogos': Jogo.objects.count(),
+            'categorias': Categoria.objects.count(),
+            'usuarios': User.objects.count(),
+            'compras': Compra.objects.count(),
+            'itens_compra': ItemCompra.objects.count(),
+        }
+
+    # --- montagem das requisições ---
+    def preparar(self):
+        # Objetos usados nas URLs com parâmetro e os dois clientes (loja e painel)
+        jogo = Jogo.objects.filter(deletado=False).order_by('id').first()
+        categoria = Categoria.objects.filter(destaque=True).order_by('id').first() or Categoria.objects.order_by('id').first()
+        if jogo is None or categoria is None:
+            raise CommandError('A base está vazia. Gere dados com: python manage.py gerar_dados')
+        com_imagens = ImagemExtra.objects.filter(jogo__deletado=False).values_list('jogo_id', flat=True).first()
+        termo = jogo.nome.split()[0][:4].lower()
+
+        # Cliente: de preferência alguém com carrinho e biblioteca
+        cliente = User.objects.filter(
+            minhas_compras__status='pendente', biblioteca__isnull=False,
+        ).order_by('id').first() or User.objects.create_user('benchmark_cliente', password='benchmark')
+        admin = User.objects.create_user('benchmark_admin', password='benchmark', is_staff=True)
+        admin.groups.add(Group.objects.get_or_create(name=GRUPO_ADMIN)[0])
+
+        self.argumentos = {
+            'detalhe_categoria': [categoria.id],
+            'jogo_detalhe': [jogo.id],
+            'editar_jogo': [jogo.id],
+            'api_jogo_detalhe': [jogo.id],
+            'api_jogo_imagens': [com_imagens or jogo.id],
+        }
+        self.parametros = {
+            'resultado_pesquisa': {'q': termo},
+            'autocomplete_search': {'term': termo},
+            'api_busca': {'q': termo},
+            'api_jogos': {'categoria': categoria.id},
+        }
+        self.clientes = {}
+        for nome, usuario in (('loja', cliente), ('painel', admin)):
+            # Uma view quebrada aparece como status 500 no resultado em vez de parar a medição
+            self.clientes[nome] = Client(SERVER_NAME=self.host, raise_request_exception=False)
+            self.clientes[nome].force_login(usuario)
+
+    def urls(self, filtro):
+        for grupo, modulo in (('loja', urls_loja), ('painel', urls_painel)):
+            for padrao in modulo.urlpatterns:
+                nome = padrao.name
+                if not nome or nome in IGNORADAS or (filtro and filtro not in nome):
+                    continue
+                parametros_da_rota = getattr(padrao.pattern, 'converters', {})
+                if parametros_da_rota and nome not in self.argumentos:
+                    self.stdout.write(self.style.WARNING(f'{nome}: sem argumentos conhecidos, ignorada'))
+                    continue
+                yield grupo, nome, reverse(nome, args=self.argumentos.get(nome, []))
+
+    # --- medição ---
+    def medir_views(self, filtro):
+        self.preparar()
+        views = {}
+        self.stdout.write(f'{"view":<28} {"status":>6} {"queries":>7} {"p50":>9} {"p95":>9} {"p99":>9}')
+        for grupo, nome, url in self.urls(filtro):
+            cliente = self.clientes[grupo]
+            parametros = self.parametros.get(nome, {})
+
+            # A primeira requisição aquece o cache e conta as queries (fora da medição de tempo).
+            # Contador por execute_wrapper: o request_started do Django zera connection.queries
+            queries = []
+
+            def contar(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(contar):
+                resposta = cliente.get(url, parametros)
+            tempos = []
+            for _ in range(self.repeticoes):
+                inicio = time.perf_counter()
+                cliente.get(url, parametros)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+            views[nome] = {
+                'url': url,
+                'status': resposta.status_code,
+                'queries': len(queries),
+                'p50_ms': round(statistics.median(tempos), 2),
+                'p95_ms': round(percentil(tempos, 0.95), 2),
+                'p99_ms': round(percentil(tempos, 0.99), 2),
+            }
+            linha = views[nome]
+            self.stdout.write(
+                f'{nome:<28} {linha["status"]:>6} {linha["queries"]:>7} {linha["p50_ms"]:>7.2f}ms '
+                f'{linha["p95_ms"]:>7.2f}ms {linha["p99_ms"]:>7.2f}ms'
+            )
+        return views
+
+    def comparar(self, baseline, atual, tolerancia, folga_ms):
+        if baseline.get('dados') != atual['dados']:
+            self.stdout.write(self.style.WARNING(
+                f'Bases diferentes: baseline {baseline.get("dados")} x atual {atual["dados"]}'
+            ))
+        regressoes = 0
+        self.stdout.write(f'\n{"view":<28} {"queries":>12} {"p95":>24}')
+        for nome, agora in atual['views'].items():
+            antes = baseline['views'].get(nome)
+            if antes is None:
+                self.stdout.write(f'{nome:<28} (nova)')
+                continue
+            mais_queries = agora['queries'] > antes['queries']
+            mais_lento = (
+                agora['p95_ms'] > antes['p95_ms'] * (1 + tolerancia)
+                and agora['p95_ms'] - antes['p95_ms'] > folga_ms
+            )
+            linha = (
+                f'{nome:<28} {antes["queries"]:>5} -> {agora["queries"]:<5} '
+                f'{antes["p95_ms"]:>9.2f} -> {agora["p95_ms"]:<9.2f}ms'
+            )
+            if mais_queries or mais_lento or agora['status'] != antes['status']:
+                regressoes += 1
+                self.stdout.write(self.style.ERROR(f'{linha}  PIOROU'))
+            else:
+                self.stdout.write(linha)
+        return regressoes
@@ -0,0 +1,207 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from app.biblioteca import preencher_biblioteca
+from app.busca import CHAVE_VERSAO_AUTOCOMPLETE, reconstruir_indice
+from app.cache_paginas import invalidar_paginas
+from app.catalogo import invalidar_categorias_menu
+from app.models import Categoria, Compra, ItemCompra, Jogo
+from app.relacionados import reconstruir_relacionados
+from app.versoes import trocar_versao
+
+from .benchmark_busca import gerar_vocabulario
+
+JogoCategoria = Jogo.categoria.through
+
+# Todos os usuários gerados entram com esta senha (o hash é calculado uma vez só)
+SENHA_USUARIOS = 'senha-123'
+PREFIXO_USUARIO = 'usuario'
+DIAS_DE_HISTORICO = 365
+FRACAO_COM_CARRINHO = 0.1
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera uma base sintética grande e reprodutível (--seed) para medir o CoolKeys em escala: '
+        'categorias, jogos, usuários, compras finalizadas, carrinhos, bibliotecas e relatórios. '
+        'Os dados são acrescentados aos que já existem.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jogos', type=int, default=50000)
+        parser.add_argument('--categorias', type=int, default=500)
+        parser.add_argument('--usuarios', type=int, default=200000)
+        parser.add_argument('--itens', type=int, default=2000000, help='ItemCompra aproximados (1 a 7 por compra)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.aleatorio = random.Random(options['seed'])
+        self.lote = options['lote']
+        self.agora = timezone.now()
+        inicio = time.perf_counter()
+
+        categorias = self.etapa('categorias', self.gerar_categorias, options['categorias'])
+        jogos = self.etapa('jogos', self.gerar_jogos, options['jogos'], categorias)
+        usuarios = self.etapa('usuários', self.gerar_usuarios, options['usuarios'])
+        self.etapa('compras', self.gerar_compras, usuarios, jogos, options['itens'])
+
+        # O que os signals fariam objeto a objeto, uma vez para a base inteira
+        self.etapa('biblioteca', lambda: preencher_biblioteca())
+        self.etapa('índice da busca', reconstruir_indice)
+        self.etapa('relacionados', reconstruir_relacionados)
+        self.etapa('relatórios de vendas', lambda: call_command(
+            'atualizar_vendas', reconstruir=True, atraso=0, stdout=self.stdout,
+        ))
+        invalidar_categorias_menu()
+        trocar_versao(CHAVE_VERSAO_AUTOCOMPLETE)
+        invalidar_paginas()
+        self.stdout.write(self.style.SUCCESS(f'Base gerada em {time.perf_counter() - inicio:.0f}s.'))
+
+    def etapa(self, nome, funcao, *args):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        self.stdout.write(f'{nome}: {time.perf_counter() - inicio:.1f}s')
+        return resultado
+
+    def em_lotes(self, itens):
+        for inicio in range(0, len(itens), self.lote):
+            yield itens[inicio:inicio + self.lote]
+
+    # --- catálogo ---
+    def gerar_categorias(self, quantidade):
+        existentes = Categoria.objects.count()
+        categorias = Categoria.objects.bulk_create([
+            # As 8 primeiras aparecem na home
+            Categoria(nome=f'Categoria {existentes + i}', destaque=i < 8) for i in range(quantidade)
+        ])
+        return [categoria.id for categoria in categorias]
+
+    def gerar_jogos(self, quantidade, categorias):
+        # Retorna {id: (preço em centavos, preço final em centavos, nome)} para montar as compras
+        palavras = gerar_vocabulario(self.aleatorio)
+        hoje = self.agora.date()
+        jogos = {}
+        for numeros in self.em_lotes(range(quantidade)):
+            lote = Jogo.objects.bulk_create([
+                Jogo(
+                    nome=' '.join(self.aleatorio.sample(palavras, 3)).title() + f' {numero}',
+                    autoria=self.aleatorio.choice(palavras).title() + ' Studios',
+                    descricao=' '.join(self.aleatorio.choices(palavras, k=60)),
+                    preco=self.aleatorio.randint(500, 30000) / 100,
+                    desconto=self.aleatorio.choice((0, 0, 0, 10, 15, 25, 50)),
+                    lancamento=hoje - timedelta(days=self.aleatorio.randint(0, 15 * 365)),
+                    banner=self.aleatorio.random() < 0.0002,
+                )
+                for numero in numeros
+            ])
+            # 1 a 3 categorias por jogo
+            JogoCategoria.objects.bulk_create([
+                JogoCategoria(jogo_id=jogo.id, categoria_id=categoria_id)
+                for jogo in lote
+                for categoria_id in self.aleatorio.sample(categorias, min(self.aleatorio.randint(1, 3), len(categorias)))
+            ])
+            for jogo in lote:
+                centavos = round(jogo.preco * 100)
+                # Mesmo arredondamento por unidade de precos.py (meio para cima)
+                jogos[jogo.id] = (centavos, (centavos * (100 - jogo.desconto) + 50) // 100, jogo.nome)
+        return jogos
+
+    # --- usuários ---
+    def gerar_usuarios(self, quantidade):
+        senha = make_password(SENHA_USUARIOS)
+        inicio = (User.objects.aggregate(maior=Max('id'))['maior'] or 0) + 1
+        ids = []
+        for numeros in self.em_lotes(range(inicio, inicio + quantidade)):
+            usuarios = User.objects.bulk_create([
+                User(
+                    username=f'{PREFIXO_USUARIO}{numero}',
+                    email=f'{PREFIXO_USUARIO}{numero}@exemplo.com',
+                    password=senha,
+                    date_joined=self.agora - timedelta(days=DIAS_DE_HISTORICO, seconds=-numero),
+                )
+                for numero in numeros
+            ])
+            ids += [usuario.id for usuario in usuarios]
+        return ids
+
+    # --- compras ---
+    def gerar_compras(self, usuarios, jogos, total_itens):
+        # Direto com executemany e ids calculados aqui: com milhões de linhas, montar um
+        # objeto por linha custa mais que o INSERT (mesmo motivo de relacionados.py).
+        # Os jogos mais populares aparecem muito mais (sorteio com peso decrescente)
+        ids_jogos = list(jogos)
+        compras_por_usuario = total_itens / 4 / max(len(usuarios), 1)
+        proxima_compra = (Compra.objects.aggregate(maior=Max('id'))['maior'] or 0) + 1
+        proximo_item = (ItemCompra.objects.aggregate(maior=Max('id'))['maior'] or 0) + 1
+        ja_tem_carrinho = set(Compra.objects.filter(status='pendente').values_list('usuario_id', flat=True))
+        compras, itens = [], []
+        total_compras = total_gerados = 0
+
+        def gravar():
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {Compra._meta.db_table} '
+                    '(id, usuario_id, status, data_compra, finalizada_em, valor_total) VALUES (%s, %s, %s, %s, %s, %s)',
+                    compras,
+                )
+                cursor.executemany(
+                    f'INSERT INTO {ItemCompra._meta.db_table} '
+                    '(id, compra_id, jogo_id, quantidade, preco_unitario, desconto_unitario, nome_snapshot) '
+                    'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                    itens,
+                )
+            compras.clear()
+            itens.clear()
+
+        for usuario_id in usuarios:
+            quantidade = self.aleatorio.randint(0, round(2 * compras_por_usuario))
+            carrinho = usuario_id not in ja_tem_carrinho and self.aleatorio.random() < FRACAO_COM_CARRINHO
+            for numero in range(quantidade + carrinho):
+                pendente = carrinho and numero == quantidade
+                quando = self.agora - timedelta(seconds=self.aleatorio.randint(0, DIAS_DE_HISTORICO * 86400))
+                total = 0
+                escolhidos = {
+                    ids_jogos[int(len(ids_jogos) * self.aleatorio.random() ** 3)]
+                    for _ in range(self.aleatorio.randint(1, 7))
+                }
+                for jogo_id in escolhidos:
+                    cheio, final, nome = jogos[jogo_id]
+                    qtd = 1 if self.aleatorio.random() < 0.9 else 2
+                    total += final * qtd
+                    if pendente:
+                        # No carrinho: preço de lista; o desconto é aplicado na finalização
+                        itens.append((proximo_item, proxima_compra, jogo_id, qtd, _reais(cheio), '0', ''))
+                    else:
+                        itens.append((
+                            proximo_item, proxima_compra, jogo_id, qtd, _reais(final), _reais(cheio - final), nome,
+                        ))
+                    proximo_item += 1
+                compras.append((
+                    proxima_compra, usuario_id, 'pendente' if pendente else 'finalizada',
+                    _data(quando), None if pendente else _data(quando + timedelta(minutes=2)), _reais(total),
+                ))
+                proxima_compra += 1
+                total_compras += 1
+                total_gerados += len(escolhidos)
+            if len(itens) >= self.lote:
+                gravar()
+        gravar()
+        self.stdout.write(f'{total_compras} compras, {total_gerados} itens')
+
+
+def _reais(centavos):
+    return f'{centavos // 100}.{centavos % 100:02d}'
+
+
+def _data(valor):
+    return connection.ops.adapt_datetimefield_value(valor)
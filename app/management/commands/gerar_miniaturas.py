@@ -0,0 +1,30 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from app.imagens import gerar_derivados
+from app.models import ImagemExtra, Jogo
+
+
+class Command(BaseCommand):
+    help = 'Gera (ou refaz, com --forcar) as miniaturas WebP de todos os ícones e imagens extras, em paralelo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcar', action='store_true', help='Refaz mesmo as miniaturas que já existem')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        nomes = set(Jogo.objects.exclude(icone='').exclude(icone=None).values_list('icone', flat=True))
+        nomes.update(ImagemExtra.objects.values_list('imagem', flat=True))
+
+        inicio = time.perf_counter()
+        # O Pillow libera o GIL enquanto redimensiona e codifica, então threads bastam
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            escritos = sum(pool.map(lambda nome: gerar_derivados(nome, forcar=options['forcar']), sorted(nomes)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(nomes)} imagens verificadas, {escritos} miniaturas geradas em '
+            f'{time.perf_counter() - inicio:.1f}s com {options["workers"]} workers.'
+        ))
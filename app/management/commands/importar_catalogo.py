@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from app.importacao import TAMANHO_LOTE, ImportadorCatalogo, formato_do_arquivo, ler_registros
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa jogos de um arquivo CSV ou JSONL em streaming, em lotes (bulk_create/bulk_update), '
+        'copiando ícones e galerias de uma pasta local em paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Padrão: pela extensão do arquivo')
+        parser.add_argument('--imagens', help='Pasta com os arquivos citados nas colunas icone/imagens')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads para copiar as imagens')
+        parser.add_argument('--sem-miniaturas', action='store_true', help='Não gera as miniaturas WebP agora')
+
+    def handle(self, *args, **options):
+        formato = formato_do_arquivo(options['arquivo'], options['formato'])
+        importador = ImportadorCatalogo(
+            pasta_imagens=options['imagens'],
+            tamanho_lote=options['lote'],
+            workers=options['workers'],
+            miniaturas=not options['sem_miniaturas'],
+        )
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], newline='', encoding='utf-8') as arquivo:
+                total = importador.importar(ler_registros(arquivo, formato))
+        except (KeyError, ValueError, ValidationError, IntegrityError) as erro:
+            # IntegrityError: id repetido no arquivo (o lote com ele é desfeito)
+            raise CommandError(
+                f'Registro inválido depois de {importador.criados + importador.atualizados} jogos: {erro}'
+            )
+        duracao = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} jogos importados ({importador.criados} novos, {importador.atualizados} atualizados, '
+            f'{importador.imagens} imagens) em {duracao:.1f}s: {total / duracao:.0f} linhas/s.'
+        ))
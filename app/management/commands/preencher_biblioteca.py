@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.biblioteca import TAMANHO_LOTE, preencher_biblioteca
+from app.models import BibliotecaJogo
+
+
+class Command(BaseCommand):
+    help = (
+        'Preenche a biblioteca dos usuários (BibliotecaJogo) a partir das compras finalizadas '
+        'feitas antes dela existir. Pode ser rodado mais de uma vez.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Itens por INSERT')
+
+    def handle(self, *args, **options):
+        antes = BibliotecaJogo.objects.count()
+        with transaction.atomic():
+            lidos = preencher_biblioteca(options['lote'])
+        novos = BibliotecaJogo.objects.count() - antes
+        self.stdout.write(self.style.SUCCESS(
+            f'{lidos} itens de compras lidos, {novos} jogos adicionados às bibliotecas.'
+        ))
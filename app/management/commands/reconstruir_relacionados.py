@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.cache_paginas import invalidar_paginas
+from app.relacionados import LOTE_RECONSTRUCAO, reconstruir_relacionados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula do zero a tabela de jogos relacionados (Jaccard das categorias).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_RECONSTRUCAO, help='Relações gravadas por INSERT')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reconstruir_relacionados(options['lote'])
+        invalidar_paginas()  # o detalhe do jogo mostra os relacionados
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} relações geradas em {time.perf_counter() - inicio:.1f}s.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.busca import fts_disponivel, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero o índice full-text (FTS5) usado na busca de jogos.'
+
+    def handle(self, *args, **options):
+        if not fts_disponivel():
+            self.stdout.write(self.style.WARNING('O banco atual não é SQLite: a busca usa icontains, nada a fazer.'))
+            return
+
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f'Índice de busca reconstruído com {total} jogos.'))
@@ -0,0 +1,86 @@
+import json
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ORDENS = {
+    'tempo': lambda view: view['tempo_db_total_ms'],
+    'media': lambda view: view['tempo_db_medio_ms'],
+    'queries': lambda view: view['queries_media'],
+}
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+def resumir_por_view(amostras):
+    # amostras: dicts gravados pelo PerfiladorSQLMiddleware -> uma linha por view
+    por_view = defaultdict(list)
+    for amostra in amostras:
+        por_view[amostra['view']].append(amostra)
+
+    views = []
+    for nome, lista in por_view.items():
+        tempos_db = [amostra['tempo_db_ms'] for amostra in lista]
+        suspeitas = Counter(sql for amostra in lista for sql in amostra['n_mais_um'])
+        views.append({
+            'view': nome,
+            'requisicoes': len(lista),
+            'queries_media': statistics.mean(amostra['queries'] for amostra in lista),
+            'queries_max': max(amostra['queries'] for amostra in lista),
+            'tempo_db_total_ms': sum(tempos_db),
+            'tempo_db_medio_ms': statistics.mean(tempos_db),
+            'tempo_db_p95_ms': percentil(tempos_db, 0.95),
+            'tempo_total_p95_ms': percentil([amostra['tempo_total_ms'] for amostra in lista], 0.95),
+            'n_mais_um': suspeitas.most_common(),
+        })
+    return views
+
+
+class Command(BaseCommand):
+    help = (
+        'Ranking das views pelo custo no banco, a partir das amostras do perfilador '
+        '(COOLKEYS_PERFILADOR=1). Lista também as queries suspeitas de N+1.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', default=None, help='JSONL do perfilador (padrão: PERFILADOR_ARQUIVO)')
+        parser.add_argument('--ordem', choices=sorted(ORDENS), default='tempo')
+        parser.add_argument('--limite', type=int, default=20)
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo'] or settings.PERFILADOR_ARQUIVO
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                amostras = [json.loads(linha) for linha in arquivo if linha.strip()]
+        except FileNotFoundError:
+            raise CommandError(f'{caminho} não existe. Ligue o perfilador com COOLKEYS_PERFILADOR=1.')
+        if not amostras:
+            self.stdout.write('Nenhuma amostra.')
+            return
+
+        views = sorted(resumir_por_view(amostras), key=ORDENS[options['ordem']], reverse=True)
+        total_db = sum(view['tempo_db_total_ms'] for view in views) or 1
+        self.stdout.write(f'{len(amostras)} requisições, {len(views)} views\n')
+        self.stdout.write(
+            f'{"view":<32} {"req":>6} {"queries":>8} {"máx":>5} {"db total":>10} {"% db":>6} '
+            f'{"db média":>9} {"db p95":>8} {"total p95":>10}'
+        )
+        for view in views[:options['limite']]:
+            self.stdout.write(
+                f'{view["view"][:32]:<32} {view["requisicoes"]:>6} {view["queries_media"]:>8.1f} '
+                f'{view["queries_max"]:>5} {view["tempo_db_total_ms"]:>8.0f}ms '
+                f'{view["tempo_db_total_ms"] / total_db:>6.1%} {view["tempo_db_medio_ms"]:>7.2f}ms '
+                f'{view["tempo_db_p95_ms"]:>6.2f}ms {view["tempo_total_p95_ms"]:>8.2f}ms'
+            )
+
+        suspeitas = [view for view in views if view['n_mais_um']]
+        if suspeitas:
+            self.stdout.write(self.style.WARNING('\nSuspeitas de N+1 (mesma query repetida na requisição):'))
+            for view in suspeitas:
+                for sql, vezes in view['n_mais_um'][:3]:
+                    self.stdout.write(f'  {view["view"]} ({vezes} requisições): {sql[:160]}')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.carrinho import (
+    carrinhos_com_total_errado, itens_invalidos_nos_carrinhos, recalcular_totais, remover_dos_carrinhos,
+)
+from app.models import Compra
+
+
+class Command(BaseCommand):
+    help = (
+        'Confere os carrinhos pendentes: itens de jogos deletados/apagados que ficaram para trás '
+        'e valor_total que não bate com os itens. Com --corrigir, acerta os dois.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help='Remove os itens inválidos e recalcula os totais')
+
+    def handle(self, *args, **options):
+        itens = itens_invalidos_nos_carrinhos().count()
+        totais = carrinhos_com_total_errado().count()
+        self.stdout.write(
+            f'{itens} itens de jogos deletados em carrinhos, {totais} carrinhos com o total errado.'
+        )
+        if not options['corrigir'] or not (itens or totais):
+            return
+
+        with transaction.atomic():
+            removidos = remover_dos_carrinhos(itens_invalidos_nos_carrinhos())
+            corrigidos = recalcular_totais(
+                Compra.objects.filter(id__in=carrinhos_com_total_errado().values('id'))
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{removidos} itens removidos, {corrigidos} totais recalculados.'
+        ))
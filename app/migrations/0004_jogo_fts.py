@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def criar_indice_fts(apps, schema_editor):
+    # Índice full-text dos jogos (só existe no SQLite, ver app/busca.py)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS app_jogo_fts USING fts5("
+        "nome, autoria, descricao, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # Popula com os jogos que já existem
+    schema_editor.execute(
+        "INSERT INTO app_jogo_fts (rowid, nome, autoria, descricao) "
+        "SELECT id, nome, autoria, descricao FROM app_jogo WHERE NOT deletado"
+    )
+
+
+def remover_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS app_jogo_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_alter_jogo_preco'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_fts, remover_indice_fts),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_jogo_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BibliotecaJogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_snapshot', models.CharField(max_length=200)),
+                ('adquirido_em', models.DateTimeField()),
+                ('compra', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.compra')),
+                ('jogo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.jogo')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='biblioteca', to=settings.AUTH_USER_MODEL, verbose_name='Client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', '-adquirido_em', '-id'], name='biblioteca_usuario_data_idx')],
+                'unique_together': {('usuario', 'jogo')},
+            },
+        ),
+    ]
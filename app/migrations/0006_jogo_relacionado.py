@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_biblioteca_jogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JogoRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pontuacao', models.FloatField()),
+                ('jogo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionados', to='app.jogo')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.jogo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['jogo', '-pontuacao'], name='relacionado_jogo_pontos_idx')],
+                'unique_together': {('jogo', 'relacionado')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_jogo_relacionado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['status', '-data_compra'], name='compra_status_data_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_finalizada_em(apps, schema_editor):
+    # Compras finalizadas antes do campo existir: a melhor data que temos é a de criação
+    Compra = apps.get_model('app', 'Compra')
+    Compra.objects.filter(status='finalizada', finalizada_em__isnull=True).update(finalizada_em=F('data_compra'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_compra_status_data_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compra',
+            name='finalizada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['status', 'finalizada_em'], name='compra_status_finalizada_idx'),
+        ),
+        migrations.RunPython(preencher_finalizada_em, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:10
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def congelar_precos_antigos(apps, schema_editor):
+    # Itens de compras finalizadas antes do campo existir guardam o preço de lista.
+    # O histórico mostrava esse preço com o desconto atual do jogo: é o que fica congelado
+    ItemCompra = apps.get_model('app', 'ItemCompra')
+    itens = (
+        ItemCompra.objects.filter(compra__status='finalizada', jogo__isnull=False, jogo__desconto__gt=0)
+        .select_related('jogo')
+        .only('preco_unitario', 'desconto_unitario', 'jogo__desconto')
+    )
+    lote = []
+    for item in itens.iterator(chunk_size=2000):
+        com_desconto = (item.preco_unitario * (100 - item.jogo.desconto) / 100).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        item.desconto_unitario = item.preco_unitario - com_desconto
+        item.preco_unitario = com_desconto
+        lote.append(item)
+        if len(lote) >= 2000:
+            ItemCompra.objects.bulk_update(lote, ['preco_unitario', 'desconto_unitario'])
+            lote = []
+    ItemCompra.objects.bulk_update(lote, ['preco_unitario', 'desconto_unitario'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_compra_finalizada_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compra',
+            name='token_finalizacao',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='itemcompra',
+            name='desconto_unitario',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.RunPython(congelar_precos_antigos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:17
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_congelar_precos_e_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jogo',
+            name='preco_final_centavos',
+            field=models.GeneratedField(db_persist=False, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('preco'), '*', models.Value(100))), models.IntegerField()), '*', django.db.models.expressions.CombinedExpression(models.Value(100), '-', django.db.models.functions.comparison.Coalesce(models.F('desconto'), 0))), '/', models.Value(100.0)), output_field=models.FloatField())), models.IntegerField()), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='jogo',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['-lancamento', '-id'], name='jogo_lancamento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jogo',
+            index=models.Index(condition=models.Q(('deletado', False)), fields=['preco_final_centavos', 'id'], name='jogo_preco_final_idx'),
+        ),
+    ]
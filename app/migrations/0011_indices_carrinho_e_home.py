@@ -0,0 +1,57 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def juntar_carrinhos_duplicados(apps, schema_editor):
+    # Antes da restrição, um usuário podia acabar com mais de um carrinho pendente
+    # (duas abas criando ao mesmo tempo). Fica o mais antigo, que é o que obter_carrinho
+    # já usava, com os itens dos outros somados nele
+    Compra = apps.get_model('app', 'Compra')
+    ItemCompra = apps.get_model('app', 'ItemCompra')
+    duplicados = (
+        Compra.objects.filter(status='pendente').values('usuario_id')
+        .annotate(carrinhos=Count('id')).filter(carrinhos__gt=1).values_list('usuario_id', flat=True)
+    )
+    for usuario_id in duplicados:
+        principal, *extras = Compra.objects.filter(usuario_id=usuario_id, status='pendente').order_by('id')
+        for extra in extras:
+            for item in ItemCompra.objects.filter(compra=extra):
+                existente = ItemCompra.objects.filter(compra=principal, jogo_id=item.jogo_id).first() if item.jogo_id else None
+                if existente is None:
+                    item.compra = principal
+                    item.save(update_fields=['compra'])
+                else:
+                    existente.quantidade += item.quantidade
+                    existente.save(update_fields=['quantidade'])
+                    item.delete()
+            # O total é a soma das linhas (preço x quantidade), então os totais somam
+            principal.valor_total += extra.valor_total
+            extra.delete()
+        principal.save(update_fields=['valor_total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_jogo_preco_final_e_indices_api'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_carrinhos_duplicados, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='jogo',
+            index=models.Index(condition=models.Q(('banner', True), ('deletado', False)), fields=['id'], name='jogo_banner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jogo',
+            index=models.Index(condition=models.Q(('pre_lancamento', True)), fields=['id'], name='jogo_pre_lancamento_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='compra',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pendente')), fields=('usuario',), name='compra_pendente_unica_por_usuario'),
+        ),
+    ]
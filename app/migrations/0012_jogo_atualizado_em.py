@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_indices_carrinho_e_home'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jogo',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_jogo_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='jogo',
+            index=models.Index(fields=['atualizado_em'], name='jogo_atualizado_em_idx'),
+        ),
+    ]
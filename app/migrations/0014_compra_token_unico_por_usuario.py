@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_catalogo_atualizado_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='compra',
+            name='token_finalizacao',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='compra',
+            constraint=models.UniqueConstraint(fields=('usuario', 'token_finalizacao'), name='compra_token_unico_por_usuario'),
+        ),
+    ]
@@ -1,12 +1,14 @@
 from django.db import models
 import os
 from django.conf import settings
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 from django.utils.timezone import now
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.db import models, transaction
 
+from .precos import dezmilesimos_em_reais, preco_final_centavos, preco_final_dezmilesimos, preco_lista_dezmilesimos
+
 
 # Models para produtos/jogos
 # Categoria:
@@ -14,10 +16,35 @@ class Categoria(models.Model):
     nome = models.CharField(max_length=100, unique=True)
     descricao = models.TextField(blank=True, null=True)
     destaque = models.BooleanField(default=False)
+    # Junto com o Jogo.atualizado_em, dá a data da última mudança do catálogo (ETag / Last-Modified)
+    atualizado_em = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.nome
 # Jogos:
+class JogoQuerySet(models.QuerySet):
+    def with_prices(self):
+        # Os preços das properties (preco_com_desconto / valor_desconto) calculados no banco,
+        # para ordenar, filtrar e somar sem carregar os jogos:
+        #   preco_efetivo: preço com desconto, arredondado para centavos (meio para cima)
+        #   desconto_efetivo: preco - preco_efetivo
+        return self.annotate(
+            preco_efetivo=dezmilesimos_em_reais(preco_final_dezmilesimos(prefixo='')),
+            desconto_efetivo=dezmilesimos_em_reais(
+                preco_lista_dezmilesimos(prefixo='') - preco_final_dezmilesimos(prefixo='')
+            ),
+        )
+
+    def faixa_de_preco(self, minimo=None, maximo=None):
+        # Filtra pelo preço com desconto (chama o with_prices() se ainda não foi chamado)
+        jogos = self if 'preco_efetivo' in self.query.annotations else self.with_prices()
+        if minimo is not None:
+            jogos = jogos.filter(preco_efetivo__gte=minimo)
+        if maximo is not None:
+            jogos = jogos.filter(preco_efetivo__lte=maximo)
+        return jogos
+
+
 class Jogo(models.Model):
     nome = models.CharField(max_length=200) 
     preco = models.DecimalField(max_digits=8, decimal_places=2, validators=[MinValueValidator(0)])
@@ -34,7 +61,7 @@ class Jogo(models.Model):
                 # Atualiza todos os outros para False caso um outro objeto se torne o pre-lançamento
                 Jogo.objects.exclude(pk=self.pk).filter(
                     pre_lancamento=True
-                ).update(pre_lancamento=False)
+                ).update(pre_lancamento=False, atualizado_em=now())
         
         # Salva normalmente (dentro da transação se for pré-lançamento)
         super().save(*args, **kwargs)
@@ -72,24 +99,49 @@ class Jogo(models.Model):
         blank=True,
         related_name='jogos'  # opcional: para acessar jogos de uma categoria
     ) #Fazer logica de mais de uma
+
+    # Muda a cada save(); update() em massa, categorias e imagens atualizam à mão
+    # (ver catalogo.marcar_jogos_alterados). Faz parte da chave do card em cache
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    # Preço com desconto em centavos, calculado pelo próprio banco (coluna gerada, nunca fica
+    # desatualizada nem com update() em massa). Existe para ter índice: a API ordena por ele
+    preco_final_centavos = models.GeneratedField(
+        expression=preco_final_centavos(prefixo=''),
+        output_field=models.IntegerField(),
+        db_persist=False,
+    )
+
+    class Meta:
+        indexes = [
+            # Paginação por cursor da API (ver api.py): uma ordenação, um índice, só jogos vivos
+            models.Index(fields=['-lancamento', '-id'], name='jogo_lancamento_idx', condition=models.Q(deletado=False)),
+            models.Index(fields=['preco_final_centavos', 'id'], name='jogo_preco_final_idx', condition=models.Q(deletado=False)),
+            # Home: banner e pré-lançamento são poucos jogos; índices parciais minúsculos em vez de varrer a tabela
+            models.Index(fields=['id'], name='jogo_banner_idx', condition=models.Q(banner=True, deletado=False)),
+            models.Index(fields=['id'], name='jogo_pre_lancamento_idx', condition=models.Q(pre_lancamento=True)),
+            # MAX(atualizado_em) do GET condicional (ver cache_paginas.py) lido direto do fim do índice
+            models.Index(fields=['atualizado_em'], name='jogo_atualizado_em_idx'),
+        ]
     
+    objects = JogoQuerySet.as_manager() # Jogo.objects.with_prices(): os mesmos preços calculados no banco
+
     # Funções de preço:
     @property  # Função que pode ser acessada como atributo
     def preco_com_desconto(self):
-        # Retoma o preço com desconto (se houver)
+        # Retoma o preço com desconto (se houver), arredondado para centavos por unidade
+        # (meio para cima), igual ao preco_efetivo do with_prices() e ao que a compra congela
         if self.desconto:
             # Converte para Decimal para precisão
-            desconto_decimal = Decimal(self.desconto) / Decimal(100)
-            valor_desconto = self.preco * desconto_decimal
-            return self.preco - valor_desconto
+            preco = Decimal(self.preco)
+            return (preco * (100 - self.desconto) / 100).quantize(Decimal('0.01'), ROUND_HALF_UP)
         return self.preco
     
     @property
     def valor_desconto(self):
-        # Retoma o valor do desconto 
+        # Retoma o valor do desconto (o que falta para o preço cheio, então os dois sempre fecham)
         if self.desconto:
-            desconto_decimal = Decimal(self.desconto) / Decimal(100) #para contas mais precisas
-            return self.preco * desconto_decimal
+            return Decimal(self.preco) - self.preco_com_desconto
         return Decimal('0.00')
     
     
@@ -159,6 +211,21 @@ class ImagemExtra(models.Model):
     def __str__(self):
         return f"{self.jogo.nome} - Imagem #{self.ordem}"
 
+# ==================== JOGOS RELACIONADOS ====================
+class JogoRelacionado(models.Model): # Lista pré-calculada de jogos parecidos (ver relacionados.py)
+    jogo = models.ForeignKey(Jogo, on_delete=models.CASCADE, related_name='relacionados')
+    relacionado = models.ForeignKey(Jogo, on_delete=models.CASCADE, related_name='+')
+    pontuacao = models.FloatField() # Jaccard das categorias: em comum / total das duas (0 a 1)
+
+    class Meta:
+        unique_together = ['jogo', 'relacionado']
+        indexes = [
+            models.Index(fields=['jogo', '-pontuacao'], name='relacionado_jogo_pontos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.jogo_id} -> {self.relacionado_id} ({self.pontuacao:.2f})"
+
 # ------- CARRINHO/COMPRAS ------
 class Compra(models.Model): #representa transações em geral, ativas e inativas
     # Status da compra
@@ -170,6 +237,8 @@ class Compra(models.Model): #representa transações em geral, ativas e inativas
     
     jogos = models.ManyToManyField(Jogo, through='ItemCompra', related_name='compras')  # Through especifica um modelo intermediário personalizado, no caso ItemCompra que da a quantidade e etc.. 
     data_compra = models.DateTimeField(auto_now_add=True) # literalmente só define a hora/data de quando o objeto/compra é criado
+    finalizada_em = models.DateTimeField(null=True, blank=True) # Quando saiu do carrinho (usado nos relatórios de vendas)
+    token_finalizacao = models.CharField(max_length=64, null=True, blank=True) # Enviado pela página do carrinho: o mesmo formulário não finaliza duas vezes (único por usuário, ver Meta)
     valor_total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(
         max_length=20, 
@@ -183,6 +252,24 @@ class Compra(models.Model): #representa transações em geral, ativas e inativas
         verbose_name='Client' # Nome amigável para adms (humanos)
     )
     
+    class Meta:
+        indexes = [
+            # Últimas compras finalizadas (dashboard) sem varrer/ordenar a tabela toda
+            models.Index(fields=['status', '-data_compra'], name='compra_status_data_idx'),
+            # Relatórios de vendas: compras finalizadas depois da última execução
+            models.Index(fields=['status', 'finalizada_em'], name='compra_status_finalizada_idx'),
+        ]
+        constraints = [
+            # Um carrinho (compra pendente) por usuário. Também é o índice das leituras do carrinho
+            # e do contador da navbar (usuario + status='pendente'); ver carrinho.obter_carrinho
+            models.UniqueConstraint(
+                fields=['usuario'], condition=models.Q(status='pendente'), name='compra_pendente_unica_por_usuario',
+            ),
+            # O token é procurado por usuário (carrinho.finalizar_carrinho): o mesmo token em
+            # outro usuário não pode impedir a finalização. Também é o índice dessa busca
+            models.UniqueConstraint(fields=['usuario', 'token_finalizacao'], name='compra_token_unico_por_usuario'),
+        ]
+
     def __str__(self):
         return f"Compra #{self.id} - {self.usuario}" # Apenas uma string para representar a compra
     
@@ -192,44 +279,16 @@ class Compra(models.Model): #representa transações em geral, ativas e inativas
         self.valor_total = total
         self.save()
 
-    def limpar_jogos_deletados(self):
-        # Remover jogos deletados do carrinho/pendente
-        if self.status != 'pendente':  # Só aplica para carrinhos (pendentes)
-            return []
-        
-        jogos_removidos = [] # Se for pendente
-        
-        # Percorre todos os itens do carrinho
-        for item in self.itens.all():
-            # Se o jogo foi marcado como deletado (soft delete)
-            if item.jogo and item.jogo.deletado:
-                nome_jogo = item.jogo.nome
-                item.delete()  # Remove o item do carrinho
-                jogos_removidos.append(nome_jogo)
-            
-            # Se o jogo foi deletado fisicamente (jogo é NULL)
-            elif item.jogo is None:
-                item.delete()  # Remove o item do carrinho
-                jogos_removidos.append("Jogo removido do sistema")
-        
-        # Atualiza o total do carrinho se removeu algum item
-        if jogos_removidos:
-            self.atualizar_total()
-        
-        return jogos_removidos
-    
-    def save(self, *args, **kwargs):
-        # Limpar itens deletados automaticamente para assim atualizar de fato o carrinho sem usar o views
-        # Se for um carrinho (pendente), limpa antes de salvar
-        if self.status == 'pendente' and self.pk:  # self.pk significa que já existe no banco
-            self.limpar_jogos_deletados()
-        super().save(*args, **kwargs)  # Salva a Compra
-    
+    # Itens de jogos deletados não são mais limpos aqui: o jogo sai de todos os carrinhos
+    # na hora em que é deletado (ver carrinho.remover_dos_carrinhos e signals.py)
+
+
 class ItemCompra(models.Model): # Intermediário entre Compra e Jogo
     compra = models.ForeignKey(Compra, on_delete=models.CASCADE, related_name='itens') 
     jogo = models.ForeignKey(Jogo, on_delete=models.SET_NULL, null=True, blank=True) # jogo fica com valor NULL caso seja deletado porém o objeto ItemCompra não é deletado(só perde o referencial), e o resto permite campos vazios
     quantidade = models.PositiveIntegerField(default=1) # Apenas controle de quantidade, pois ela não pode ser negativa e deve ser maior que 0
-    preco_unitario = models.DecimalField(max_digits=8, decimal_places=2) # Armazena o preço do jogo mesmo após ele ser deletado
+    preco_unitario = models.DecimalField(max_digits=8, decimal_places=2) # No carrinho é o preço de lista; ao finalizar fica congelado já com o desconto
+    desconto_unitario = models.DecimalField(max_digits=8, decimal_places=2, default=0) # Desconto por unidade congelado ao finalizar
     
     # Snapshot de segurança (apenas para histórico, segurança de dados para caso de hard delete)
     nome_snapshot = models.CharField(max_length=200, blank=True)
@@ -257,11 +316,14 @@ class ItemCompra(models.Model): # Intermediário entre Compra e Jogo
             self.jogo.deletado):
             return 0
         
-        # Caso 2: Qualquer outro caso (histórico ou jogo não deletado)
-        # Se tem jogo, usa preço COM desconto
+        # Caso 2: Histórico, usa o preço com desconto congelado na finalização
+        if self.compra and self.compra.status != 'pendente':
+            return self.preco_unitario * self.quantidade
+
+        # Caso 3: Carrinho com jogo, usa preço atual COM desconto (já arredondado por unidade)
         if self.jogo:
             return self.jogo.preco_com_desconto * self.quantidade
-        # Se não tem jogo (histórico), usa preço salvo
+        # Se não tem jogo, usa preço salvo
         return self.preco_unitario * self.quantidade
     
     def esta_valido_no_carrinho(self):
@@ -291,6 +353,29 @@ class ItemCompra(models.Model): # Intermediário entre Compra e Jogo
             return f"{self.quantidade}x {self.jogo.nome}"
         return f"{self.quantidade}x Jogo Removido" 
 
+# --------- BIBLIOTECA --------
+class BibliotecaJogo(models.Model): # Jogos que o usuário possui (preenchida ao finalizar a compra)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='biblioteca', # usuario.biblioteca.all()
+        verbose_name='Client'
+    )
+    jogo = models.ForeignKey(Jogo, on_delete=models.SET_NULL, null=True, blank=True) # Igual ao ItemCompra: o hard delete só tira o referencial
+    compra = models.ForeignKey(Compra, on_delete=models.SET_NULL, null=True, blank=True) # Compra em que o jogo foi adquirido
+    nome_snapshot = models.CharField(max_length=200) # Nome do jogo na hora da compra
+    adquirido_em = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['usuario', 'jogo'] # Cada jogo aparece uma vez só na biblioteca
+        indexes = [
+            # A página de perfil lista a biblioteca do usuário da compra mais nova para a mais antiga
+            models.Index(fields=['usuario', '-adquirido_em', '-id'], name='biblioteca_usuario_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} - {self.nome_snapshot}"
+
 # --------- FOTODEPERFIL --------
 
 class FotoPerfil(models.Model):
@@ -0,0 +1,108 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+# ------- PERFILADOR DE SQL POR REQUISIÇÃO -------
+# Middleware opcional (PERFILADOR_SQL = True, ou COOLKEYS_PERFILADOR=1 no ambiente).
+# Desligado, o Django nem chega a instanciá-lo (MiddlewareNotUsed): custo zero.
+# Ligado, cada requisição ganha:
+# - o cabeçalho Server-Timing (db e total), que aparece na aba Network do navegador;
+# - uma linha no PERFILADOR_ARQUIVO (JSONL) com view, quantidade de queries, tempo no banco
+#   e as queries repetidas. A mesma query (com os valores trocados por ?) rodando
+#   LIMIAR_N_MAIS_UM vezes ou mais na mesma requisição é marcada como suspeita de N+1.
+# O tempo no banco é o do execute(); no SQLite parte do trabalho de uma query grande
+# acontece ao ler as linhas, e isso aparece só no tempo total.
+# O relatório por view sai de: python manage.py relatorio_perfilador
+LIMIAR_N_MAIS_UM = 5
+REPETIDAS_POR_AMOSTRA = 5
+
+_escrita = threading.Lock()
+
+_LISTA_DE_VALORES = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACOS = re.compile(r'\s+')
+
+
+def normalizar_sql(sql):
+    # "... WHERE id IN (%s, %s, %s) AND nome = 'x' LIMIT 21" -> "... WHERE id IN (?) AND nome = ? LIMIT ?"
+    # Os valores chegam separados (%s), mas o ORM também escreve alguns direto no SQL
+    sql = _LISTA_DE_VALORES.sub('(?)', sql)
+    sql = _LITERAIS.sub('?', sql.replace('%s', '?'))
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+def analisar_queries(queries):
+    # queries: [(sql, duração em segundos)] -> resumo da requisição
+    repeticoes = Counter(normalizar_sql(sql) for sql, _ in queries)
+    repetidas = [
+        {'sql': sql, 'vezes': vezes}
+        for sql, vezes in repeticoes.most_common(REPETIDAS_POR_AMOSTRA) if vezes > 1
+    ]
+    return {
+        'queries': len(queries),
+        'tempo_db_ms': round(sum(duracao for _, duracao in queries) * 1000, 2),
+        'repetidas': repetidas,
+        'n_mais_um': [linha['sql'] for linha in repetidas if linha['vezes'] >= LIMIAR_N_MAIS_UM],
+    }
+
+
+class PerfiladorSQLMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADOR_SQL', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.arquivo = settings.PERFILADOR_ARQUIVO
+
+    def __call__(self, request):
+        queries = []
+
+        def registrar(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((sql, time.perf_counter() - inicio))
+
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            # O wrapper fica no objeto de conexão da thread, que existe antes mesmo
+            # de a conexão com o banco ser aberta
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(registrar))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        resumo = analisar_queries(queries)
+        response['Server-Timing'] = (
+            f'db;dur={resumo["tempo_db_ms"]:.2f};desc="{resumo["queries"]} queries", total;dur={total_ms:.2f}'
+        )
+        self.gravar({
+            'quando': timezone.now().isoformat(),
+            'view': _nome_da_view(request),
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'tempo_total_ms': round(total_ms, 2),
+            **resumo,
+        })
+        return response
+
+    def gravar(self, amostra):
+        # Uma linha por write(), em modo append: processos diferentes não misturam linhas
+        linha = json.dumps(amostra, ensure_ascii=False) + '\n'
+        with _escrita, open(self.arquivo, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(linha)
+
+
+def _nome_da_view(request):
+    # Nome da URL (ex: 'jogo_detalhe'); sem rota (404), o caminho
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else request.path
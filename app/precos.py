@@ -0,0 +1,45 @@
+from django.db.models import DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Value
+from django.db.models.functions import Cast, Coalesce, Round
+
+# ------- PREÇOS NO BANCO -------
+# Expressões de dinheiro usadas pelo Jogo.objects.with_prices(), pelo carrinho e pelos relatórios.
+# O SQLite guarda DecimalField como float, então as contas são feitas com inteiros
+# (centavos, ou 1/10000 de real quando entra a porcentagem) e só viram reais no final.
+# O arredondamento é o mesmo das properties do Jogo: meio para cima, por unidade.
+
+
+def centavos(campo):
+    # Preço em centavos inteiros
+    return Cast(Round(F(campo) * 100), IntegerField())
+
+
+def preco_lista_dezmilesimos(prefixo='jogo__'):
+    # Preço cheio do jogo em 1/10000 de real
+    # (prefixo: caminho até o Jogo; '' quando a query já é sobre o Jogo)
+    return centavos(f'{prefixo}preco') * 100
+
+
+def preco_final_centavos(prefixo='jogo__'):
+    # Preço unitário com desconto, arredondado para centavos (meio para cima).
+    # É o preço mostrado no catálogo e no carrinho e o que fica congelado no item ao finalizar,
+    # então a linha (unitário x quantidade) e o total da compra fecham com o que o cliente viu
+    com_desconto = centavos(f'{prefixo}preco') * (100 - Coalesce(F(f'{prefixo}desconto'), 0))
+    return Cast(Round(ExpressionWrapper(com_desconto / Value(100.0), output_field=FloatField())), IntegerField())
+
+
+def preco_final_dezmilesimos(prefixo='jogo__'):
+    # O mesmo preço em 1/10000 de real, para somar com os outros valores do carrinho
+    return preco_final_centavos(prefixo) * 100
+
+
+def dezmilesimos_em_reais(expressao, casas=2):
+    # Converte para reais no banco, arredondando meio para cima (igual ao floatformat)
+    arredondado = Round(ExpressionWrapper(expressao / Value(10.0 ** (4 - casas)), output_field=FloatField()))
+    return ExpressionWrapper(
+        arredondado / Value(10.0 ** casas),
+        output_field=DecimalField(max_digits=14, decimal_places=casas),
+    )
+
+
+def em_reais(expressao):
+    return ExpressionWrapper(expressao, output_field=DecimalField(max_digits=14, decimal_places=2))
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from .models import Jogo, JogoRelacionado
+
+# ------- JOGOS RELACIONADOS -------
+# Cada jogo vivo guarda os CANDIDATOS_POR_JOGO jogos mais parecidos com ele,
+# pontuados pelo Jaccard das categorias (categorias em comum / categorias das duas somadas).
+# A página do jogo só lê essa lista curta e sorteia alguns, sem ORDER BY RANDOM().
+#
+# - mudou as categorias de um jogo: atualizar_relacionados([id]) (signals.py);
+# - o jogo foi (des)deletado: atualizar_relacionados(ids) onde o soft delete é gravado (painel);
+# - reconstrução completa (também usada depois de importações em massa):
+#   python manage.py reconstruir_relacionados
+CANDIDATOS_POR_JOGO = 12
+LOTE_RECONSTRUCAO = 5000
+
+TABELA = JogoRelacionado._meta.db_table
+TABELA_JOGO = Jogo._meta.db_table
+TABELA_CATEGORIAS = Jogo.categoria.through._meta.db_table
+
+# Jaccard de todos os pares (jogo, outro jogo vivo com alguma categoria em comum)
+# para os jogos alterados (o filtro pode tirar alguns do outro lado).
+# Jogos deletados ficam fora dos dois lados. O tamanho das listas de categorias só é
+# contado para os alterados e os jogos que dividem alguma categoria com eles (vizinhos),
+# não para a tabela de ligações inteira.
+_PARES = f'''
+    WITH vizinhos AS (
+        SELECT DISTINCT b.jogo_id
+        FROM {TABELA_CATEGORIAS} a
+        JOIN {TABELA_CATEGORIAS} b ON b.categoria_id = a.categoria_id
+        WHERE a.jogo_id IN ({{alterados}})
+    ),
+    tamanhos AS (
+        SELECT jc.jogo_id, COUNT(*) AS n
+        FROM {TABELA_CATEGORIAS} jc JOIN {TABELA_JOGO} j ON j.id = jc.jogo_id
+        WHERE NOT j.deletado AND jc.jogo_id IN (SELECT jogo_id FROM vizinhos)
+        GROUP BY jc.jogo_id
+    ),
+    pares AS (
+        SELECT a.jogo_id, b.jogo_id AS relacionado_id, COUNT(*) AS em_comum
+        FROM {TABELA_CATEGORIAS} a
+        JOIN {TABELA_CATEGORIAS} b ON b.categoria_id = a.categoria_id AND b.jogo_id <> a.jogo_id
+        WHERE {{filtro}}
+        GROUP BY a.jogo_id, b.jogo_id
+    ),
+    pontuados AS (
+        SELECT p.jogo_id, p.relacionado_id,
+               CAST(p.em_comum AS REAL) / (ta.n + tb.n - p.em_comum) AS pontuacao
+        FROM pares p
+        JOIN tamanhos ta ON ta.jogo_id = p.jogo_id
+        JOIN tamanhos tb ON tb.jogo_id = p.relacionado_id
+    )
+'''
+
+# Os melhores de cada jogo (empate: o jogo mais novo primeiro)
+_INSERIR_MELHORES = f'''
+    INSERT INTO {TABELA} (jogo_id, relacionado_id, pontuacao)
+    {_PARES}
+    SELECT jogo_id, relacionado_id, pontuacao FROM (
+        SELECT jogo_id, relacionado_id, pontuacao,
+               ROW_NUMBER() OVER (PARTITION BY jogo_id ORDER BY pontuacao DESC, relacionado_id DESC) AS posicao
+        FROM pontuados
+    ) ranking
+    WHERE posicao <= %s
+'''
+
+# O caminho inverso: os jogos alterados entram na lista de cada jogo parecido com eles
+# (o Jaccard é simétrico, então é a mesma pontuação com as colunas trocadas).
+# Só onde têm chance de ficar: lista incompleta ou pontuação de pelo menos a pior dela;
+# num catálogo com categorias grandes isso evita inserir e aparar milhares de linhas
+_INSERIR_NOS_OUTROS = f'''
+    INSERT INTO {TABELA} (jogo_id, relacionado_id, pontuacao)
+    {_PARES},
+    piores AS (
+        SELECT jogo_id, MIN(pontuacao) AS minima, COUNT(*) AS n
+        FROM {TABELA}
+        WHERE jogo_id IN (SELECT jogo_id FROM vizinhos)
+        GROUP BY jogo_id
+    )
+    SELECT p.relacionado_id, p.jogo_id, p.pontuacao
+    FROM pontuados p LEFT JOIN piores w ON w.jogo_id = p.relacionado_id
+    WHERE w.jogo_id IS NULL OR w.n < %s OR p.pontuacao >= w.minima
+'''
+
+# Corta de volta para CANDIDATOS_POR_JOGO as listas que receberam os jogos alterados
+_APARAR = f'''
+    DELETE FROM {TABELA} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY jogo_id ORDER BY pontuacao DESC, relacionado_id DESC
+            ) AS posicao
+            FROM {TABELA}
+            WHERE jogo_id IN (SELECT jogo_id FROM {TABELA} WHERE relacionado_id IN ({{ids}}))
+        ) ranking
+        WHERE posicao > %s
+    )
+'''
+
+
+def _marcadores(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+@transaction.atomic
+def atualizar_relacionados(jogo_ids):
+    # Recalcula o que depende dos jogos informados. O custo acompanha os vizinhos deles
+    # (os jogos que dividem uma categoria), não o catálogo. Roda quando as categorias mudam
+    # (signals.py) ou no soft delete (painel), nunca numa edição comum:
+    # 1. os jogos saem de todas as listas (as deles e as dos outros);
+    # 2. ganham a lista nova deles;
+    # 3. entram de novo na lista dos jogos parecidos, que é aparada para o limite.
+    # As outras listas só podem ficar com menos candidatos, nunca com candidatos errados;
+    # a reconstrução completa preenche essas lacunas.
+    ids = sorted({int(id_) for id_ in jogo_ids})
+    if not ids:
+        return
+    marcadores = _marcadores(ids)
+    filtro = f'a.jogo_id IN ({marcadores})'
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABELA} WHERE jogo_id IN ({marcadores}) OR relacionado_id IN ({marcadores})',
+            ids + ids,
+        )
+        cursor.execute(
+            _INSERIR_MELHORES.format(alterados=marcadores, filtro=filtro),
+            ids + ids + [CANDIDATOS_POR_JOGO],
+        )
+        # Um alterado na lista do outro já entrou no passo anterior
+        cursor.execute(
+            _INSERIR_NOS_OUTROS.format(alterados=marcadores, filtro=f'{filtro} AND b.jogo_id NOT IN ({marcadores})'),
+            ids + ids + ids + [CANDIDATOS_POR_JOGO],
+        )
+        cursor.execute(_APARAR.format(ids=marcadores), ids + [CANDIDATOS_POR_JOGO])
+
+
+def _melhores_por_assinatura(assinatura, grupos, por_categoria):
+    # Os CANDIDATOS_POR_JOGO + 1 melhores jogos para um conjunto de categorias
+    # (+1 porque o próprio jogo sai da lista depois). Empate: o jogo mais novo primeiro
+    vizinhas = {outra for categoria in assinatura for outra in por_categoria[categoria]}
+    niveis = defaultdict(list)
+    for outra in vizinhas:
+        niveis[len(assinatura & outra) / len(assinatura | outra)].append(outra)
+
+    limite = CANDIDATOS_POR_JOGO + 1
+    melhores = []
+    for pontuacao in sorted(niveis, reverse=True):
+        # As listas de ids já estão em ordem decrescente: basta juntar as cabeças
+        cabecas = [grupos[outra][:limite] for outra in niveis[pontuacao]]
+        for id_ in itertools.islice(heapq.merge(*cabecas, reverse=True), limite - len(melhores)):
+            melhores.append((id_, pontuacao))
+        if len(melhores) >= limite:
+            break
+    return melhores
+
+
+def reconstruir_relacionados(tamanho_lote=LOTE_RECONSTRUCAO):
+    # Apaga tudo e recalcula. Jogos com o mesmo conjunto de categorias ("assinatura") têm
+    # as mesmas pontuações com todo mundo, então o Jaccard é calculado entre assinaturas
+    # (poucas, mesmo com muitos jogos) e não entre todos os pares de jogos de cada categoria
+    categorias_por_jogo = defaultdict(set)
+    ligacoes = Jogo.categoria.through.objects.filter(jogo__deletado=False).values_list('jogo_id', 'categoria_id')
+    for jogo_id, categoria_id in ligacoes.iterator(chunk_size=10000):
+        categorias_por_jogo[jogo_id].add(categoria_id)
+
+    grupos = defaultdict(list)  # assinatura -> ids dos jogos, do mais novo para o mais antigo
+    for jogo_id, categorias in categorias_por_jogo.items():
+        grupos[frozenset(categorias)].append(jogo_id)
+    por_categoria = defaultdict(list)  # categoria -> assinaturas que a contêm
+    for assinatura, ids in grupos.items():
+        ids.sort(reverse=True)
+        for categoria in assinatura:
+            por_categoria[categoria].append(assinatura)
+
+    # As linhas vão direto num executemany: com centenas de milhares de linhas,
+    # montar um JogoRelacionado por linha custa mais que o próprio INSERT
+    inserir = f'INSERT INTO {TABELA} (jogo_id, relacionado_id, pontuacao) VALUES (%s, %s, %s)'
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA}')
+        lote = []
+        for assinatura, ids in grupos.items():
+            melhores = _melhores_por_assinatura(assinatura, grupos, por_categoria)
+            for jogo_id in ids:
+                candidatos = [(id_, pontos) for id_, pontos in melhores if id_ != jogo_id][:CANDIDATOS_POR_JOGO]
+                lote.extend((jogo_id, id_, pontos) for id_, pontos in candidatos)
+                if len(lote) >= tamanho_lote:
+                    cursor.executemany(inserir, lote)
+                    total += len(lote)
+                    lote = []
+        if lote:
+            cursor.executemany(inserir, lote)
+    return total + len(lote)
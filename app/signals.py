@@ -0,0 +1,113 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .busca import indexar_jogos, jogo_alterado_autocomplete, remover_do_indice
+from .cache_paginas import invalidar_paginas
+from .carrinho import invalidar_contagem_carrinho, tirar_jogos_dos_carrinhos, usuario_do_item
+from .catalogo import invalidar_categorias_menu, marcar_jogos_alterados
+from .imagens import agendar_derivados, remover_derivados
+from .models import Categoria, Compra, ImagemExtra, ItemCompra, Jogo
+from .relacionados import atualizar_relacionados
+
+
+# ------- CARRINHO -------
+@receiver([post_save, post_delete], sender=ItemCompra)
+def item_compra_alterado(sender, instance, **kwargs):
+    # Adicionou, mudou a quantidade ou removeu um item: o badge precisa ser recalculado
+    invalidar_contagem_carrinho(usuario_do_item(instance))
+
+
+@receiver([post_save, post_delete], sender=Compra)
+def compra_alterada(sender, instance, **kwargs):
+    # Mudança de status (ex: finalizar a compra) tira os itens do carrinho
+    invalidar_contagem_carrinho(instance.usuario_id)
+
+
+@receiver(post_save, sender=Jogo)
+def jogo_salvo_carrinhos(sender, instance, **kwargs):
+    # Soft delete: o jogo sai de todos os carrinhos pendentes (um UPDATE e um DELETE)
+    if instance.deletado:
+        tirar_jogos_dos_carrinhos([instance.pk])
+
+
+@receiver(pre_delete, sender=Jogo)
+def jogo_sera_deletado_carrinhos(sender, instance, **kwargs):
+    # Hard delete: antes do SET_NULL, enquanto os itens ainda apontam para o jogo
+    tirar_jogos_dos_carrinhos([instance.pk])
+
+
+# ------- CATÁLOGO -------
+@receiver([post_save, post_delete], sender=Categoria)
+def categoria_alterada(sender, instance, **kwargs):
+    # Cobre o painel (criar/editar/deletar categoria), o /admin e o shell
+    invalidar_categorias_menu()
+    invalidar_paginas()
+
+
+@receiver([post_save, post_delete], sender=Jogo)
+def jogo_alterado_paginas(sender, instance, **kwargs):
+    # Páginas inteiras dos visitantes (ver cache_paginas.py)
+    invalidar_paginas()
+
+
+# ------- BUSCA -------
+@receiver(post_save, sender=Jogo)
+def jogo_salvo(sender, instance, **kwargs):
+    # Reindexa o jogo; se foi marcado como deletado (soft delete) ele sai dos índices
+    indexar_jogos([instance])
+    jogo_alterado_autocomplete(jogo=instance)
+    # Ícone novo ganha as miniaturas (se já existirem, o worker não refaz);
+    # quando ficam prontas, o card do jogo é refeito com elas
+    agendar_derivados(instance.icone.name, jogo_id=instance.pk)
+
+
+@receiver(post_delete, sender=Jogo)
+def jogo_deletado(sender, instance, **kwargs):
+    remover_do_indice([instance.pk])
+    jogo_alterado_autocomplete(id_removido=instance.pk)
+
+
+# ------- IMAGENS -------
+@receiver(post_save, sender=ImagemExtra)
+def imagem_extra_salva(sender, instance, **kwargs):
+    agendar_derivados(instance.imagem.name)
+    marcar_jogos_alterados([instance.jogo_id])
+
+
+@receiver(post_delete, sender=ImagemExtra)
+def imagem_extra_deletada(sender, instance, **kwargs):
+    remover_derivados(instance.imagem.name)
+    marcar_jogos_alterados([instance.jogo_id])
+
+
+# ------- JOGOS RELACIONADOS -------
+@receiver(m2m_changed, sender=Jogo.categoria.through)
+def categorias_do_jogo_alteradas(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # categoria.jogos.clear(): guarda quem perde a categoria antes dela sumir
+        instance._jogos_afetados = list(instance.jogos.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        # jogo.categoria.set/add/remove/clear
+        afetados = [instance.pk]
+    elif action == 'post_clear':
+        afetados = getattr(instance, '_jogos_afetados', [])
+    else:
+        # categoria.jogos.add/remove
+        afetados = pk_set
+    atualizar_relacionados(afetados)
+    marcar_jogos_alterados(afetados)
+
+
+@receiver(pre_delete, sender=Categoria)
+def categoria_sera_deletada(sender, instance, **kwargs):
+    # O cascade apaga as ligações jogo-categoria sem disparar o m2m_changed
+    instance._jogos_afetados = list(instance.jogos.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Categoria)
+def categoria_deletada_relacionados(sender, instance, **kwargs):
+    atualizar_relacionados(getattr(instance, '_jogos_afetados', []))
+    marcar_jogos_alterados(getattr(instance, '_jogos_afetados', []))
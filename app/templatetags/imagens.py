@@ -0,0 +1,44 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from app.imagens import TAMANHOS, caminho_derivado, derivados_prontos
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagem_responsiva(arquivo, tamanho='card', lazy=True, sizes=None, **atributos):
+    # <img> com as miniaturas WebP: src no tamanho pedido, srcset com todos os tamanhos,
+    # width/height (evita o layout "pular") e loading="lazy".
+    # Uso: {% imagem_responsiva jogo.icone 'card' alt=jogo.nome class='card-img-top' %}
+    # Enquanto as miniaturas não existem (logo após o upload), usa o arquivo original.
+    # Quais existem vem do cache (derivados_prontos), sem um exists() no storage por render.
+    nome = getattr(arquivo, 'name', arquivo) or ''
+    largura, altura = TAMANHOS[tamanho]
+    atributos.update({'width': largura, 'height': altura, 'decoding': 'async'})
+    if lazy:
+        atributos['loading'] = 'lazy'
+
+    prontos = derivados_prontos(nome) if nome else []
+    if tamanho in prontos:
+        atributos['src'] = default_storage.url(caminho_derivado(nome, tamanho))
+        atributos['srcset'] = ', '.join(
+            f'{default_storage.url(caminho_derivado(nome, outro))} {TAMANHOS[outro][0]}w'
+            for outro in prontos
+        )
+        atributos['sizes'] = sizes or f'{largura}px'
+    else:
+        atributos['src'] = default_storage.url(nome) if nome else ''
+
+    return format_html('<img{}>', flatatt(atributos))
+
+
+@register.simple_tag
+def url_miniatura(arquivo, tamanho='card'):
+    # Só a URL (para background-image); cai no original se a miniatura ainda não existe
+    nome = getattr(arquivo, 'name', arquivo) or ''
+    if nome and tamanho in derivados_prontos(nome):
+        return default_storage.url(caminho_derivado(nome, tamanho))
+    return default_storage.url(nome) if nome else ''
@@ -1,3 +1,1112 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+from decimal import ROUND_HALF_UP, Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from painel_controle.acoes import definir_banner, deletar_jogos
+
+from .busca import (
+    CHAVE_MUDANCAS_AUTOCOMPLETE, CHAVE_VERSAO_AUTOCOMPLETE, IndiceAutocomplete,
+    carregar_indice_autocomplete, indice_autocomplete, reconstruir_indice,
+)
+from .cache_paginas import CACHE_PAGINAS
+from .carrinho import obter_carrinho
+from .catalogo import CACHE_FRAGMENTOS, invalidar_categorias_menu, marcar_jogos_alterados
+from .imagens import caminho_derivado, gerar_derivados, remover_derivados
+from .importacao import ImportadorCatalogo, escrever_registros, ler_registros, registros_do_catalogo
+from .perfilador import LIMIAR_N_MAIS_UM, analisar_queries, normalizar_sql
+from .relacionados import reconstruir_relacionados
+from .models import BibliotecaJogo, Categoria, Compra, ImagemExtra, ItemCompra, Jogo, JogoRelacionado
+
+# Os testes usam um cache em memória para não misturar com o cache em disco do servidor
+CACHE_TESTES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    CACHE_FRAGMENTOS: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragmentos-testes'},
+    CACHE_PAGINAS: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'paginas-testes'},
+}
+
+
+def criar_categorias_com_jogos(quantidade, jogos_por_categoria=6, inicio=0):
+    # Cria categorias em destaque, cada uma com alguns jogos (um deles deletado)
+    categorias = Categoria.objects.bulk_create([
+        Categoria(nome=f'Categoria {inicio + i}', destaque=True) for i in range(quantidade)
+    ])
+    jogos = Jogo.objects.bulk_create([
+        Jogo(
+            nome=f'Jogo {c.nome} {j}',
+            preco='59.90',
+            descricao='...',
+            deletado=(j == 0),
+        )
+        for c in categorias for j in range(jogos_por_categoria)
+    ])
+    Through = Jogo.categoria.through
+    Through.objects.bulk_create([
+        Through(jogo_id=jogo.id, categoria_id=categorias[i // jogos_por_categoria].id)
+        for i, jogo in enumerate(jogos)
+    ])
+    # bulk_create não dispara signals
+    invalidar_categorias_menu()
+    return categorias
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class BaseTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches[CACHE_FRAGMENTOS].clear()
+        caches[CACHE_PAGINAS].clear()
+
+
+# ------- PLANOS DE CONSULTA -------
+# Roda EXPLAIN QUERY PLAN em cada query que as views fizeram e acusa as que varrem
+# uma tabela inteira ("SCAN tabela" sem índice). Sem ANALYZE o SQLite não sabe o tamanho
+# das tabelas, então o plano não depende de quantos dados o teste criou.
+# Tabelas que são pequenas por natureza e lidas inteiras de propósito (em cache):
+TABELAS_VARREDURA_PERMITIDA = {'app_categoria', 'auth_group', 'django_content_type', 'auth_permission'}
+# Índices parciais que só guardam um punhado de linhas (ver Jogo.Meta.indexes)
+INDICES_PEQUENOS = {'jogo_banner_idx', 'jogo_pre_lancamento_idx'}
+
+
+class PlanosDeConsultaMixin:
+    def varreduras(self, queries):
+        tabelas = set(connection.introspection.table_names())
+        encontradas = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                    continue
+                # Subqueries do Django usam apelidos (U0, T3...): volta para o nome da tabela
+                apelidos = {apelido: tabela for tabela, apelido in re.findall(r'"(\w+)" ([A-Z]\d+)\b', sql)}
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plano = [detalhe for *_, detalhe in cursor.fetchall()]
+                # O LIMIT só corta a leitura quando as linhas já saem na ordem pedida (sem ordenar tudo antes)
+                limite_corta = ' LIMIT ' in sql and not any('TEMP B-TREE' in detalhe for detalhe in plano)
+                for detalhe in plano:
+                    # Percorrer um índice é aceitável quando o LIMIT corta a leitura (ORDER BY ... LIMIT
+                    # pelo índice da ordenação) ou quando é um dos índices parciais pequenos. A tabela em
+                    # si, só na ordem do id e sem filtro nenhum (a página mais nova de uma lista)
+                    varredura = re.fullmatch(r'SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', detalhe)
+                    if not varredura:
+                        continue
+                    if varredura[2] and (limite_corta or varredura[2] in INDICES_PEQUENOS):
+                        continue
+                    if not varredura[2] and limite_corta and ' WHERE ' not in sql:
+                        continue
+                    tabela = apelidos.get(varredura[1], varredura[1])
+                    if tabela in tabelas and tabela not in TABELAS_VARREDURA_PERMITIDA:
+                        encontradas.append(f'{tabela}: {sql}')
+        return encontradas
+
+    def assertSemVarreduras(self, requisicoes):
+        # requisicoes: {nome: função que faz a requisição}
+        problemas = []
+        for nome, requisitar in requisicoes.items():
+            with CaptureQueriesContext(connection) as ctx:
+                resposta = requisitar()
+            self.assertLess(resposta.status_code, 400, nome)
+            problemas += [f'[{nome}] {varredura}' for varredura in self.varreduras(ctx.captured_queries)]
+        self.assertFalse(problemas, '\n'.join(problemas))
+
+
+class HomeVitrineTests(BaseTestCase):
+    def contar_queries_home(self):
+        # Mede a montagem da página: sem o cache de páginas dos visitantes nem a data do
+        # catálogo guardada (o bulk_create dos testes não passa pelos signals que trocam a versão)
+        cache.clear()
+        caches[CACHE_PAGINAS].clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('home'))
+        self.assertEqual(resposta.status_code, 200)
+        return len(ctx.captured_queries), resposta
+
+    def test_quantidade_de_queries_nao_cresce_com_as_categorias(self):
+        criar_categorias_com_jogos(5)
+        queries_5, _ = self.contar_queries_home()
+
+        criar_categorias_com_jogos(495, inicio=5)
+        queries_500, _ = self.contar_queries_home()
+
+        self.assertEqual(queries_5, queries_500)
+
+    def test_vitrine_mostra_no_maximo_quatro_jogos_vivos(self):
+        categoria = criar_categorias_com_jogos(1)[0]
+        _, resposta = self.contar_queries_home()
+
+        vitrine = resposta.context['categorias_vitrine']
+        self.assertEqual([c.id for c in vitrine], [categoria.id])
+        self.assertEqual(len(vitrine[0].jogos_vitrine), 4)
+        self.assertTrue(vitrine[0].tem_mais_jogos)
+        self.assertFalse(any(jogo.deletado for jogo in vitrine[0].jogos_vitrine))
+        self.assertNotContains(resposta, f'Jogo {categoria.nome} 0<')
+
+    def test_pre_venda_aparece_sem_categorias_em_destaque(self):
+        Jogo.objects.create(nome='Lançamento', preco=10, descricao='...', pre_lancamento=True)
+        _, resposta = self.contar_queries_home()
+        self.assertEqual(list(resposta.context['categorias_vitrine']), [])
+        self.assertContains(resposta, 'CONFIRA AGORA')
+
+
+class MenuCategoriasTests(BaseTestCase):
+    def test_menu_em_cache_e_invalidado_ao_salvar_categoria(self):
+        Categoria.objects.create(nome='RPG')
+        self.assertContains(self.client.get(reverse('faq')), 'RPG')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('faq'))
+        self.assertFalse([q for q in ctx.captured_queries if 'app_categoria' in q['sql']])
+
+        categoria = Categoria.objects.get(nome='RPG')
+        categoria.nome = 'Ação'
+        categoria.save()
+        resposta = self.client.get(reverse('faq'))
+        self.assertContains(resposta, 'Ação')
+        self.assertNotContains(resposta, 'RPG')
+
+
+class BuscaTests(BaseTestCase):
+    def buscar(self, texto):
+        return [jogo.nome for jogo in self.client.get(reverse('resultado_pesquisa'), {'q': texto}).context['jogos']]
+
+    def test_busca_ranqueia_nome_e_acompanha_o_soft_delete(self):
+        Jogo.objects.create(nome='Corrida Noturna', preco='10.00', descricao='Um jogo sobre dragões.')
+        dragao = Jogo.objects.create(nome='Dragão Ancião', preco='10.00', descricao='Voe pelo reino.')
+
+        # Sem acento e só o prefixo também acha; o jogo com o termo no nome vem primeiro
+        self.assertEqual(self.buscar('drag'), ['Dragão Ancião', 'Corrida Noturna'])
+
+        dragao.deletado = True
+        dragao.save()
+        self.assertEqual(self.buscar('drag'), ['Corrida Noturna'])
+
+        Jogo.objects.filter(nome='Corrida Noturna').get().delete()
+        self.assertEqual(self.buscar('drag'), [])
+
+
+class AutocompleteTests(BaseTestCase):
+    def autocomplete(self, termo):
+        return self.client.get(reverse('autocomplete_search'), {'term': termo})
+
+    def test_indice_em_memoria_sem_acento_e_atualizado_ao_salvar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jogo = Jogo.objects.create(nome='Coração Valente', preco='10.00', descricao='...')
+        self.autocomplete('co')  # aquece o índice
+
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.autocomplete('VALEN')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertIn('max-age', resposta['Cache-Control'])
+        self.assertEqual([r['id'] for r in resposta.json()], [jogo.id])
+        self.assertEqual(resposta.json()[0]['icon_url'], jogo.icone.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jogo.deletado = True
+            jogo.save()
+        self.assertEqual(self.autocomplete('coracao').json(), [])
+
+    def test_outro_worker_aplica_so_as_mudancas(self):
+        jogo = Jogo.objects.create(nome='Coração Valente', preco='10.00', descricao='...')
+        outro_worker = IndiceAutocomplete()
+        outro_worker.carregar()
+        pendente = lambda: outro_worker._pendente(cache.get_many([CHAVE_VERSAO_AUTOCOMPLETE, CHAVE_MUDANCAS_AUTOCOMPLETE]))
+        indice_autocomplete.carregar()
+
+        # Preço não aparece no autocomplete: ninguém é avisado
+        with self.captureOnCommitCallbacks(execute=True):
+            jogo.preco = '20.00'
+            jogo.save()
+        self.assertIsNone(pendente())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jogo.nome = 'Coração Corajoso'
+            jogo.save()
+        self.assertEqual(pendente(), outro_worker.carregar_mudancas)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual([r['label'] for r in outro_worker.buscar('coraj')], ['Coração Corajoso'])
+        # Só os jogos alterados, pelo índice do atualizado_em
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('atualizado_em', ctx.captured_queries[0]['sql'])
+        self.assertEqual(outro_worker.buscar('valente'), [])
+
+    def test_view_async_atende_varias_teclas_ao_mesmo_tempo_pelo_asgi(self):
+        Jogo.objects.bulk_create(
+            [Jogo(nome=f'Jogo {i} Tactics', preco='10.00', descricao='...') for i in range(25)]
+            + [Jogo(nome='Jogo Valente', preco='10.00', descricao='...')]
+        )
+        url = reverse('autocomplete_search')
+
+        async def digitar():
+            return await asyncio.gather(*(
+                self.async_client.get(url, {'term': termo}) for termo in ('jogo val', 'tact jogo 2', 'zzz')
+            ))
+
+        respostas = async_to_sync(digitar)()
+        self.assertEqual([resposta.status_code for resposta in respostas], [200, 200, 200])
+        self.assertIn('ETag', respostas[0])
+        self.assertEqual([r['label'] for r in respostas[0].json()], ['Jogo Valente'])
+        # "2" é a palavra mais seletiva, mesmo sendo a mais curta
+        self.assertEqual(
+            [r['label'] for r in respostas[1].json()],
+            ['Jogo 2 Tactics', 'Jogo 20 Tactics', 'Jogo 21 Tactics', 'Jogo 22 Tactics', 'Jogo 23 Tactics', 'Jogo 24 Tactics'],
+        )
+        self.assertEqual(respostas[2].json(), [])
+
+
+class ContadorCarrinhoTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(self.usuario)
+        self.jogo = Jogo.objects.create(nome='Jogo', preco='10.00', descricao='...')
+
+    def badge(self):
+        return self.client.get(reverse('faq')).context['total_itens_carrinho']
+
+    def test_render_quente_nao_consulta_o_carrinho(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogo.id]))
+        self.assertEqual(self.badge(), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.badge(), 1)
+        tabelas_carrinho = [q['sql'] for q in ctx.captured_queries
+                            if 'app_compra' in q['sql'] or 'app_itemcompra' in q['sql']]
+        self.assertEqual(tabelas_carrinho, [])
+
+    def test_contagem_acompanha_adicionar_remover_e_finalizar(self):
+        self.assertEqual(self.badge(), 0)
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogo.id]))
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogo.id]))
+        self.assertEqual(self.badge(), 2)
+
+        item = ItemCompra.objects.get(compra__usuario=self.usuario)
+        self.client.get(reverse('remover_carrinho', args=[item.id]))
+        self.assertEqual(self.badge(), 1)
+
+        self.client.post(reverse('finalizar_compra'))
+        self.assertEqual(Compra.objects.get(usuario=self.usuario).status, 'finalizada')
+        self.assertEqual(self.badge(), 0)
+
+
+class OperacoesCarrinhoTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(self.usuario)
+        self.jogos = Jogo.objects.bulk_create([
+            Jogo(nome=f'Jogo {i}', preco='19.99', desconto=i % 3 * 15, descricao='...') for i in range(31)
+        ])
+
+    def queries_ao_adicionar(self, jogo):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+        return len(ctx.captured_queries)
+
+    def test_queries_e_total_nao_dependem_do_tamanho_do_carrinho(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+        com_um_item = self.queries_ao_adicionar(self.jogos[0])
+
+        for jogo in self.jogos[1:30]:
+            self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+        com_trinta_itens = self.queries_ao_adicionar(self.jogos[0])
+        self.assertEqual(com_um_item, com_trinta_itens)
+
+        carrinho = Compra.objects.get(usuario=self.usuario, status='pendente')
+        esperado = sum(item.subtotal() for item in carrinho.itens.all())
+        self.assertEqual(carrinho.valor_total, esperado.quantize(Decimal('0.01'), ROUND_HALF_UP))
+        self.assertEqual(carrinho.itens.get(jogo=self.jogos[0]).quantidade, 3)
+
+    def test_remover_so_mexe_no_proprio_carrinho(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[1].id]))
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[1].id]))
+        item = ItemCompra.objects.get()
+
+        self.client.get(reverse('remover_carrinho', args=[item.id]))
+        item.refresh_from_db()
+        self.assertEqual(item.quantidade, 1)
+        self.assertEqual(item.compra.valor_total, Decimal('16.99'))
+
+        outro = User.objects.create_user('outro', password='senha-123')
+        self.client.force_login(outro)
+        self.assertEqual(self.client.get(reverse('remover_carrinho', args=[item.id])).status_code, 404)
+
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('remover_carrinho', args=[item.id]))
+        self.assertFalse(ItemCompra.objects.exists())
+        self.assertEqual(Compra.objects.get().valor_total, Decimal('0'))
+
+    def test_um_carrinho_pendente_por_usuario(self):
+        carrinho = obter_carrinho(self.usuario)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Compra.objects.create(usuario=self.usuario)
+        # Finalizadas não contam: o próximo carrinho é uma compra nova
+        Compra.objects.filter(pk=carrinho.pk).update(status='finalizada')
+        self.assertNotEqual(obter_carrinho(self.usuario).pk, carrinho.pk)
+
+
+class PaginaCarrinhoTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(self.usuario)
+
+    def test_get_sem_carrinho_nao_cria_nada(self):
+        resposta = self.client.get(reverse('carrinho'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context['total'], Decimal('0'))
+        self.assertFalse(Compra.objects.exists())
+
+    def test_totais_calculados_no_banco_sem_escrever(self):
+        jogos = Jogo.objects.bulk_create([
+            Jogo(nome='Cheio', preco='59.90', descricao='...'),
+            Jogo(nome='Promo', preco='19.99', desconto=15, descricao='...'),
+            Jogo(nome='Sumiu', preco='10.00', descricao='...'),
+        ])
+        carrinho = Compra.objects.create(usuario=self.usuario, valor_total=0)
+        for jogo, quantidade in zip(jogos, (1, 2, 1)):
+            ItemCompra.objects.create(compra=carrinho, jogo=jogo, quantidade=quantidade, preco_unitario=jogo.preco)
+        Jogo.objects.filter(nome='Sumiu').update(deletado=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('carrinho'))
+        self.assertFalse([q for q in ctx.captured_queries if not q['sql'].startswith('SELECT')])
+
+        itens = list(resposta.context['itens'])
+        self.assertEqual([item.jogo.nome for item in itens], ['Cheio', 'Promo'])
+        self.assertEqual(itens[1].preco_final, Decimal('16.99'))
+        self.assertEqual(itens[1].desconto_linha, Decimal('6.00'))
+        # 59.90 + 2 x 19.99 = 99.88; 59.90 + 2 x 16.99 (16.9915 arredondado por unidade) = 93.88
+        self.assertEqual(resposta.context['subtotal_sem_desconto'], Decimal('99.88'))
+        self.assertEqual(resposta.context['total'], Decimal('93.88'))
+        self.assertEqual(resposta.context['valor_descontado'], Decimal('6.00'))
+        self.assertTrue(ItemCompra.objects.filter(jogo__nome='Sumiu').exists())
+
+
+class JogosDeletadosNosCarrinhosTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.jogos = [Jogo.objects.create(nome=f'Jogo {i}', preco='10.00', descricao='...') for i in range(2)]
+        self.usuarios = []
+
+    def encher_carrinhos(self, quantidade):
+        for _ in range(quantidade):
+            usuario = User.objects.create_user(f'cliente{len(self.usuarios)}', password='senha-123')
+            self.client.force_login(usuario)
+            for jogo in self.jogos:
+                self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+            self.usuarios.append(usuario)
+
+    def deletar(self, jogo):
+        jogo.deletado = True
+        with CaptureQueriesContext(connection) as ctx:
+            jogo.save()
+        return [q['sql'] for q in ctx.captured_queries if 'app_itemcompra' in q['sql']]
+
+    def test_soft_e_hard_delete_saem_de_todos_os_carrinhos(self):
+        self.encher_carrinhos(1)
+        com_um = self.deletar(self.jogos[0])
+        self.jogos[0].deletado = False
+        self.jogos[0].save()
+        self.client.force_login(self.usuarios[0])
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+
+        self.encher_carrinhos(5)
+        self.assertEqual(self.client.get(reverse('faq')).context['total_itens_carrinho'], 2)
+        com_seis = self.deletar(self.jogos[0])
+        # Um UPDATE dos totais e um DELETE dos itens, não importa quantos carrinhos
+        self.assertEqual(len(com_um), len(com_seis))
+        self.assertFalse(ItemCompra.objects.filter(jogo=self.jogos[0]).exists())
+        self.assertEqual(set(Compra.objects.values_list('valor_total', flat=True)), {Decimal('10.00')})
+        self.assertEqual(self.client.get(reverse('faq')).context['total_itens_carrinho'], 1)
+
+        self.jogos[1].delete()
+        self.assertFalse(ItemCompra.objects.exists())
+        self.assertEqual(set(Compra.objects.values_list('valor_total', flat=True)), {Decimal('0')})
+
+    def test_verificar_carrinhos_encontra_e_corrige(self):
+        self.encher_carrinhos(2)
+        # update() não passa pelos signals: fica sujeira para o comando achar
+        Compra.objects.filter(usuario=self.usuarios[1]).update(valor_total=99)
+        saida = StringIO()
+        call_command('verificar_carrinhos', stdout=saida)
+        self.assertIn('0 itens de jogos deletados em carrinhos, 1 carrinhos com o total errado', saida.getvalue())
+
+        Jogo.objects.filter(pk=self.jogos[0].pk).update(deletado=True)
+
+        call_command('verificar_carrinhos', '--corrigir', stdout=StringIO())
+        self.assertEqual(ItemCompra.objects.count(), 2)
+        self.assertEqual(set(Compra.objects.values_list('valor_total', flat=True)), {Decimal('10.00')})
+
+
+class PrecosNoBancoTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rpg = Categoria.objects.create(nome='RPG')
+        self.jogos = Jogo.objects.bulk_create([
+            Jogo(nome='Caro', preco='100.00', desconto=50, descricao='dragão'),  # 50.00
+            Jogo(nome='Promo', preco='19.99', desconto=15, descricao='dragão'),  # 16.99 (16.9915)
+            Jogo(nome='Meio', preco='0.05', desconto=50, descricao='dragão'),    # 0.03 (0.025, meio para cima)
+            Jogo(nome='Cheio', preco='30.00', descricao='dragão'),
+        ])
+        self.rpg.jogos.add(*self.jogos)
+        reconstruir_indice()  # bulk_create não passa pelos signals da busca
+
+    def test_with_prices_bate_com_as_properties(self):
+        for jogo in Jogo.objects.with_prices():
+            self.assertEqual(jogo.preco_efetivo, jogo.preco_com_desconto)
+            self.assertEqual(jogo.desconto_efetivo, jogo.valor_desconto)
+        self.assertEqual(Jogo.objects.get(nome='Meio').preco_com_desconto, Decimal('0.03'))
+
+    def test_categoria_e_busca_ordenam_e_filtram_pelo_preco_com_desconto(self):
+        def nomes(url, **params):
+            return [jogo.nome for jogo in self.client.get(url, params).context['jogos']]
+
+        categoria = reverse('detalhe_categoria', args=[self.rpg.id])
+        self.assertEqual(nomes(categoria, ordem='preco'), ['Meio', 'Promo', 'Cheio', 'Caro'])
+        self.assertEqual(nomes(categoria, ordem='-preco', preco_min='16.99', preco_max='49,99'), ['Cheio', 'Promo'])
+        self.assertEqual(nomes(categoria, ordem='invalida', preco_min='abc'), ['Caro', 'Promo', 'Meio', 'Cheio'])
+
+        busca = reverse('resultado_pesquisa')
+        self.assertEqual(nomes(busca, q='drag', ordem='preco', preco_max='20'), ['Meio', 'Promo'])
+        resposta = self.client.get(busca, {'q': 'drag', 'ordem': 'preco'})
+        self.assertEqual(resposta.context['filtros_url'], '&ordem=preco')
+
+
+class ApiCatalogoTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rpg = Categoria.objects.create(nome='RPG')
+        # Preços repetidos para o empate ser resolvido pelo id entre as páginas
+        self.jogos = Jogo.objects.bulk_create([
+            Jogo(nome=f'Dragão {i}', preco='20.00', desconto=(50 if i % 3 == 0 else 0), descricao='dragão',
+                 lancamento=f'2024-01-{i % 4 + 1:02d}')
+            for i in range(11)
+        ])
+        self.rpg.jogos.add(*self.jogos[:7])
+        Jogo.objects.filter(id=self.jogos[0].id).update(deletado=True)
+        reconstruir_indice()
+
+    def percorrer(self, url, **params):
+        # Segue os cursores até o fim; retorna os ids na ordem e quantas páginas vieram
+        ids, paginas, cursor = [], 0, None
+        while True:
+            dados = self.client.get(url, {**params, 'limite': 3, **({'cursor': cursor} if cursor else {})}).json()
+            ids += [jogo['id'] for jogo in dados['resultados']]
+            paginas += 1
+            cursor = dados['proximo']
+            if not cursor:
+                return ids, paginas
+
+    def test_paginas_por_cursor_seguem_a_ordem_sem_repetir(self):
+        vivos = Jogo.objects.filter(deletado=False)
+        url = reverse('api_jogos')
+        self.assertEqual(
+            self.percorrer(url, ordem='preco'),
+            (list(vivos.order_by('preco_final_centavos', 'id').values_list('id', flat=True)), 4),
+        )
+        ids, _ = self.percorrer(url, categoria=self.rpg.id)
+        self.assertEqual(ids, list(vivos.filter(categoria=self.rpg).order_by('-lancamento', '-id').values_list('id', flat=True)))
+
+        ids, _ = self.percorrer(reverse('api_busca'), q='drag')
+        self.assertEqual(sorted(ids), sorted(vivos.values_list('id', flat=True)))
+
+    def test_cada_pagina_custa_as_mesmas_queries(self):
+        url = reverse('api_jogos')
+        cursor = self.client.get(url, {'limite': 3}).json()['proximo']
+        with CaptureQueriesContext(connection) as queries:
+            jogo = self.client.get(url, {'limite': 3, 'cursor': cursor}).json()['resultados'][0]
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(jogo['preco_final'], '10.00' if jogo['desconto'] else '20.00')
+
+    def test_detalhe_galeria_e_erros(self):
+        jogo = self.jogos[1]
+        dados = self.client.get(reverse('api_jogo_detalhe', args=[jogo.id])).json()
+        self.assertEqual((dados['nome'], dados['categorias']), (jogo.nome, [{'id': self.rpg.id, 'nome': 'RPG'}]))
+        self.assertEqual(self.client.get(reverse('api_jogo_imagens', args=[jogo.id])).json(), {'resultados': []})
+
+        self.assertEqual(self.client.get(reverse('api_jogo_detalhe', args=[self.jogos[0].id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_jogos'), {'cursor': 'lixo'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_jogos'), {'ordem': 'nome'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_jogos'), {'categoria': 999}).status_code, 404)
+
+
+class FinalizacaoTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(self.usuario)
+        self.jogos = Jogo.objects.bulk_create([
+            Jogo(nome=f'Jogo {i}', preco='19.99', desconto=15, descricao='...') for i in range(10)
+        ])
+
+    def finalizar(self, token):
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.post(reverse('finalizar_compra'), {'token': token})
+        self.assertRedirects(resposta, reverse('perfil'), fetch_redirect_response=False)
+        return len(ctx.captured_queries)
+
+    def test_queries_constantes_e_precos_congelados(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+        com_um = self.finalizar('a')
+        for jogo in self.jogos:
+            self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+        self.assertEqual(self.finalizar('b'), com_um)
+
+        # Mudar o preço depois não mexe no que já foi vendido
+        Jogo.objects.update(desconto=50, nome='Outro nome')
+        compra = Compra.objects.get(token_finalizacao='b')
+        self.assertEqual(compra.valor_total, Decimal('169.90'))
+        item = compra.itens.get(jogo=self.jogos[0])
+        self.assertEqual((item.preco_unitario, item.desconto_unitario), (Decimal('16.99'), Decimal('3.00')))
+        self.assertEqual(item.nome_snapshot, 'Jogo 0')
+        self.assertEqual(item.subtotal(), Decimal('16.99'))
+
+    def test_mesmo_token_nao_finaliza_duas_vezes(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+        token = self.client.get(reverse('carrinho')).context['token_finalizacao']
+        self.finalizar(token)
+        # Novo carrinho aberto em outra aba antes do segundo clique
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[1].id]))
+        self.finalizar(token)
+
+        self.assertEqual(Compra.objects.filter(status='finalizada').count(), 1)
+        self.assertEqual(Compra.objects.get(status='pendente').itens.get().jogo, self.jogos[1])
+
+    def test_token_de_outro_usuario_nao_impede_a_finalizacao(self):
+        outro = User.objects.create_user('outro', password='senha-123')
+        Compra.objects.create(usuario=outro, status='finalizada', token_finalizacao='mesmo')
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+        self.finalizar('mesmo')
+        self.assertEqual(Compra.objects.get(usuario=self.usuario).status, 'finalizada')
+
+    def test_jogo_deletado_no_carrinho_nao_e_cobrado_nem_entregue(self):
+        for jogo in self.jogos[:2]:
+            self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+        # Soft delete sem passar pelo painel: o item ficou para trás no carrinho
+        Jogo.objects.filter(pk=self.jogos[1].pk).update(deletado=True)
+        self.finalizar('a')
+
+        compra = Compra.objects.get(token_finalizacao='a')
+        self.assertEqual(compra.valor_total, Decimal('16.99'))
+        self.assertEqual([item.jogo for item in compra.itens.all()], [self.jogos[0]])
+        self.assertEqual(list(BibliotecaJogo.objects.values_list('jogo', flat=True)), [self.jogos[0].id])
+
+    def test_visitante_nao_finaliza(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+        self.client.logout()
+        resposta = self.client.post(reverse('finalizar_compra'), {'token': 'a'})
+        self.assertTrue(resposta.url.startswith(settings.LOGIN_URL))
+        self.assertEqual(Compra.objects.get().status, 'pendente')
+
+    def test_erro_de_integridade_avisa_o_cliente(self):
+        self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+        with mock.patch('app.views.finalizar_carrinho', side_effect=IntegrityError):
+            resposta = self.client.post(reverse('finalizar_compra'), {'token': 'x'}, follow=True)
+        self.assertRedirects(resposta, reverse('carrinho'))
+        self.assertContains(resposta, 'Não foi possível finalizar a compra')
+
+
+class BibliotecaTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(self.usuario)
+        self.jogos = Jogo.objects.bulk_create([
+            Jogo(nome=f'Jogo {i}', preco='9.99', descricao='...') for i in range(10)
+        ])
+
+    def comprar(self, jogos):
+        for jogo in jogos:
+            self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+        self.client.post(reverse('finalizar_compra'))
+
+    def queries_do_perfil(self):
+        self.client.get(reverse('perfil'))  # cria o FotoPerfil
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('perfil'))
+        return resposta, len(ctx.captured_queries)
+
+    def test_finalizar_preenche_a_biblioteca_e_perfil_nao_cresce(self):
+        self.comprar(self.jogos[:1])
+        resposta, com_uma_compra = self.queries_do_perfil()
+        self.assertEqual([e.nome_snapshot for e in resposta.context['biblioteca']], ['Jogo 0'])
+
+        # Comprar de novo um jogo que já tem não duplica a biblioteca
+        for i in range(1, 10):
+            self.comprar(self.jogos[i - 1:i + 1])
+        resposta, com_dez_compras = self.queries_do_perfil()
+        self.assertEqual(com_uma_compra, com_dez_compras)
+        self.assertEqual(BibliotecaJogo.objects.filter(usuario=self.usuario).count(), 10)
+        self.assertEqual(resposta.context['biblioteca'][0].jogo, self.jogos[9])
+
+    def test_backfill_das_compras_antigas_pode_rodar_de_novo(self):
+        self.comprar(self.jogos[:3])
+        self.comprar(self.jogos[2:4])
+        BibliotecaJogo.objects.all().delete()
+        self.jogos[0].delete()  # hard delete: fica só o snapshot
+
+        call_command('preencher_biblioteca', stdout=StringIO())
+        call_command('preencher_biblioteca', stdout=StringIO())
+        entradas = BibliotecaJogo.objects.filter(usuario=self.usuario)
+        self.assertEqual(entradas.count(), 4)
+        self.assertEqual(entradas.get(jogo=None).nome_snapshot, 'Jogo 0')
+        self.assertEqual(entradas.get(jogo=self.jogos[2]).compra, Compra.objects.order_by('id').first())
+
+
+class MidiaTemporariaTestCase(BaseTestCase):
+    # MEDIA_ROOT numa pasta temporária, apagada no fim de cada teste
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def png(self, largura, altura):
+        buffer = BytesIO()
+        Image.new('RGB', (largura, altura), 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile('capa.png', buffer.getvalue(), content_type='image/png')
+
+
+class MiniaturasTests(MidiaTemporariaTestCase):
+    def renderizar(self, jogo):
+        return Template(
+            "{% load imagens %}{% imagem_responsiva jogo.icone 'card' alt=jogo.nome %}"
+        ).render(Context({'jogo': jogo}))
+
+    def test_derivados_gerados_depois_do_commit_e_usados_no_template(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            jogo = Jogo.objects.create(nome='Capa', preco=10, descricao='...', icone=self.png(1000, 500))
+        # O upload não gera nada na hora: fica agendado para depois do commit
+        self.assertTrue(callbacks)
+        self.assertNotIn('srcset', self.renderizar(jogo))
+        self.assertIn(f'src="/media/{jogo.icone.name}"', self.renderizar(jogo))
+
+        self.assertEqual(gerar_derivados(jogo.icone.name), 3)
+        self.assertEqual(gerar_derivados(jogo.icone.name), 0)
+        with default_storage.open('derivados/card/icones/capa.webp') as arquivo:
+            self.assertEqual(Image.open(arquivo).size, (640, 360))
+
+        # gerar_derivados registrou os tamanhos prontos: o render não consulta o storage
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError('exists() no render')):
+            html = self.renderizar(jogo)
+        self.assertIn('src="/media/derivados/card/icones/capa.webp"', html)
+        self.assertIn('/media/derivados/banner/icones/capa.webp 1280w', html)
+        self.assertIn('width="640"', html)
+        self.assertIn('loading="lazy"', html)
+
+        remover_derivados(jogo.icone.name)
+        self.assertIn(f'src="/media/{jogo.icone.name}"', self.renderizar(jogo))
+
+    def test_outro_job_gravando_a_mesma_miniatura_nao_deixa_copia_com_sufixo(self):
+        nome = default_storage.save('icones/capa.png', self.png(1000, 500))
+        gerar_derivados(nome)
+        apagar = default_storage.delete
+
+        def outro_job_grava_no_meio(caminho):
+            apagar(caminho)
+            default_storage.save(caminho, ContentFile(b'outro job'))
+
+        with mock.patch.object(default_storage, 'delete', side_effect=outro_job_grava_no_meio):
+            self.assertEqual(gerar_derivados(nome, forcar=True), 3)
+        for tamanho in ('thumb', 'card', 'banner'):
+            self.assertEqual(default_storage.listdir(f'derivados/{tamanho}/icones')[1], ['capa.webp'])
+
+
+class CardsEmCacheTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.categoria = Categoria.objects.create(nome='Aventura', destaque=True)
+        self.jogo = Jogo.objects.create(nome='Zelda', preco='100.00', descricao='...', banner=True)
+        self.jogo.categoria.add(self.categoria)
+        self.url = reverse('detalhe_categoria', args=[self.categoria.id])
+
+    def renomear_sem_save(self, nome):
+        # Muda o banco sem passar pelo save(): o card em cache continua o mesmo
+        Jogo.objects.filter(id=self.jogo.id).update(nome=nome)
+
+    def test_card_fica_em_cache_ate_o_jogo_mudar(self):
+        self.assertContains(self.client.get(self.url), 'Zelda</h5>')
+        self.renomear_sem_save('Metroid')
+        self.assertContains(self.client.get(self.url), 'Zelda</h5>')
+
+        marcar_jogos_alterados([self.jogo.id])
+        self.assertContains(self.client.get(self.url), 'Metroid</h5>')
+
+        jogo = Jogo.objects.get(id=self.jogo.id)
+        jogo.nome = 'Kirby'
+        jogo.save()
+        self.assertContains(self.client.get(self.url), 'Kirby</h5>')
+
+    def test_categorias_e_imagens_trocam_a_versao(self):
+        versao = lambda: Jogo.objects.values_list('atualizado_em', flat=True).get(id=self.jogo.id)
+        antes = versao()
+        self.jogo.categoria.add(Categoria.objects.create(nome='RPG'))
+        depois_categoria = versao()
+        self.assertGreater(depois_categoria, antes)
+
+        ImagemExtra.objects.create(jogo=self.jogo, imagem='jogos-extras/zelda/zelda-1.png')
+        self.assertGreater(versao(), depois_categoria)
+
+    def test_parte_do_usuario_fica_fora_do_cache(self):
+        self.assertContains(self.client.get(self.url), f'href="{reverse("login")}" class="btn-game')
+        usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(usuario)
+        resposta = self.client.get(self.url)
+        self.assertContains(resposta, reverse('adicionar_carrinho', args=[self.jogo.id]))
+        self.assertContains(resposta, 'Zelda</h5>')
+
+    def test_carrossel_em_cache_muda_com_os_jogos_do_banner(self):
+        self.assertContains(self.client.get(reverse('home')), '>Zelda</h1>')
+        self.renomear_sem_save('Metroid')
+        self.assertContains(self.client.get(reverse('home')), '>Zelda</h1>')
+
+        outro = Jogo.objects.create(nome='Kirby', preco='10.00', descricao='...', banner=True)
+        resposta = self.client.get(reverse('home'))
+        self.assertContains(resposta, '>Metroid</h1>')
+        self.assertContains(resposta, '>Kirby</h1>')
+
+        outro.banner = False
+        outro.save()
+        self.assertNotContains(self.client.get(reverse('home')), '>Kirby</h1>')
+
+
+class CachePaginasVisitantesTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.categoria = Categoria.objects.create(nome='Aventura', destaque=True)
+        self.jogo = Jogo.objects.create(nome='Zelda', preco='100.00', descricao='...', banner=True)
+        self.jogo.categoria.add(self.categoria)
+        self.urls = [
+            reverse('home'),
+            reverse('detalhe_categoria', args=[self.categoria.id]),
+            reverse('jogo_detalhe', args=[self.jogo.id]),
+        ]
+
+    def test_visitante_recebe_do_cache_ate_o_catalogo_mudar(self):
+        for url in self.urls:
+            self.assertContains(self.client.get(url), 'Zelda')
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(url), 'Zelda')
+        # Outra query string é outra página
+        self.assertNotContains(self.client.get(self.urls[1], {'preco_min': 500}), 'Zelda</h5>')
+
+        self.jogo.nome = 'Metroid'
+        self.jogo.save()
+        for url in self.urls:
+            self.assertContains(self.client.get(url), 'Metroid')
+
+        definir_banner([self.jogo.id], False)
+        self.assertNotContains(self.client.get(self.urls[0]), '>Metroid</h1>')
+
+    def test_logado_e_mensagens_pendentes_nao_usam_o_cache(self):
+        self.client.get(self.urls[0])
+        Categoria.objects.bulk_create([Categoria(nome='Estratégia', destaque=True)])  # sem trocar a versão
+        self.assertNotContains(Client().get(self.urls[0]), 'Estratégia')
+
+        # Mensagem pendente (o cadastro com erro não mostra na própria página)
+        self.client.post(reverse('cadastro'), {'username': 'x', 'password1': 'a', 'password2': 'b'})
+        self.assertContains(self.client.get(self.urls[0]), 'Estratégia')
+
+        cliente = Client()
+        cliente.force_login(User.objects.create_user('cliente', password='senha-123'))
+        resposta = cliente.get(self.urls[0])
+        self.assertContains(resposta, 'Estratégia')
+        self.assertContains(resposta, 'Olá, cliente')
+        # A página do cliente (com o token CSRF dele) não foi guardada para os visitantes
+        self.assertNotContains(Client().get(self.urls[0]), 'csrfmiddlewaretoken')
+
+
+class GetCondicionalTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.categoria = Categoria.objects.create(nome='Aventura', destaque=True)
+        self.jogo = Jogo.objects.create(nome='Zelda', preco='100.00', descricao='...')
+        self.jogo.categoria.add(self.categoria)
+
+    def test_304_enquanto_o_catalogo_nao_muda(self):
+        url = reverse('jogo_detalhe', args=[self.jogo.id])
+        resposta = self.client.get(url)
+        etag = resposta['ETag']
+        self.assertIn('Last-Modified', resposta)
+        self.assertIn('no-cache', resposta['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=resposta['Last-Modified']).status_code, 304)
+
+        self.jogo.preco = '80.00'
+        self.jogo.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+        # Apagar não deixa data nova, mas troca o ETag
+        etag = resposta['ETag']
+        Categoria.objects.create(nome='Vazia').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_logado_sem_validadores_e_autocomplete_com(self):
+        self.client.force_login(User.objects.create_user('cliente', password='senha-123'))
+        self.assertNotIn('ETag', self.client.get(reverse('home')))
+
+        url = reverse('autocomplete_search')
+        etag = self.client.get(url, {'term': 'zel'})['ETag']
+        self.assertEqual(self.client.get(url, {'term': 'zel'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class JogosRelacionadosTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.acao, self.rpg, self.terror = (
+            Categoria.objects.create(nome=nome) for nome in ('Ação', 'RPG', 'Terror')
+        )
+        self.jogo = Jogo.objects.create(nome='Base', preco=10, descricao='...')
+        self.jogo.categoria.set([self.acao, self.rpg])
+        self.outros = []
+        for nome, categorias in (('Igual', [self.acao, self.rpg]), ('Meio', [self.acao]), ('Nada', [self.terror])):
+            outro = Jogo.objects.create(nome=nome, preco=10, descricao='...')
+            outro.categoria.set(categorias)
+            self.outros.append(outro)
+
+    def lista(self, jogo):
+        return dict(
+            JogoRelacionado.objects.filter(jogo=jogo).values_list('relacionado__nome', 'pontuacao')
+        )
+
+    def test_lista_acompanha_categorias_e_soft_delete(self):
+        self.assertEqual(self.lista(self.jogo), {'Igual': 1.0, 'Meio': 0.5})
+        self.assertEqual(self.lista(self.outros[1]), {'Base': 0.5, 'Igual': 0.5})
+
+        self.outros[2].categoria.add(self.rpg)  # Nada: {Terror, RPG} -> 1/3 com o Base
+        self.assertAlmostEqual(self.lista(self.jogo)['Nada'], 1 / 3)
+
+        deletar_jogos([self.outros[0].id])
+        self.assertNotIn('Igual', self.lista(self.jogo))
+
+        incremental = set(JogoRelacionado.objects.values_list('jogo', 'relacionado', 'pontuacao'))
+        reconstruir_relacionados()
+        self.assertEqual(incremental, set(JogoRelacionado.objects.values_list('jogo', 'relacionado', 'pontuacao')))
+
+    def test_editar_o_preco_nao_recalcula_as_listas(self):
+        for jogo in (Jogo.objects.get(id=self.jogo.id), self.outros[1]):
+            jogo.preco = 99
+            with CaptureQueriesContext(connection) as ctx:
+                jogo.save()
+            escritas = [
+                q['sql'] for q in ctx.captured_queries
+                if JogoRelacionado._meta.db_table in q['sql'] and not q['sql'].lstrip().upper().startswith('SELECT')
+            ]
+            self.assertEqual(escritas, [])
+
+    def test_pagina_do_jogo_sorteia_da_lista_sem_order_by_random(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('jogo_detalhe', args=[self.jogo.id]))
+        self.assertEqual({j.nome for j in resposta.context['jogos_relacionados']}, {'Igual', 'Meio'})
+        self.assertFalse([q for q in ctx.captured_queries if 'RANDOM' in q['sql'].upper()])
+
+
+class ImportacaoCatalogoTests(MidiaTemporariaTestCase):
+    CSV = (
+        'id,nome,preco,descricao,lancamento,desconto,categorias,icone,imagens\n'
+        '{id},Atualizado,20.00,Novo texto,2020-01-01,10,Ação|RPG,capa.png,\n'
+        ',Novo,5.50,Outro jogo,,,RPG,,capa.png|capa.png\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+        with open(f'{self.pasta}/capa.png', 'wb') as arquivo:
+            arquivo.write(self.png(100, 50).read())
+        self.existente = Jogo.objects.create(nome='Antigo', preco=10, descricao='...')
+
+    def importar(self, registros, **opcoes):
+        return ImportadorCatalogo(tamanho_lote=1, workers=2, **opcoes).importar(registros)
+
+    def test_csv_cria_atualiza_e_exportacao_volta_igual(self):
+        linhas = ler_registros(StringIO(self.CSV.format(id=self.existente.id)), 'csv')
+        self.assertEqual(self.importar(linhas, pasta_imagens=self.pasta), 2)
+
+        atualizado = Jogo.objects.get(id=self.existente.id)
+        novo = Jogo.objects.get(nome='Novo')
+        self.assertEqual((atualizado.nome, atualizado.preco, atualizado.desconto), ('Atualizado', Decimal('20.00'), 10))
+        self.assertEqual(set(atualizado.categoria.values_list('nome', flat=True)), {'Ação', 'RPG'})
+        self.assertTrue(default_storage.exists(caminho := atualizado.icone.name))
+        self.assertTrue(default_storage.exists(f'derivados/card/{caminho[:-4]}.webp'))
+        self.assertEqual(novo.imagens_extras.count(), 2)
+        # O que os signals fariam: relacionados e busca
+        self.assertTrue(JogoRelacionado.objects.filter(jogo=novo, relacionado=atualizado).exists())
+        self.assertEqual(self.client.get(reverse('resultado_pesquisa'), {'q': 'Atualizado'}).context['jogos'][0], atualizado)
+
+        exportado = StringIO()
+        self.assertEqual(escrever_registros(exportado, registros_do_catalogo(), 'jsonl'), 2)
+        antes = list(registros_do_catalogo())
+        exportado.seek(0)
+        self.importar(ler_registros(exportado, 'jsonl'))
+        self.assertEqual(list(registros_do_catalogo()), antes)
+        # A galeria que voltou igual não perde as miniaturas
+        galeria = list(novo.imagens_extras.values_list('imagem', flat=True))
+        for nome in galeria:
+            self.assertTrue(default_storage.exists(caminho_derivado(nome, 'thumb')))
+
+        # Com --imagens, arquivo igual ao que já está no storage é reaproveitado (sem cópia com sufixo)
+        registro = next(registro for registro in registros_do_catalogo() if registro['id'] == novo.id)
+        registro['icone'] = ''
+        pasta_galeria = os.path.dirname(default_storage.path(galeria[0]))
+        arquivos = sorted(os.listdir(pasta_galeria))
+        self.importar([registro], pasta_imagens=self.media)
+        self.assertEqual(list(novo.imagens_extras.values_list('imagem', flat=True)), galeria)
+        self.assertEqual(sorted(os.listdir(pasta_galeria)), arquivos)
+
+        # Imagem diferente: ganha arquivo novo e os que saíram da galeria são apagados
+        with open(f'{self.pasta}/outra.png', 'wb') as arquivo:
+            arquivo.write(self.png(60, 60).read())
+        registro['imagens'] = ['outra.png']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.importar([registro], pasta_imagens=self.pasta)
+        nova = novo.imagens_extras.get().imagem.name
+        self.assertTrue(default_storage.exists(nova))
+        for nome in galeria:
+            self.assertFalse(default_storage.exists(nome))
+            self.assertFalse(default_storage.exists(caminho_derivado(nome, 'thumb')))
+
+
+    def test_preco_importado_acerta_os_carrinhos(self):
+        cliente = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(cliente)
+        self.client.post(reverse('adicionar_carrinho', args=[self.existente.id]))
+        self.importar([{'id': self.existente.id, 'nome': 'Antigo', 'preco': '30.00', 'descricao': '...', 'desconto': 50}])
+        self.assertEqual(Compra.objects.get(usuario=cliente).valor_total, Decimal('15.00'))
+
+    def test_id_repetido_vira_erro_do_comando(self):
+        arquivo = f'{self.pasta}/repetido.csv'
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            saida.write('id,nome,preco,descricao\n500,Um,1.00,...\n500,Outro,2.00,...\n')
+        with self.assertRaisesMessage(CommandError, 'Registro inválido depois de 0 jogos'):
+            call_command('importar_catalogo', arquivo, '--lote', '10', stdout=StringIO())
+        self.assertFalse(Jogo.objects.filter(id=500).exists())
+
+
+class PlanosDeConsultaTests(PlanosDeConsultaMixin, BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.categoria = criar_categorias_com_jogos(2)[0]
+        self.jogo = Jogo.objects.filter(deletado=False).first()
+        Jogo.objects.filter(id=self.jogo.id).update(banner=True, pre_lancamento=True)
+        reconstruir_indice()
+        # O autocomplete lê o catálogo inteiro uma vez por worker, quando ele sobe (busca.py)
+        carregar_indice_autocomplete()
+        self.usuario = User.objects.create_user('cliente', password='senha-123')
+        self.client.force_login(self.usuario)
+        # O item que a view de remover vai receber (o carrinho ainda não existe)
+        self.item_id = ItemCompra.objects.create(
+            compra=Compra.objects.create(usuario=self.usuario), jogo=self.jogo, preco_unitario='59.90',
+        ).id
+
+    def test_views_da_loja_usam_indices(self):
+        get, post = self.client.get, self.client.post
+        self.assertSemVarreduras({
+            'home': lambda: get(reverse('home')),
+            'categoria': lambda: get(reverse('detalhe_categoria', args=[self.categoria.id]), {'ordem': 'preco'}),
+            'jogo': lambda: get(reverse('jogo_detalhe', args=[self.jogo.id])),
+            'busca': lambda: get(reverse('resultado_pesquisa'), {'q': 'jogo'}),
+            'autocomplete': lambda: get(reverse('autocomplete_search'), {'term': 'jogo'}),
+            'adicionar': lambda: post(reverse('adicionar_carrinho', args=[self.jogo.id])),
+            'adicionar de novo': lambda: post(reverse('adicionar_carrinho', args=[self.jogo.id])),
+            'carrinho': lambda: get(reverse('carrinho')),
+            'remover': lambda: get(reverse('remover_carrinho', args=[self.item_id])),
+            'finalizar': lambda: post(reverse('finalizar_compra'), {'token': 'abc'}),
+            'perfil': lambda: get(reverse('perfil')),
+            'api jogos': lambda: get(reverse('api_jogos'), {'categoria': self.categoria.id, 'ordem': '-preco'}),
+            'api busca': lambda: get(reverse('api_busca'), {'q': 'jogo'}),
+            'api detalhe': lambda: get(reverse('api_jogo_detalhe', args=[self.jogo.id])),
+            'api imagens': lambda: get(reverse('api_jogo_imagens', args=[self.jogo.id])),
+        })
+
+
+class PerfiladorTests(BaseTestCase):
+    def test_normaliza_e_marca_n_mais_um(self):
+        self.assertEqual(
+            normalizar_sql("SELECT * FROM t WHERE id IN (%s, %s) AND nome = 'x''y' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (?) AND nome = ? LIMIT ?',
+        )
+        por_item = [(f'SELECT * FROM "app_jogo" WHERE "app_jogo"."id" = {i} LIMIT 21', 0.001) for i in range(LIMIAR_N_MAIS_UM)]
+        resumo = analisar_queries(por_item + [('SELECT 1', 0.001)])
+        self.assertEqual((resumo['queries'], resumo['tempo_db_ms']), (LIMIAR_N_MAIS_UM + 1, 6.0))
+        self.assertEqual(resumo['n_mais_um'], ['SELECT * FROM "app_jogo" WHERE "app_jogo"."id" = ? LIMIT ?'])
+
+    def test_middleware_grava_amostras_e_o_relatorio_ordena_as_views(self):
+        jogo = Jogo.objects.create(nome='Zelda', preco='10.00', descricao='...')
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'perfilador.jsonl')
+            with self.settings(PERFILADOR_SQL=True, PERFILADOR_ARQUIVO=arquivo):
+                cliente = Client()  # o middleware é montado na primeira requisição do cliente
+                resposta = cliente.get(reverse('jogo_detalhe', args=[jogo.id]))
+                cliente.get(reverse('faq'))
+            self.assertRegex(resposta['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+
+            with open(arquivo, encoding='utf-8') as linhas:
+                amostras = [json.loads(linha) for linha in linhas]
+            self.assertEqual([amostra['view'] for amostra in amostras], ['jogo_detalhe', 'faq'])
+            self.assertGreater(amostras[0]['queries'], 0)
+
+            saida = StringIO()
+            call_command('relatorio_perfilador', arquivo=arquivo, ordem='queries', stdout=saida)
+            linhas = saida.getvalue().splitlines()
+            self.assertLess(
+                next(i for i, linha in enumerate(linhas) if linha.startswith('jogo_detalhe')),
+                next(i for i, linha in enumerate(linhas) if linha.startswith('faq')),
+            )
+
+        # Desligado (padrão), o middleware nem entra na cadeia
+        self.assertNotIn('Server-Timing', self.client.get(reverse('faq')))
+
+
+class BenchmarkViewsTests(BaseTestCase):
+    def test_gera_base_e_mede_todas_as_views(self):
+        call_command(
+            'gerar_dados', jogos=40, categorias=4, usuarios=20, itens=200, lote=50, stdout=StringIO(),
+        )
+        self.assertEqual(Jogo.objects.count(), 40)
+        self.assertTrue(Compra.objects.filter(status='finalizada').exists())
+        self.assertTrue(BibliotecaJogo.objects.exists())
+
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'baseline.json')
+            call_command('benchmark_views', repeticoes=1, host='testserver', saida=arquivo, stdout=StringIO())
+            with open(arquivo, encoding='utf-8') as resultado:
+                views = json.load(resultado)['views']
+            self.assertEqual(views['jogo_detalhe']['status'], 200)
+            self.assertEqual(views['dashboard']['status'], 200)  # admin de teste no grupo admin_staff
+            self.assertNotIn('adicionar_carrinho', views)
+            self.assertGreater(views['home']['queries'], 0)
+
+            # Comparado com ele mesmo: nenhuma regressão de queries
+            call_command(
+                'benchmark_views', repeticoes=1, host='testserver', comparar=arquivo, folga_ms=10000,
+                stdout=StringIO(),
+            )
+        self.assertFalse(User.objects.filter(username__startswith='benchmark_').exists())
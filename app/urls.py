@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views 
+from . import api, views 
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.views import LogoutView
 
@@ -20,4 +20,9 @@ urlpatterns = [
     path('resultado_pesquisa/', views.resultado_pesquisa_view, name='resultado_pesquisa'),
     path('autocomplete/', views.autocomplete_search_view, name='autocomplete_search'),
     path('suporte/', views.suporte_view, name='suporte'),
+    # API do catálogo (JSON, paginada por cursor, ver api.py)
+    path('api/jogos/', api.api_jogos, name='api_jogos'),
+    path('api/jogos/<int:jogo_id>/', api.api_jogo_detalhe, name='api_jogo_detalhe'),
+    path('api/jogos/<int:jogo_id>/imagens/', api.api_jogo_imagens, name='api_jogo_imagens'),
+    path('api/busca/', api.api_busca, name='api_busca'),
 ]
\ No newline at end of file
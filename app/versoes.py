@@ -0,0 +1,31 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+# ------- VERSÕES NO CACHE -------
+# Uma "versão" é só um token aleatório guardado no cache compartilhado.
+# Os valores cacheados carregam (ou usam na chave) a versão com que foram calculados;
+# trocar a versão invalida tudo de uma vez, em todos os processos/workers.
+# O token é aleatório (e não um contador) para que duas trocas simultâneas
+# nunca caiam na mesma versão.
+
+
+def versao_atual(chave):
+    versao = cache.get(chave)
+    if versao is None:
+        # Primeira vez (ou o cache foi limpo): cria uma versão nova.
+        # add() não sobrescreve se outro processo criou antes
+        cache.add(chave, uuid.uuid4().hex, None)
+        versao = cache.get(chave)
+    return versao
+
+
+def trocar_versao(chave):
+    # Troca agora e de novo depois do commit:
+    # quem leu o banco antes do commit acaba gravando numa versão que já morreu
+    def trocar():
+        cache.set(chave, uuid.uuid4().hex, None)
+
+    trocar()
+    transaction.on_commit(trocar)
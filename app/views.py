@@ -1,27 +1,38 @@
+import random
+import uuid
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import *  # 1. Importar
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group # <-- Importação para cadastro usuario do grupo Cliente
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib import messages
+from django.db import IntegrityError
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.utils.cache import patch_cache_control
+from .biblioteca import biblioteca_do_usuario
+from .busca import buscar_jogos, indice_autocomplete
+from .cache_paginas import cache_para_visitantes, catalogo_condicional, condicional_para_visitantes
+from .carrinho import adicionar_item, finalizar_carrinho, itens_do_carrinho, remover_item, totais_do_carrinho
+from .catalogo import filtrar_jogos, filtros_na_url, ler_filtros, montar_vitrine
+
+RESULTADOS_POR_PAGINA = 12
+TEMPO_CACHE_AUTOCOMPLETE = 60
+JOGOS_POR_PAGINA_BIBLIOTECA = 24
+JOGOS_RELACIONADOS = 4
 
+# Home, categoria e detalhe do jogo: visitantes recebem a página do cache, e um 304
+# quando o catálogo não mudou desde a última visita (ver cache_paginas.py)
+@condicional_para_visitantes
+@cache_para_visitantes
 def home_view(request):
-    # 1. Jogos do Banner Principal (Carrossel do topo)
-    banner_games = Jogo.objects.filter(banner=True, deletado=False)
-    
-    # 2. Jogo do Banner Secundário (O roxo de Pré-Venda)
-    # AQUI ESTÁ A MUDANÇA: Busca APENAS um jogo da categoria 'pre_lancamento'
-    # Se não tiver nenhum jogo nessa categoria, a variável será None e o banner não aparecerá no HTML.
-    pre_venda = Jogo.objects.filter(pre_lancamento=True, deletado=False).last()
+    # Banner, pré-venda e os primeiros jogos de cada categoria em destaque
+    # são montados de uma vez só (ver catalogo.montar_vitrine)
+    context = montar_vitrine()
 
-    context = {
-        'banner_games': banner_games,
-        'pre_venda': pre_venda, 
-    }
-    
     return render(request, 'home.html', context)
 
 
@@ -79,134 +90,55 @@ def cadastro_view(request):
 # CARRINHO FUNÇÕES
 @login_required
 def adicionar_carrinho(request, jogo_id):
+    # Toda a lógica (F(), total em SQL, transação) fica em carrinho.py
     try:
-        # 1. Encontra o jogo
-        jogo = Jogo.objects.get(id=jogo_id)
-        
-        # 2. Pega ou cria carrinho (simplificado)
-        carrinho, created = Compra.objects.get_or_create( #created verifica se já existe um carrinho
-            usuario=request.user,
-            status='pendente',
-            defaults={'valor_total': 0}
-        )
-        
-        # 3. Adiciona item (simplificado)
-        item, item_created = ItemCompra.objects.get_or_create(
-            compra=carrinho,
-            jogo=jogo,
-            defaults={'preco_unitario': jogo.preco, 'quantidade': 1}
-        )
-        
-        if not item_created:
-            item.quantidade += 1
-            item.save()
-        
-        # 4. Atualiza total
-        total = sum(item.subtotal() for item in carrinho.itens.all())
-        carrinho.valor_total = total
-        carrinho.save()
-        
-        print(f"Item adicionado! Carrinho ID: {carrinho.id}, Itens: {carrinho.itens.count()}")
-        
-    except Exception as e:
+        adicionar_item(request.user, jogo_id)
+    except Jogo.DoesNotExist as e:
         print(f"Erro: {e}")
     
-    # 5. REDIRECIONA CORRETAMENTE
     return redirect('home')
 @login_required
 def remover_carrinho(request, item_id):
-    # Verifica também se o item pertence a um carrinho do usuário atual (segurança)
-    item = get_object_or_404(ItemCompra, id=item_id, compra__usuario=request.user)
-    
-    # Pega o carrinho antes de deletar o item para poder atualizar o total depois
-    carrinho = item.compra
-    
-    # Deleta o item
-    if item.quantidade > 1:
-        item.quantidade -= 1
-        item.save()
-    else:
-        item.delete()
-    
-    # Recalcula o valor total do carrinho
-    # (Soma os subtotais dos itens restantes)
-    carrinho.valor_total = sum(i.subtotal() for i in carrinho.itens.all())
-    carrinho.save()
+    # Só remove itens do carrinho (pendente) do usuário atual (segurança)
+    try:
+        remover_item(request.user, item_id)
+    except ItemCompra.DoesNotExist:
+        raise Http404("Item não encontrado no carrinho")
     return redirect('carrinho')
 # CARRINHO VIEW
 @login_required(login_url='login')
 def carrinho_view(request):
-    # Busca o carrinho ativo (status='pendente')
-    carrinho = Compra.objects.filter(usuario=request.user, status='pendente').first()
-
-    # Se não existir carrinho, cria um vazio
-    if not carrinho:
-        carrinho = Compra.objects.create(usuario=request.user, status='pendente', valor_total=0)
-    else:
-        # Se já existe, não faz nada, apenas atualiza os itens
-        carrinho.limpar_jogos_deletados()
-        carrinho.atualizar_total()
-
-    # Pega todos os itens do carrinho
-    itens_carrinho = carrinho.itens.all()
-    # Preço antes dos descontos
-    subtotal_sem_desconto = 0
-    for item in itens_carrinho:
-        if item.jogo:
-            # Preço original do jogo × quantidade
-            subtotal_sem_desconto += float(item.jogo.preco) * item.quantidade
-        else:
-            # Usa preco_unitario salvo
-            subtotal_sem_desconto += float(item.preco_unitario or 0) * item.quantidade
-
-    valor_descontado = 0  # Valor do desconto (porcentagem aplicada ao preço )
-    
-    for item in itens_carrinho:
-        if item.jogo:
-            # Desconto (convertendo Decimal para float)
-            desconto_unidade = float(item.jogo.valor_desconto)
-            valor_descontado += desconto_unidade * item.quantidade
-    
-    # Calcula total
-    total = carrinho.valor_total
+    # Só lê: um GET não cria carrinho nem limpa/salva nada.
+    # Preços, descontos e totais vêm calculados do banco (ver carrinho.py)
+    itens_carrinho = itens_do_carrinho(request.user.id)
+    totais = totais_do_carrinho(itens_carrinho)
 
     context = {
-        'carrinho': carrinho,
         'itens': itens_carrinho,
-        'total': total,
-        'subtotal_sem_desconto': subtotal_sem_desconto,
-        'valor_descontado': valor_descontado,
+        'total': totais['total'],
+        'subtotal_sem_desconto': totais['subtotal_sem_desconto'],
+        'valor_descontado': totais['valor_descontado'],
+        # Idempotência da finalização: um token novo a cada visita à página
+        'token_finalizacao': uuid.uuid4().hex,
     }
     return render(request, 'carrinho.html', context)
 # Finalizar compra
+@login_required
 def finalizar_compra_view(request): 
     # Apenas processa a requisição se for um POST (enviado pelo formulário)
     if request.method == 'POST':
         try:
-            # 1. Busca a compra mais recente do usuário que ainda não está finalizada.
-            # Assumimos que o status inicial de um carrinho é 'aberta'.
-            carrinho = Compra.objects.filter(
-                usuario=request.user,
-                status='pendente'
-            ).order_by('-data_compra').first()
-            
-            if carrinho:
-                # 2. Atualiza o status para 'finalizada'
-                carrinho.status = 'finalizada'
-                carrinho.save()
-                for item in carrinho.itens.all():
-                    # Garante o snapshot após o salvamento
-                    item.save()
-                
-                # 3. Redireciona o usuário (ex: para a página de perfil ou confirmação)
+            # Tudo numa transação com número fixo de queries (ver carrinho.finalizar_carrinho).
+            # O token da página faz um segundo envio do mesmo formulário cair na mesma compra
+            compra, _ = finalizar_carrinho(request.user.id, request.POST.get('token'))
+            if compra:
                 return redirect('perfil') 
-            else:
-                # Se não houver carrinho aberto, apenas redireciona de volta
-                return redirect('carrinho')
+            # Se não houver carrinho aberto, apenas redireciona de volta
+            return redirect('carrinho')
                 
-        except Exception as e:
-            # Trata qualquer erro (como se o modelo Compra não existisse)
-            print(f"Erro ao finalizar a compra: {e}")
+        except IntegrityError:
+            # A transação foi desfeita: o carrinho continua aberto e o cliente fica sabendo
+            messages.error(request, "Não foi possível finalizar a compra. Tente novamente.")
             return redirect('carrinho')
             
     # Se a função for acessada via GET (diretamente pela URL), redireciona
@@ -214,41 +146,35 @@ def finalizar_compra_view(request):
 
 
 # 
+@condicional_para_visitantes
+@cache_para_visitantes
 def detalhe_categoria_view(request, id):
     # Pega a categoria atual (ex: RPG)
     categoria = get_object_or_404(Categoria, id=id)
     
-    # Pega os jogos dessa categoria
-    jogos = categoria.jogos.filter(deletado=False)
+    # Pega os jogos dessa categoria, com o preço com desconto calculado no banco
+    # (ordenação e faixa de preço vêm da query string, ver catalogo.ler_filtros)
+    filtros = ler_filtros(request.GET)
+    jogos = filtrar_jogos(categoria.jogos.filter(deletado=False).with_prices(), filtros)
     
     return render(request, 'categoria_detalhe.html', {
         'categoria': categoria,
         'jogos': jogos,
+        'filtros': filtros,
     })
 
+@condicional_para_visitantes
+@cache_para_visitantes
 def jogo_detalhe_view(request, id):
     jogo = get_object_or_404(Jogo, id=id)
     
-    # 1. Obter os IDs de todas as categorias do jogo atual
-    # Se o jogo não tiver categorias, este QuerySet estará vazio.
-    categorias_do_jogo = jogo.categoria.all()
-    
-    # 2. Filtrar JOGOS RELACIONADOS
-    # Usa 'categoria__in' para encontrar outros jogos que pertençam a QUALQUER UMA 
-    # das categorias do jogo atual.
-    jogos_relacionados = Jogo.objects.filter(
-        # Filtra jogos cuja categoria esteja na lista de categorias do jogo atual
-        categoria__in=categorias_do_jogo, 
-        deletado=False
-    ).exclude(
-        # Exclui o jogo que está sendo visualizado
-        id=jogo.id 
-    ).distinct(
-        # Adiciona distinct() para evitar duplicatas se um jogo tiver duas categorias em comum
-    ).order_by('?')[:4] 
-    
-    # Categorias para o menu (corrigido para o problema do template abaixo)
-    todas_categorias = Categoria.objects.all()
+    # Jogos relacionados: a lista pré-calculada (no máximo CANDIDATOS_POR_JOGO linhas,
+    # ver relacionados.py) é lida inteira e o sorteio é feito aqui, sem ORDER BY RANDOM()
+    candidatos = [
+        relacao.relacionado
+        for relacao in JogoRelacionado.objects.filter(jogo=jogo, relacionado__deletado=False).select_related('relacionado')
+    ]
+    jogos_relacionados = random.sample(candidatos, min(JOGOS_RELACIONADOS, len(candidatos)))
 
     # Passa as categorias do jogo atual para facilitar o loop no template (Passo C)
     categorias_atuais = jogo.categoria.all() 
@@ -256,7 +182,6 @@ def jogo_detalhe_view(request, id):
     return render(request, 'jogo_detalhe.html', {
         'jogo': jogo,
         'jogos_relacionados': jogos_relacionados,
-        'categorias': todas_categorias, # Para a navbar/menu
         'categorias_atuais': categorias_atuais # Para as tags do jogo atual
     })
 
@@ -277,16 +202,16 @@ def perfil_view(request):
         return redirect('perfil')
 
     # --- LÓGICA NORMAL DE EXIBIÇÃO ---
-    compras_finalizadas = Compra.objects.filter(
-        usuario=request.user,
-        status='finalizada'
-    ).order_by('-data_compra')
+    # Jogos do usuário vêm da biblioteca, uma página por vez (não percorre o histórico de compras)
+    paginator = Paginator(biblioteca_do_usuario(request.user.id), JOGOS_POR_PAGINA_BIBLIOTECA)
+    pagina = paginator.get_page(request.GET.get('page'))
 
     # Sempre pega ou cria o FotoPerfil (já que tem default)
     foto_perfil, created = FotoPerfil.objects.get_or_create(usuario=request.user)
 
     return render(request, 'perfil.html', {
-        'compras_finalizadas': compras_finalizadas,
+        'biblioteca': pagina.object_list,
+        'pagina': pagina,
         'foto_perfil': foto_perfil,
     })
 
@@ -315,55 +240,45 @@ def pagina_faq(request):
     # Não precisa de lógica, apenas renderiza o template
     return render(request, 'faq.html') 
     # (Ajuste 'seu_app' para o nome do seu aplicativo)
-def autocomplete_search_view(request):
-    if 'term' in request.GET:
-        term = request.GET.get('term')
-        
-        # Filtra jogos
-        jogos = Jogo.objects.filter(
-            nome__icontains=term, 
-            deletado=False
-        )[:10]
+@catalogo_condicional
+async def autocomplete_search_view(request):
+    # Busca no índice em memória do worker (sem query no banco), ver busca.IndiceAutocomplete.
+    # Async: no ASGI as teclas de todo mundo são atendidas no event loop, sem prender
+    # uma thread por requisição (no WSGI o Django roda a view do mesmo jeito, via async_to_sync)
+    results = await indice_autocomplete.abuscar(request.GET.get('term', ''))
 
-        results = []
-        for jogo in jogos:
-            # CORREÇÃO: Adicionando 'icon_url' ao JSON
-            icon_url = jogo.icone.url if jogo.icone else '' # Garantir que o ícone exista
-            
-            results.append({
-                'label': jogo.nome,
-                'value': jogo.nome,
-                'id': jogo.id,
-                'icon_url': icon_url 
-            })
-        
-        return JsonResponse(results, safe=False)
-    
-    return JsonResponse([], safe=False)
+    resposta = JsonResponse(results, safe=False)
+    # A mesma tecla digitada de novo (ou por outro usuário) pode vir do cache do navegador/CDN
+    patch_cache_control(resposta, public=True, max_age=TEMPO_CACHE_AUTOCOMPLETE)
+    return resposta
 
 # 2. VIEW PARA EXIBIR A PÁGINA DE RESULTADOS (Se o usuário apertar Enter)
-def resultado_pesquisa_view(request):
-    query = request.GET.get('q') # Pega o que está no input com name="q"
-    
-    jogos = Jogo.objects.none() # Começa com resultados vazios
-    
-    if query:
-        # Busca por nome ou descrição
-        jogos = Jogo.objects.filter(
-            Q(nome__icontains=query) | Q(descricao__icontains=query),
-            deletado=False
-        ).distinct()
+# Async, como as leituras da API (api.py). O FTS (cursor cru) e o Paginator não têm versão
+# async, e o render chama os context processors (sessão, carrinho, menu), que são síncronos:
+# cada parte vai inteira numa thread (sync_to_async), duas idas e voltas por requisição
+def _pagina_de_resultados(query, filtros, numero):
+    # Busca no índice full-text (nome, autoria e descrição), já ordenada por relevância
+    # e paginada: só a página pedida vem do banco (ver busca.py)
+    # Com ordem ou faixa de preço, a relevância dá lugar ao filtro pedido (feito no banco)
+    pagina = Paginator(buscar_jogos(query, filtros), RESULTADOS_POR_PAGINA).get_page(numero)
+    # Avaliada aqui, ainda na thread: o template não pode ir ao banco pelo event loop
+    pagina.object_list = list(pagina.object_list)
+    return pagina
 
-    # Adicionando contexto essencial para o base.html (navbar e carrinho)
-    
-    # IMPORTANTE: Você precisa garantir que a função get_total_carrinho exista e esteja importada/definida.
-        
+
+async def resultado_pesquisa_view(request):
+    query = request.GET.get('q') # Pega o que está no input com name="q"
+    filtros = ler_filtros(request.GET)
+    pagina = await sync_to_async(_pagina_de_resultados)(query, filtros, request.GET.get('page'))
 
     context = {
         'query': query,
-        'jogos': jogos,
+        'jogos': pagina.object_list,
+        'pagina': pagina,
+        'filtros': filtros,
+        'filtros_url': filtros_na_url(filtros),
     }
-    return render(request, 'resultado_pesquisa.html', context)
+    return await sync_to_async(render)(request, 'resultado_pesquisa.html', context)
 def suporte_view(request):
     # Adicione o contexto necessário para o base.html (categorias e carrinho)
 
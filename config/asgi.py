@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Carrega o índice do autocomplete na subida do worker (ver app/busca.py)
+from app.busca import carregar_indice_autocomplete  # noqa: E402
+
+carregar_indice_autocomplete()
@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir a requisição inteira; só é usado com PERFILADOR_SQL ligado
+    'app.perfilador.PerfiladorSQLMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,10 +70,48 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transações pegam o lock de escrita já no BEGIN: duas abas mexendo no mesmo
+            # carrinho esperam uma pela outra em vez de falhar com "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 
+# Cache
+# Compartilhado entre todos os processos/workers (o LocMemCache padrão é por processo,
+# o que deixaria contadores e listas desatualizados nos outros workers).
+# Em produção pode ser trocado por Redis/Memcached sem mudar o código.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    # Páginas inteiras dos visitantes (app/cache_paginas.py): compartilhado entre os processos,
+    # numa pasta própria para o limite de entradas não disputar com o cache principal
+    'paginas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache_paginas'),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # Fragmentos de template (cards dos jogos, carrossel da home): na memória de cada
+    # processo, com a versão na própria chave (ver app/catalogo.py)
+    'fragmentos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'coolkeys-fragmentos',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
+# Perfilador de SQL por requisição (app/perfilador.py): Server-Timing + amostras em JSONL.
+# Desligado por padrão; para ligar: COOLKEYS_PERFILADOR=1 python manage.py runserver
+# Relatório: python manage.py relatorio_perfilador
+PERFILADOR_SQL = os.environ.get('COOLKEYS_PERFILADOR') == '1'
+PERFILADOR_ARQUIVO = os.path.join(BASE_DIR, 'perfilador.jsonl')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
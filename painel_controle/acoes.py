@@ -0,0 +1,75 @@
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from app.busca import CHAVE_MUDANCAS_AUTOCOMPLETE, remover_do_indice
+from app.cache_paginas import invalidar_paginas
+from app.carrinho import recalcular_carrinhos_com_jogos, tirar_jogos_dos_carrinhos
+from app.relacionados import atualizar_relacionados
+from app.versoes import trocar_versao
+
+Jogo = apps.get_model('app', 'Jogo')
+
+# ------- AÇÕES EM MASSA DO PAINEL -------
+# Cada ação é um UPDATE só (sem save() jogo a jogo) dentro de uma transação,
+# e os carrinhos pendentes afetados são acertados com mais um ou dois comandos.
+# update() não dispara os signals do Jogo, então o que eles fariam
+# (busca, autocomplete, relacionados) é feito aqui uma vez para o conjunto todo.
+# Os contadores do dashboard se acertam sozinhos em TEMPO_CONTADORES.
+# atualizado_em vai junto em cada UPDATE: é o que troca os cards em cache (catalogo.py),
+# e a versão das páginas dos visitantes é trocada (cache_paginas.py).
+
+
+class AcaoInvalida(ValueError):
+    pass
+
+
+def _ids(jogo_ids):
+    try:
+        return sorted({int(id_) for id_ in jogo_ids})
+    except (TypeError, ValueError):
+        raise AcaoInvalida('Seleção de jogos inválida.')
+
+
+@transaction.atomic
+def aplicar_desconto_categoria(categoria_id, desconto):
+    # Mesmo desconto (%) para todos os jogos da categoria. Retorna quantos jogos mudaram
+    try:
+        desconto = int(desconto)
+    except (TypeError, ValueError):
+        raise AcaoInvalida('O desconto precisa ser um número inteiro.')
+    if not 0 <= desconto <= 100:
+        raise AcaoInvalida('O desconto precisa estar entre 0 e 100%.')
+
+    # O filtro pela categoria vira um "id IN (SELECT ...)" no mesmo UPDATE
+    jogos = Jogo.objects.filter(categoria=categoria_id)
+    alterados = jogos.update(desconto=desconto, atualizado_em=timezone.now())
+    recalcular_carrinhos_com_jogos(jogos.values('id'))
+    invalidar_paginas()
+    return alterados
+
+
+@transaction.atomic
+def deletar_jogos(jogo_ids):
+    # Soft delete em massa. Retorna quantos jogos foram deletados (os já deletados não contam)
+    ids = _ids(jogo_ids)
+    alterados = Jogo.objects.filter(id__in=ids, deletado=False).update(deletado=True, atualizado_em=timezone.now())
+    if not alterados:
+        return 0
+
+    # Sai de todos os carrinhos pendentes (um UPDATE dos totais e um DELETE dos itens)
+    tirar_jogos_dos_carrinhos(ids)
+    remover_do_indice(ids)
+    atualizar_relacionados(ids)
+    # O atualizado_em foi junto: os workers tiram só esses jogos do autocomplete
+    trocar_versao(CHAVE_MUDANCAS_AUTOCOMPLETE)
+    invalidar_paginas()
+    return alterados
+
+
+@transaction.atomic
+def definir_banner(jogo_ids, ativo):
+    # Liga/desliga o banner dos jogos selecionados. Não mexe em preço nem nos índices
+    alterados = Jogo.objects.filter(id__in=_ids(jogo_ids)).update(banner=bool(ativo), atualizado_em=timezone.now())
+    invalidar_paginas()
+    return alterados
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from painel_controle.rollups import ATRASO_PADRAO, atualizar_vendas, reconstruir_vendas
+
+
+class Command(BaseCommand):
+    help = (
+        'Acrescenta nos relatórios diários (por dia, jogo e categoria) as compras finalizadas '
+        'desde a última execução. Feito para rodar no cron, por exemplo a cada 5 minutos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--atraso', type=int, default=int(ATRASO_PADRAO.total_seconds() // 60),
+            help='Minutos de folga atrás do relógio (compras mais novas ficam para a próxima execução)',
+        )
+        parser.add_argument('--reconstruir', action='store_true', help='Apaga os relatórios e processa tudo de novo')
+
+    def handle(self, *args, **options):
+        atraso = timedelta(minutes=options['atraso'])
+        if options['reconstruir']:
+            compras = reconstruir_vendas(atraso)
+        else:
+            compras = atualizar_vendas(atraso)
+        self.stdout.write(self.style.SUCCESS(f'{compras} compras novas adicionadas aos relatórios de vendas.'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_indices_carrinho_e_home'),
+        ('painel_controle', '0002_rollups_vendas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vendadiariacategoria',
+            name='categoria',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app.categoria'),
+        ),
+        migrations.AlterField(
+            model_name='vendadiariajogo',
+            name='jogo',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app.jogo'),
+        ),
+    ]
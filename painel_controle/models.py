@@ -1,3 +1,65 @@
 from django.db import models
 
-# Create your models here.
+# ------- RELATÓRIOS DE VENDAS (rollups diários) -------
+# Tabelas resumidas por dia, preenchidas pelo comando atualizar_vendas (ver rollups.py).
+# Os gráficos do painel leem só daqui, nunca das tabelas de compras.
+# Jogo/categoria usam db_constraint=False + DO_NOTHING: o histórico continua com o id
+# mesmo depois de um hard delete (o nome fica salvo junto).
+
+
+class VendaDiaria(models.Model): # Total da loja no dia
+    dia = models.DateField(unique=True)
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=0) # Já com os descontos
+    desconto = models.DecimalField(max_digits=14, decimal_places=2, default=0) # Quanto foi dado de desconto
+
+    def __str__(self):
+        return f"{self.dia} - R$ {self.receita}"
+
+
+class VendaDiariaJogo(models.Model):
+    dia = models.DateField()
+    # Sem índice próprio: os rankings filtram pelo dia e o índice do jogo sozinho fazia o SQLite
+    # preferir varrer a tabela toda (para agrupar sem ordenar) a usar o (dia, jogo) do unique_together
+    jogo = models.ForeignKey(
+        'app.Jogo', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+',
+    )
+    nome_jogo = models.CharField(max_length=200)
+    unidades = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    desconto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['dia', 'jogo']
+
+    def __str__(self):
+        return f"{self.dia} - {self.nome_jogo}"
+
+
+class VendaDiariaCategoria(models.Model):
+    # Um jogo com duas categorias conta inteiro nas duas
+    dia = models.DateField()
+    # Sem índice próprio, pelo mesmo motivo do VendaDiariaJogo.jogo
+    categoria = models.ForeignKey(
+        'app.Categoria', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+',
+    )
+    nome_categoria = models.CharField(max_length=100)
+    unidades = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    desconto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['dia', 'categoria']
+
+    def __str__(self):
+        return f"{self.dia} - {self.nome_categoria}"
+
+
+class ControleRollup(models.Model):
+    # "Marca d'água": até que momento (finalizada_em) as compras já entraram nos rollups
+    nome = models.CharField(max_length=50, unique=True)
+    processado_ate = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nome} até {self.processado_ate}"
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from app.precos import centavos
+
+from .models import ControleRollup, VendaDiaria, VendaDiariaCategoria, VendaDiariaJogo
+
+ItemCompra = apps.get_model('app', 'ItemCompra')
+
+# ------- ROLLUPS DE VENDAS -------
+# Cada execução só lê as compras finalizadas depois da marca d'água (ControleRollup),
+# soma por dia / jogo / categoria no banco e acrescenta nas tabelas resumidas.
+# A marca fica ATRASO_PADRAO atrás do relógio: uma compra cuja transação ainda não
+# terminou quando o comando rodou não fica para trás.
+NOME_CONTROLE = 'vendas'
+ATRASO_PADRAO = timedelta(minutes=5)
+
+
+def _itens_finalizados(desde, ate):
+    itens = ItemCompra.objects.filter(compra__status='finalizada', compra__finalizada_em__lte=ate)
+    if desde is not None:
+        itens = itens.filter(compra__finalizada_em__gt=desde)
+    # Preço e desconto congelados no item ao finalizar (ver carrinho.finalizar_carrinho),
+    # somados em centavos inteiros: o desconto mudar depois não mexe nas vendas antigas
+    return itens.annotate(
+        dia=TruncDate('compra__finalizada_em'),
+        receita_centavos=centavos('preco_unitario') * F('quantidade'),
+        desconto_centavos=centavos('desconto_unitario') * F('quantidade'),
+    )
+
+
+def _somas():
+    return {
+        'unidades': Sum('quantidade'),
+        'receita_total': Sum('receita_centavos'),
+        'desconto_total': Sum('desconto_centavos'),
+    }
+
+
+def _em_reais(linha):
+    # (receita, desconto) em centavos -> em reais
+    return Decimal(linha['receita_total']) / 100, Decimal(linha['desconto_total']) / 100
+
+
+def _acumular(modelo, chave, linhas, nomes=lambda linha: {}, contadores=('unidades',)):
+    # Soma os deltas nas linhas que já existem (dos mesmos dias) e cria as que faltam.
+    # nomes: campos de texto que só acompanham a chave (nome do jogo/categoria)
+    if not linhas:
+        return
+    existentes = {
+        tuple(getattr(obj, campo) for campo in chave): obj
+        for obj in modelo.objects.filter(dia__in={linha['dia'] for linha in linhas})
+    }
+    novos, alterados = [], []
+    for linha in linhas:
+        receita, desconto = _em_reais(linha)
+        obj = existentes.get(tuple(linha[campo] for campo in chave))
+        if obj is None:
+            obj = modelo(**{campo: linha[campo] for campo in chave})
+            novos.append(obj)
+        else:
+            alterados.append(obj)
+        for campo in contadores:
+            setattr(obj, campo, getattr(obj, campo) + linha[campo])
+        obj.receita += receita
+        obj.desconto += desconto
+        for campo, valor in nomes(linha).items():
+            setattr(obj, campo, valor)
+
+    modelo.objects.bulk_create(novos)
+    modelo.objects.bulk_update(alterados, [*contadores, 'receita', 'desconto', *nomes(linhas[0])])
+
+
+@transaction.atomic
+def atualizar_vendas(atraso=ATRASO_PADRAO, agora=None):
+    # Processa as compras finalizadas entre a marca d'água e (agora - atraso).
+    # Retorna quantas compras entraram
+    controle, _ = ControleRollup.objects.select_for_update().get_or_create(nome=NOME_CONTROLE)
+    ate = (agora or timezone.now()) - atraso
+    if controle.processado_ate is not None and controle.processado_ate >= ate:
+        return 0
+
+    itens = _itens_finalizados(controle.processado_ate, ate)
+
+    por_dia = list(itens.values('dia').annotate(pedidos=Count('compra', distinct=True), **_somas()).order_by())
+    _acumular(VendaDiaria, ['dia'], por_dia, contadores=('pedidos', 'unidades'))
+
+    por_jogo = list(itens.values('dia', 'jogo_id').annotate(nome=Max('nome_snapshot'), **_somas()).order_by())
+    _acumular(VendaDiariaJogo, ['dia', 'jogo_id'], por_jogo, lambda linha: {'nome_jogo': linha['nome'] or ''})
+
+    por_categoria = list(
+        itens.filter(jogo__categoria__isnull=False)
+        .values('dia', categoria_id=F('jogo__categoria'))
+        .annotate(nome=Max('jogo__categoria__nome'), **_somas())
+        .order_by()
+    )
+    _acumular(
+        VendaDiariaCategoria, ['dia', 'categoria_id'], por_categoria,
+        lambda linha: {'nome_categoria': linha['nome']},
+    )
+
+    controle.processado_ate = ate
+    controle.save()
+    return sum(linha['pedidos'] for linha in por_dia)
+
+
+@transaction.atomic
+def reconstruir_vendas(atraso=ATRASO_PADRAO):
+    # Joga fora os rollups e processa todo o histórico de novo
+    VendaDiaria.objects.all().delete()
+    VendaDiariaJogo.objects.all().delete()
+    VendaDiariaCategoria.objects.all().delete()
+    ControleRollup.objects.filter(nome=NOME_CONTROLE).update(processado_ate=None)
+    return atualizar_vendas(atraso)
@@ -1,3 +1,210 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.models import Categoria, Compra, Jogo, JogoRelacionado
+from app.tests import BaseTestCase, PlanosDeConsultaMixin
+
+from .models import VendaDiaria, VendaDiariaCategoria, VendaDiariaJogo
+from .rollups import atualizar_vendas
+from .views import contadores_dashboard
+
+
+class PainelTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', password='senha-123', is_staff=True)
+        self.admin.groups.add(Group.objects.get(name='admin_staff'))
+        self.client.force_login(self.admin)
+
+
+class DashboardTests(PainelTestCase):
+    def criar_jogos(self, quantidade):
+        Jogo.objects.bulk_create([
+            Jogo(nome=f'Jogo {i}', preco=10, descricao='texto longo ' * 200) for i in range(quantidade)
+        ])
+
+    def queries_do_dashboard(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            resposta = self.client.get(reverse('dashboard'), params)
+        return resposta, ctx.captured_queries
+
+    def test_grade_paginada_por_id_sem_colunas_pesadas(self):
+        self.criar_jogos(45)
+        resposta, queries = self.queries_do_dashboard()
+        jogos = resposta.context['jogos']
+        self.assertEqual(len(jogos), 30)
+        self.assertEqual(resposta.context['proximo_apos'], jogos[-1].id)
+        self.assertFalse([q for q in queries if 'descricao' in q['sql']])
+
+        resposta, _ = self.queries_do_dashboard(apos=jogos[-1].id)
+        self.assertEqual(len(resposta.context['jogos']), 15)
+        self.assertIsNone(resposta.context['proximo_apos'])
+
+    def test_contadores_em_cache_e_queries_constantes(self):
+        self.criar_jogos(3)
+        Compra.objects.bulk_create([Compra(usuario=self.admin, status='finalizada') for _ in range(3)])
+        resposta, _ = self.queries_do_dashboard()
+        self.assertEqual(resposta.context['total_compras'], 3)
+
+        _, com_poucos = self.queries_do_dashboard()
+        self.criar_jogos(40)
+        Compra.objects.bulk_create([Compra(usuario=self.admin, status='finalizada') for _ in range(40)])
+        resposta, com_muitos = self.queries_do_dashboard()
+
+        # Os COUNT(*) ficaram no cache e nenhuma query cresce com os dados
+        self.assertEqual(len(com_poucos), len(com_muitos))
+        self.assertFalse([q for q in com_muitos if 'COUNT(' in q['sql']])
+        self.assertEqual(resposta.context['total_compras'], 3)
+
+
+class RelatoriosVendasTests(PainelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rpg = Categoria.objects.create(nome='RPG')
+        self.cheio = Jogo.objects.create(nome='Cheio', preco='50.00', descricao='...')
+        self.promo = Jogo.objects.create(nome='Promo', preco='19.99', desconto=15, descricao='...')
+        self.promo.categoria.add(self.rpg)
+        self.cliente = User.objects.create_user('cliente', password='senha-123')
+
+    def comprar(self, *jogos):
+        self.client.force_login(self.cliente)
+        for jogo in jogos:
+            self.client.post(reverse('adicionar_carrinho', args=[jogo.id]))
+        self.client.post(reverse('finalizar_compra'))
+        self.client.force_login(self.admin)
+
+    def test_cada_execucao_so_processa_compras_novas(self):
+        self.comprar(self.cheio, self.promo)
+        self.assertEqual(atualizar_vendas(atraso=timedelta(0)), 1)
+
+        self.comprar(self.promo, self.promo)
+        # Dentro da folga: fica para a próxima execução
+        self.assertEqual(atualizar_vendas(), 0)
+        self.assertEqual(atualizar_vendas(atraso=timedelta(0)), 1)
+        self.assertEqual(atualizar_vendas(atraso=timedelta(0)), 0)
+
+        dia = VendaDiaria.objects.get()
+        self.assertEqual((dia.pedidos, dia.unidades), (2, 4))
+        # 50.00 + 3 x 19.99 = 109.97 brutos; 3 x 3.00 de desconto (16.99 congelado por unidade)
+        self.assertEqual(dia.desconto, Decimal('9.00'))
+        self.assertEqual(dia.receita + dia.desconto, Decimal('109.97'))
+        promo = VendaDiariaJogo.objects.get(jogo=self.promo)
+        self.assertEqual(promo.unidades, 3)
+        self.assertEqual(VendaDiariaCategoria.objects.get().receita, promo.receita)
+
+    def test_endpoints_leem_so_os_rollups(self):
+        self.comprar(self.cheio, self.promo)
+        atualizar_vendas(atraso=timedelta(0))
+
+        with CaptureQueriesContext(connection) as ctx:
+            diarias = self.client.get(reverse('vendas_diarias_json')).json()
+            jogos = self.client.get(reverse('vendas_por_jogo_json'), {'dias': 7}).json()
+            categorias = self.client.get(reverse('vendas_por_categoria_json')).json()
+        self.assertFalse([q for q in ctx.captured_queries if 'app_itemcompra' in q['sql'] or 'app_compra' in q['sql']])
+
+        self.assertEqual(diarias['dias'][0]['pedidos'], 1)
+        self.assertEqual([jogo['nome'] for jogo in jogos['jogos']], ['Cheio', 'Promo'])
+        self.assertEqual(categorias['categorias'][0]['nome'], 'RPG')
+
+        self.client.force_login(self.cliente)
+        self.assertNotEqual(self.client.get(reverse('vendas_diarias_json')).status_code, 200)
+
+
+class AcoesEmMassaTests(PainelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rpg = Categoria.objects.create(nome='RPG')
+        self.jogos = [Jogo.objects.create(nome=f'Jogo {i}', preco='10.00', descricao='...') for i in range(3)]
+        self.rpg.jogos.add(*self.jogos[:2])
+        # Três clientes com o mesmo jogo de RPG + um jogo fora da categoria no carrinho
+        self.carrinhos = []
+        for i in range(3):
+            cliente = User.objects.create_user(f'cliente{i}', password='senha-123')
+            self.client.force_login(cliente)
+            self.client.post(reverse('adicionar_carrinho', args=[self.jogos[0].id]))
+            self.client.post(reverse('adicionar_carrinho', args=[self.jogos[2].id]))
+            self.carrinhos.append(Compra.objects.get(usuario=cliente, status='pendente'))
+        self.client.force_login(self.admin)
+
+    def totais(self):
+        return [Compra.objects.get(pk=carrinho.pk).valor_total for carrinho in self.carrinhos]
+
+    def test_desconto_na_categoria_recalcula_os_carrinhos_em_um_update(self):
+        self.assertContains(self.client.get(reverse('gerenciar_categorias')), reverse('desconto_categoria', args=[self.rpg.id]))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('desconto_categoria', args=[self.rpg.id]), {'desconto': 25})
+        self.assertEqual(set(Jogo.objects.values_list('nome', 'desconto')), {('Jogo 0', 25), ('Jogo 1', 25), ('Jogo 2', 0)})
+        self.assertEqual(self.totais(), [Decimal('17.50')] * 3)
+        # Um UPDATE para os jogos e um para todos os carrinhos
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]), 2)
+
+        self.client.post(reverse('desconto_categoria', args=[self.rpg.id]), {'desconto': 150})
+        self.assertEqual(Jogo.objects.get(nome='Jogo 0').desconto, 25)
+
+    def test_deletar_e_banner_em_massa(self):
+        self.client.post(reverse('acoes_jogos'), {'acao': 'banner_ligar', 'jogos': [self.jogos[1].id, self.jogos[2].id]})
+        self.assertEqual(list(Jogo.objects.filter(banner=True).values_list('nome', flat=True)), ['Jogo 1', 'Jogo 2'])
+
+        self.client.post(reverse('acoes_jogos'), {'acao': 'deletar', 'jogos': [self.jogos[0].id, self.jogos[1].id]})
+        self.assertEqual(Jogo.objects.filter(deletado=True).count(), 2)
+        # Nos carrinhos o jogo deletado para de contar; na busca ele some
+        self.assertEqual(self.totais(), [Decimal('10.00')] * 3)
+        resposta = self.client.get(reverse('resultado_pesquisa'), {'q': 'Jogo'})
+        self.assertEqual([jogo.nome for jogo in resposta.context['jogos']], ['Jogo 2'])
+
+
+class EditarJogoTests(PainelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rpg = Categoria.objects.create(nome='RPG')
+        self.jogo, self.outro = (Jogo.objects.create(nome=nome, preco='10.00', descricao='...') for nome in ('Jogo', 'Outro'))
+        self.rpg.jogos.add(self.jogo, self.outro)
+
+    def editar(self, **campos):
+        dados = {
+            'nome': self.jogo.nome, 'preco': '10.00', 'descricao': '...', 'lancamento': '2020-01-01',
+            'desconto': 0, 'categoria': [self.rpg.id], **campos,
+        }
+        return self.client.post(reverse('editar_jogo', args=[self.jogo.id]), dados)
+
+    def test_formulario_nao_faz_uma_query_por_categoria(self):
+        Categoria.objects.bulk_create([Categoria(nome=f'Categoria {i}') for i in range(50)])
+        self.jogo.categoria.add(*Categoria.objects.order_by('id')[:10])
+        # Sessão, usuário, jogo, grupo, categorias marcadas, carrinho, menu, categorias, galeria
+        with self.assertNumQueries(9):
+            resposta = self.client.get(reverse('editar_jogo', args=[self.jogo.id]))
+        self.assertEqual(len(resposta.context['categorias_selecionadas']), 10)
+
+    def test_soft_delete_pelo_formulario_atualiza_os_relacionados(self):
+        relacionados = lambda: list(JogoRelacionado.objects.filter(jogo=self.outro).values_list('relacionado__nome', flat=True))
+        self.assertEqual(relacionados(), ['Jogo'])
+        self.editar(deletado='on')
+        self.assertEqual(relacionados(), [])
+        self.editar()
+        self.assertEqual(relacionados(), ['Jogo'])
+
+
+class PlanosDeConsultaPainelTests(PlanosDeConsultaMixin, PainelTestCase):
+    def test_views_do_painel_usam_indices(self):
+        rpg = Categoria.objects.create(nome='RPG')
+        jogo = Jogo.objects.create(nome='Jogo', preco='10.00', descricao='...')
+        Compra.objects.create(usuario=self.admin, status='finalizada')
+        # Os COUNT(*) do dashboard contam a tabela inteira de propósito, no máximo
+        # uma vez a cada TEMPO_CONTADORES (ver contadores_dashboard)
+        contadores_dashboard()
+        get = self.client.get
+        self.assertSemVarreduras({
+            'dashboard': lambda: get(reverse('dashboard')),
+            'dashboard (próxima página)': lambda: get(reverse('dashboard'), {'apos': jogo.id}),
+            'editar jogo': lambda: get(reverse('editar_jogo', args=[jogo.id])),
+            'categorias': lambda: get(reverse('gerenciar_categorias')),
+            'editar categoria': lambda: get(reverse('editar_categoria', args=[rpg.id])),
+            'vendas diárias': lambda: get(reverse('vendas_diarias_json')),
+            'vendas por jogo': lambda: get(reverse('vendas_por_jogo_json')),
+            'vendas por categoria': lambda: get(reverse('vendas_por_categoria_json')),
+        })
@@ -6,10 +6,15 @@ urlpatterns = [
     path('', views.admin_dashboard, name='dashboard'),
     path('jogos/criar/', views.criar_jogo_view, name='criar_jogo'),
     path('jogo/editar/<int:jogo_id>/', views.editar_jogo, name='editar_jogo'),
+    path('jogos/acoes/', views.acoes_jogos, name='acoes_jogos'),
     path('categorias/', views.gerenciar_categorias, name='gerenciar_categorias'), # Nome usado nos redirects das views
     path('categorias/edit/<int:cat_id>/', views.editar_categoria, name='editar_categoria'),
     path('categorias/delete/<int:cat_id>/', views.deletar_categoria, name='deletar_categoria'),
+    path('categorias/desconto/<int:cat_id>/', views.desconto_categoria, name='desconto_categoria'),
     path('usuarios/', views.gerenciar_usuarios, name='gerenciar_usuarios'),
     path('usuarios/grupo/<int:user_id>/', views.alterar_grupo_usuario, name='alterar_grupo'),
     path('usuarios/deletar/<int:user_id>/', views.deletar_usuario, name='deletar_usuario'),
+    path('relatorios/vendas/diarias/', views.vendas_diarias_json, name='vendas_diarias_json'),
+    path('relatorios/vendas/jogos/', views.vendas_por_jogo_json, name='vendas_por_jogo_json'),
+    path('relatorios/vendas/categorias/', views.vendas_por_categoria_json, name='vendas_por_categoria_json'),
  ]
\ No newline at end of file
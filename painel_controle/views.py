@@ -6,6 +6,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
 from django.contrib.auth.models import Group
+from .models import VendaDiaria, VendaDiariaCategoria, VendaDiariaJogo
+from .acoes import AcaoInvalida, aplicar_desconto_categoria, definir_banner, deletar_jogos
+from app.relacionados import atualizar_relacionados
+from django.core.cache import cache
+from django.db.models import Max, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from datetime import timedelta
 
 
 
@@ -20,6 +28,23 @@ except LookupError:
     # Se der erro, definimos como None (o que causará falha controlada nas views)
     Jogo, Compra, Categoria, ItemCompra = None, None, None, None
 
+JOGOS_POR_PAGINA_DASHBOARD = 30
+CHAVE_CONTADORES = 'painel:contadores'
+TEMPO_CONTADORES = 30 # segundos
+
+
+def contadores_dashboard():
+    # Os três COUNT(*) rodam no máximo uma vez a cada TEMPO_CONTADORES (cache compartilhado),
+    # não a cada visita ao dashboard
+    def contar():
+        return {
+            'total_compras': Compra.objects.filter(status='finalizada').count(),
+            'total_jogos': Jogo.objects.filter(deletado=False).count(),
+            'total_users': User.objects.count(),
+        }
+    return cache.get_or_set(CHAVE_CONTADORES, contar, TEMPO_CONTADORES)
+
+
 @login_required
 @staff_member_required
 def admin_dashboard(request):
@@ -32,19 +57,31 @@ def admin_dashboard(request):
         messages.error(request, "Erro de configuração: Modelos de dados não encontrados.")
         return redirect('home')
     
-    # Estatísticas básicas
-    jogos = Jogo.objects.all()
-    total_compras = Compra.objects.filter(status='finalizada').count()
-    total_jogos = Jogo.objects.filter(deletado=False).count()
-    total_users = User.objects.count()
-    compras_recentes = Compra.objects.filter(status='finalizada').order_by('-data_compra')[:5]
+    # Jogos para editar: só as colunas do card, de JOGOS_POR_PAGINA_DASHBOARD em
+    # JOGOS_POR_PAGINA_DASHBOARD (paginação por id: ?apos=<último id da página anterior>)
+    try:
+        apos = int(request.GET.get('apos', 0))
+    except ValueError:
+        apos = 0
+    jogos = list(
+        Jogo.objects.filter(id__gt=apos).only('id', 'nome', 'icone').order_by('id')[:JOGOS_POR_PAGINA_DASHBOARD + 1]
+    )
+    proximo_apos = jogos[JOGOS_POR_PAGINA_DASHBOARD - 1].id if len(jogos) > JOGOS_POR_PAGINA_DASHBOARD else None
+    jogos = jogos[:JOGOS_POR_PAGINA_DASHBOARD]
+
+    # Estatísticas básicas (contagens em cache por alguns segundos)
+    contadores = contadores_dashboard()
+    # Usa o índice (status, -data_compra) da Compra: não ordena a tabela inteira
+    compras_recentes = Compra.objects.filter(status='finalizada').select_related('usuario').order_by('-data_compra')[:5]
     
     context = {
         'jogos': jogos,
+        'apos': apos,
+        'proximo_apos': proximo_apos,
         'user': request.user,
-        'total_compras': total_compras,
-        'total_jogos': total_jogos,
-        'total_users': total_users,
+        'total_compras': contadores['total_compras'],
+        'total_jogos': contadores['total_jogos'],
+        'total_users': contadores['total_users'],
         'compras_recentes': compras_recentes,
     }
     
@@ -126,6 +163,7 @@ def editar_jogo(request, jogo_id):
     if request.method == 'POST':
         try:
             with transaction.atomic():
+                deletado_antes = jogo.deletado
                 jogo.nome = request.POST.get('nome')
                 jogo.preco = request.POST.get('preco')
                 jogo.descricao = request.POST.get('descricao')
@@ -140,6 +178,10 @@ def editar_jogo(request, jogo_id):
                     jogo.icone = request.FILES.get('icone')
 
                 jogo.save()
+                # Soft delete (ou voltar dele) tira/põe o jogo nas listas de relacionados.
+                # Uma edição comum não recalcula nada; categorias novas vêm pelo signal do m2m
+                if jogo.deletado != deletado_antes:
+                    atualizar_relacionados([jogo.id])
                 jogo.categoria.set(request.POST.getlist('categoria'))
 
                 for img in request.FILES.getlist('imagens_extras'):
@@ -153,7 +195,9 @@ def editar_jogo(request, jogo_id):
     # Correção no render: Passando tudo num único dicionário de contexto
     return render(request, 'editar_jogo.html', {
         'jogo': jogo,
-        'categorias': Categoria.objects.all(),
+        'categorias': Categoria.objects.only('id', 'nome'),
+        # Uma query para as marcadas (o "cat in jogo.categoria.all" do template fazia uma por categoria)
+        'categorias_selecionadas': set(jogo.categoria.values_list('id', flat=True)),
     })
 @staff_member_required
 def gerenciar_categorias(request):
@@ -199,6 +243,50 @@ def deletar_categoria(request, cat_id):
     cat.delete()
     return redirect('gerenciar_categorias')
 
+# ------- AÇÕES EM MASSA (ver acoes.py) -------
+@login_required
+@staff_member_required
+def acoes_jogos(request):
+    # Ação escolhida no dashboard para os jogos marcados
+    if not request.user.groups.filter(name='admin_staff').exists():
+        return redirect('home')
+    if request.method != 'POST':
+        return redirect('dashboard')
+
+    acao = request.POST.get('acao')
+    ids = request.POST.getlist('jogos')
+    if not ids:
+        messages.error(request, "Nenhum jogo selecionado.")
+        return redirect('dashboard')
+    try:
+        if acao == 'deletar':
+            total = deletar_jogos(ids)
+            messages.success(request, f"{total} jogo(s) deletado(s).")
+        elif acao in ('banner_ligar', 'banner_desligar'):
+            total = definir_banner(ids, acao == 'banner_ligar')
+            messages.success(request, f"Banner atualizado em {total} jogo(s).")
+        else:
+            messages.error(request, "Ação desconhecida.")
+    except AcaoInvalida as e:
+        messages.error(request, str(e))
+    return redirect('dashboard')
+
+
+@login_required
+@staff_member_required
+def desconto_categoria(request, cat_id):
+    if not request.user.groups.filter(name='admin_staff').exists():
+        return redirect('home')
+    if request.method == 'POST':
+        categoria = get_object_or_404(Categoria, id=cat_id)
+        try:
+            total = aplicar_desconto_categoria(categoria.id, request.POST.get('desconto'))
+            messages.success(request, f"Desconto aplicado em {total} jogo(s) de {categoria.nome}.")
+        except AcaoInvalida as e:
+            messages.error(request, str(e))
+    return redirect('gerenciar_categorias')
+
+
 @staff_member_required
 def gerenciar_usuarios(request):
     # Verifica se o usuário logado pertence ao grupo admin_staff
@@ -244,4 +332,67 @@ def deletar_usuario(request, user_id):
     else:
         messages.error(request, "Você não pode remover sua própria conta.")
         
-    return redirect('gerenciar_usuarios')
\ No newline at end of file
+    return redirect('gerenciar_usuarios')
+
+# ------- RELATÓRIOS DE VENDAS (JSON para os gráficos do dashboard) -------
+# Lidos só das tabelas de rollup (atualizadas por: python manage.py atualizar_vendas),
+# nunca das compras: o custo depende do período pedido, não do tamanho do histórico.
+DIAS_RELATORIO_PADRAO = 30
+DIAS_RELATORIO_MAXIMO = 366
+LIMITE_RANKING = 10
+
+
+def _inicio_do_periodo(request):
+    try:
+        dias = int(request.GET.get('dias', DIAS_RELATORIO_PADRAO))
+    except ValueError:
+        dias = DIAS_RELATORIO_PADRAO
+    dias = min(max(dias, 1), DIAS_RELATORIO_MAXIMO)
+    return timezone.localdate() - timedelta(days=dias - 1)
+
+
+def _ranking(modelo, request, campo_id, campo_nome):
+    try:
+        limite = min(max(int(request.GET.get('limite', LIMITE_RANKING)), 1), 100)
+    except ValueError:
+        limite = LIMITE_RANKING
+    linhas = (
+        modelo.objects.filter(dia__gte=_inicio_do_periodo(request))
+        .values(campo_id)
+        .annotate(nome=Max(campo_nome), unidades=Sum('unidades'), receita=Sum('receita'), desconto=Sum('desconto'))
+        .order_by('-receita', campo_id)[:limite]
+    )
+    return [
+        {'id': linha[campo_id], 'nome': linha['nome'], 'unidades': linha['unidades'],
+         'receita': linha['receita'], 'desconto': linha['desconto']}
+        for linha in linhas
+    ]
+
+
+@login_required
+@staff_member_required
+def vendas_diarias_json(request):
+    if not request.user.groups.filter(name='admin_staff').exists():
+        return JsonResponse({'erro': 'Sem permissão'}, status=403)
+    dias = list(
+        VendaDiaria.objects.filter(dia__gte=_inicio_do_periodo(request))
+        .order_by('dia')
+        .values('dia', 'pedidos', 'unidades', 'receita', 'desconto')
+    )
+    return JsonResponse({'dias': dias})
+
+
+@login_required
+@staff_member_required
+def vendas_por_jogo_json(request):
+    if not request.user.groups.filter(name='admin_staff').exists():
+        return JsonResponse({'erro': 'Sem permissão'}, status=403)
+    return JsonResponse({'jogos': _ranking(VendaDiariaJogo, request, 'jogo_id', 'nome_jogo')})
+
+
+@login_required
+@staff_member_required
+def vendas_por_categoria_json(request):
+    if not request.user.groups.filter(name='admin_staff').exists():
+        return JsonResponse({'erro': 'Sem permissão'}, status=403)
+    return JsonResponse({'categorias': _ranking(VendaDiariaCategoria, request, 'categoria_id', 'nome_categoria')})